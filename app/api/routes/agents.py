@@ -1,67 +1,76 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from typing import Optional
 from app.utils.mongodb_client import MongoDBClient
-from app.core.start_agent import agent_run
+from app.core.worker_pool import worker_pool
+from app.core.admission import admission_controller
+from app.core.session_registry import session_registry
 from app.utils.token import get_token, generate_ws_token
 import uuid
 import logging
 import asyncio
-from datetime import datetime
 from livekit.api import LiveKitAPI, DeleteRoomRequest
 from app.core.config import settings
-from app.utils.vector_store_utils import load_vector_store_from_mongo
-from app.utils.node_parser import parse_agent_config
-from app.utils.validators import validate_custom_function
+from app.utils.vector_store_utils import validate_vector_store
+from app.core.flow_cache import flow_cache
+from app.core.flow_graph import agent_store_ids
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api")
 
 router = APIRouter()
 mongo_client = MongoDBClient()
 
-agent_sessions = {}
-
 from pydantic import ValidationError
 from fastapi import Query
 
+
+async def end_session(session: dict):
+    """Delete the LiveKit room of a session, stop following it and mark it ended."""
+    room_name = session["room_name"]
+    try:
+        async with LiveKitAPI(
+            url=settings.LIVEKIT_URL,
+            api_key=settings.LIVEKIT_API_KEY,
+            api_secret=settings.LIVEKIT_API_SECRET
+        ) as lkapi:
+            await lkapi.room.delete_room(DeleteRoomRequest(room=room_name))
+            logger.info(f"Room '{room_name}' deleted from LiveKit.")
+    except Exception as e:
+        logger.error(f"Failed to delete room '{room_name}': {e}")
+
+    await session_registry.cancel_task(room_name)
+    session_registry.mark_ended(room_name, "disconnected")
+
+
 @router.post("/start-agent/{agent_id}")
 async def start_agent_from_mongo(
     agent_id: str,
     background_tasks: BackgroundTasks,
     force_refresh: bool = Query(True)
 ):
-    if force_refresh and agent_id in agent_sessions:
-        logger.info(f"Force refresh enabled. Clearing previous session for agent_id: {agent_id}")
-        old_task = agent_sessions[agent_id].get("task")
-
-        if old_task:
-            if not old_task.done():
-                old_task.cancel()
-        else:
-            logger.warning(f"No task found for agent {agent_id}, skipping cancellation.")
-
-        del agent_sessions[agent_id]
-        logger.info(f"Force refresh: Cleared previous session for agent_id: {agent_id}")
-
-    # Always fetch fresh data
-    flow = mongo_client.get_flow_by_id(agent_id)
-
-    if not flow:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Agent configuration with ID '{agent_id}' not found in MongoDB"
-        )
+    if force_refresh:
+        previous_sessions = [
+            session for session in session_registry.find(agent_id=agent_id, active=True)
+            if session.get("kind") == "web"
+        ]
+        for session in previous_sessions:
+            logger.info(f"Force refresh enabled. Clearing previous session {session['room_name']} for agent_id: {agent_id}")
+            await end_session(session)
+        if previous_sessions:
+            logger.info(f"Force refresh: Cleared {len(previous_sessions)} previous session(s) for agent_id: {agent_id}")
 
     try:
-        agent_config = parse_agent_config(flow)
-        # logger.info(f"Global prompt for agent {agent_config}")
-
-        for node in agent_config.nodes or []:
-            if node.type == "function" and node.custom_function:
-                validate_custom_function(node.custom_function.code)
-
-        vector_store_id = getattr(agent_config.global_settings, "vector_store_id", None)
-        if vector_store_id:
+        # Parsed and validated once per flow version, see app/core/flow_cache.py
+        compiled_flow = flow_cache.get(agent_id)
+        if not compiled_flow:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Agent configuration with ID '{agent_id}' not found in MongoDB"
+            )
+        agent_config = compiled_flow.agent_config
+
+        for vector_store_id in agent_store_ids(agent_config):
             try:
-                load_vector_store_from_mongo(vector_store_id)
+                validate_vector_store(vector_store_id)
             except HTTPException as e:
                 logger.error(f"Vector store validation failed: {e.detail}")
                 raise HTTPException(
@@ -69,21 +78,34 @@ async def start_agent_from_mongo(
                     detail=f"Vector store ID '{vector_store_id}' is not available or invalid. "
                 )
 
-        room_name = f"room-{uuid.uuid4().hex[:6]}"
-        agent_name = f"agent-{uuid.uuid4().hex[:6]}"
-        identity = f"user-{uuid.uuid4().hex[:6]}"
-
-        token = get_token(agent=agent_name, agent_id=agent_id, identity=identity, room=room_name)
-        ws_token = generate_ws_token(agent_id)
-
-        task = asyncio.create_task(agent_run(agent_name=agent_name, agent_id=agent_id))
-        agent_sessions[agent_id] = {
-            "active": True,
-            "status": "connected",
-            "room_name": room_name,
-            "started_at": datetime.now().isoformat(),
-            "task": task
-        }
+        # Waits for a free slot, or raises 429 with Retry-After when the host is full
+        await admission_controller.acquire(agent_id)
+        # Until the session task holds the slot, any failure (or cancellation) must give it back
+        try:
+            try:
+                agent_name = worker_pool.acquire().agent_name
+            except RuntimeError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+
+            room_name = f"room-{uuid.uuid4().hex[:6]}"
+            identity = f"user-{uuid.uuid4().hex[:6]}"
+
+            # The token carries the dispatch to the pooled worker when the user joins the room
+            token = get_token(
+                agent=agent_name,
+                agent_id=agent_id,
+                identity=identity,
+                room=room_name,
+                metadata={"flow_version": compiled_flow.version}
+            )
+            ws_token = generate_ws_token(agent_id)
+
+            task = asyncio.create_task(worker_pool.wait_for_session(agent_name, room_name))
+            admission_controller.hold_until_done(agent_id, task)
+        except BaseException:
+            admission_controller.release(agent_id)
+            raise
+        session_registry.register(agent_id=agent_id, room_name=room_name, agent_name=agent_name, task=task)
 
         return {
             "status": "success",
@@ -116,47 +138,27 @@ async def start_agent_from_mongo(
 
 
 @router.post("/stop-agent/{agent_id}")
-async def disconnect_agent(agent_id: str):
-    agent_info = agent_sessions.get(agent_id)
+async def disconnect_agent(
+    agent_id: str,
+    room_name: Optional[str] = Query(None, description="Stop only this session; defaults to all active sessions of the agent")
+):
+    if room_name:
+        session = session_registry.get(room_name)
+        sessions = [session] if session and session["agent_id"] == agent_id and session["active"] else []
+    else:
+        sessions = session_registry.find(agent_id=agent_id, active=True)
 
-    if not agent_info:
+    if not sessions:
         logger.warning(f"Agent {agent_id} not found for disconnection.")
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    room_name = agent_info.get("room_name")
-
-    try:
-        async with LiveKitAPI(
-            url=settings.LIVEKIT_URL,
-            api_key=settings.LIVEKIT_API_KEY,
-            api_secret=settings.LIVEKIT_API_SECRET
-        ) as lkapi:
-            await lkapi.room.delete_room(DeleteRoomRequest(room=room_name))
-            logger.info(f"Room '{room_name}' deleted from LiveKit.")
-    except Exception as e:
-        logger.error(f"Failed to delete room '{room_name}': {e}")
-
-    task = agent_info.get("task")
-    if task and not task.done():
-        try:
-            logger.info(f"Cancelling background task for agent {agent_id}...")
-            task.cancel()
-            await task
-        except asyncio.CancelledError:
-            logger.info(f"Task for agent {agent_id} cancelled.")
-        except Exception as e:
-            logger.exception(f"Error while cancelling task for agent {agent_id}: {str(e)}")
-
-    # 🗂 Update status
-    agent_info.update({
-        "active": False,
-        "status": "disconnected",
-        "room_name": None,
-        "task": None
-    })
+    for session in sessions:
+        logger.info(f"Stopping session {session['room_name']} for agent {agent_id}...")
+        await end_session(session)
 
     logger.info(f"Agent {agent_id} disconnected successfully.")
     return {
         "status": "success",
-        "message": f"Agent {agent_id} disconnected"
+        "message": f"Agent {agent_id} disconnected",
+        "room_names": [session["room_name"] for session in sessions]
     }
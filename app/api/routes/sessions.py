@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+import logging
+from app.core.session_registry import session_registry
+
+logger = logging.getLogger("api")
+
+router = APIRouter()
+
+
+@router.get("/", summary="List agent sessions")
+async def list_sessions(
+    agent_id: Optional[str] = Query(None),
+    phone_number: Optional[str] = Query(None),
+    active: Optional[bool] = Query(None),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    return session_registry.find(agent_id=agent_id, phone_number=phone_number, active=active, limit=limit)
+
+
+@router.get("/stats", summary="Session registry statistics")
+async def get_session_stats():
+    return session_registry.stats()
+
+
+@router.get("/{room_name}", summary="Get a session by room name")
+async def get_session(room_name: str):
+    session = session_registry.get(room_name)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
@@ -3,12 +3,12 @@ from app.utils.mongodb_client import MongoDBClient
 import uuid
 import logging
 import asyncio
-from datetime import datetime
-from app.utils.vector_store_utils import load_vector_store_from_mongo
-from app.utils.node_parser import parse_agent_config
-from app.utils.validators import validate_custom_function
-from app.utils.dispatch_service import create_agent_dispatch
-from app.core.start_agent import agent_run
+from app.utils.vector_store_utils import validate_vector_store
+from app.core.flow_cache import flow_cache
+from app.core.flow_graph import agent_store_ids
+from app.core.worker_pool import worker_pool
+from app.core.admission import admission_controller
+from app.core.session_registry import session_registry
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("agent-runner")
 from fastapi import Body
@@ -16,34 +16,57 @@ from fastapi import Body
 router = APIRouter()
 mongo_client = MongoDBClient()
 
-agent_sessions = {}
-
 from pydantic import ValidationError
 
+async def dispatch_to_pool(agent_id: str, room_name: str, phone_number: str, flow_version: str,
+                           admission_timeout: float = None):
+    """Admit, dispatch and register one outbound call; the admission slot is held until the call ends."""
+    await admission_controller.acquire(agent_id, timeout=admission_timeout)
+    # Until the session task holds the slot, any failure (or cancellation) must give it back
+    try:
+        try:
+            agent_name, dispatch = await worker_pool.dispatch(
+                agent_id, room_name, phone_number=phone_number, metadata={"flow_version": flow_version}
+            )
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+        if not dispatch:
+            raise HTTPException(status_code=502, detail=f"Failed to dispatch agent for {phone_number}")
+
+        task = asyncio.create_task(worker_pool.wait_for_session(agent_name, room_name))
+        admission_controller.hold_until_done(agent_id, task)
+    except BaseException:
+        admission_controller.release(agent_id)
+        raise
+    session_registry.register(
+        agent_id=agent_id,
+        room_name=room_name,
+        agent_name=agent_name,
+        task=task,
+        phone_number=phone_number,
+        kind="telephony",
+    )
+    return agent_name, dispatch
+
 @router.post("/start-call/{agent_id}")
 async def start_agent_from_mongo(
     agent_id: str,
     background_tasks: BackgroundTasks,
     phone_number: str = Query(..., description="Phone number to call (e.g., +918108709605)")
 ):
-    flow = mongo_client.get_flow_by_id(agent_id)
-    if not flow:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Agent configuration with ID '{agent_id}' not found in MongoDB"
-        )
-
     try:
-        agent_config = parse_agent_config(flow)
-        
-        for node in agent_config.nodes or []:
-            if node.type == "function" and node.custom_function:
-                validate_custom_function(node.custom_function.code)
-
-        vector_store_id = getattr(agent_config.global_settings, "vector_store_id", None)
-        if vector_store_id:
+        compiled_flow = flow_cache.get(agent_id)
+        if not compiled_flow:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Agent configuration with ID '{agent_id}' not found in MongoDB"
+            )
+        agent_config = compiled_flow.agent_config
+
+        for vector_store_id in agent_store_ids(agent_config):
             try:
-                load_vector_store_from_mongo(vector_store_id)
+                validate_vector_store(vector_store_id)
             except HTTPException as e:
                 logger.error(f"Vector store validation failed: {e.detail}")
                 raise HTTPException(
@@ -52,18 +75,8 @@ async def start_agent_from_mongo(
                 )
 
         room_name = f"room-{uuid.uuid4().hex[:6]}"
-        agent_name = f"agent-{uuid.uuid4().hex[:6]}"
-        
-        task = asyncio.create_task(agent_run(agent_name=agent_name, agent_id=agent_id))
-        dispatch = await create_agent_dispatch(agent_id=agent_id, phone_number=phone_number, agent_name=agent_name, room_name=room_name)
-
-        agent_sessions[agent_id] = {
-            "active": True,
-            "status": "connected",
-            "room_name": room_name,
-            "started_at": datetime.now().isoformat(),
-            "task": task
-        }
+
+        agent_name, dispatch = await dispatch_to_pool(agent_id, room_name, phone_number, compiled_flow.version)
 
         return {
             "status": "success",
@@ -95,25 +108,18 @@ async def start_batch_agent_calls(
     background_tasks: BackgroundTasks,
     phone_numbers: list[str] = Body(..., embed=True)
 ):
-    flow = mongo_client.get_flow_by_id(agent_id)
-
-    if not flow:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Agent configuration with ID '{agent_id}' not found in MongoDB"
-        )
-
     try:
-        agent_config = parse_agent_config(flow)
-
-        for node in agent_config.nodes or []:
-            if node.type == "function" and node.custom_function:
-                validate_custom_function(node.custom_function.code)
-
-        vector_store_id = getattr(agent_config.global_settings, "vector_store_id", None)
-        if vector_store_id:
+        compiled_flow = flow_cache.get(agent_id)
+        if not compiled_flow:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Agent configuration with ID '{agent_id}' not found in MongoDB"
+            )
+        agent_config = compiled_flow.agent_config
+
+        for vector_store_id in agent_store_ids(agent_config):
             try:
-                load_vector_store_from_mongo(vector_store_id)
+                validate_vector_store(vector_store_id)
             except HTTPException as e:
                 logger.error(f"Vector store validation failed: {e.detail}")
                 raise HTTPException(
@@ -122,21 +128,21 @@ async def start_batch_agent_calls(
                 )
 
         results = []
+        rejected = []
 
         for phone_number in phone_numbers:
             room_name = f"room-{uuid.uuid4().hex[:6]}"
-            agent_name = f"agent-{uuid.uuid4().hex[:6]}"
-            dispatch = await create_agent_dispatch(agent_id=agent_id, phone_number=phone_number, agent_name=agent_name, room_name=room_name)
-
-            task = asyncio.create_task(agent_run(agent_name=agent_name, agent_id=agent_id))
-
-            agent_sessions[agent_id + "_" + phone_number] = {
-                "active": True,
-                "status": "connected",
-                "room_name": room_name,
-                "started_at": datetime.now().isoformat(),
-                "task": task
-            }
+            try:
+                # Only the first call in a batch may queue; the rest are admitted or rejected immediately
+                agent_name, dispatch = await dispatch_to_pool(
+                    agent_id, room_name, phone_number, compiled_flow.version,
+                    admission_timeout=None if not results and not rejected else 0
+                )
+            except HTTPException as e:
+                if e.status_code != 429:
+                    raise
+                rejected.append(phone_number)
+                continue
 
             results.append({
                 "agent_id": agent_id,
@@ -146,10 +152,18 @@ async def start_batch_agent_calls(
                 "phone_number": phone_number
             })
 
+        if not results and rejected:
+            raise HTTPException(
+                status_code=429,
+                detail="Server is at capacity. Please retry later.",
+                headers={"Retry-After": str(admission_controller.retry_after)}
+            )
+
         return {
             "status": "success",
             "total_calls": len(results),
-            "calls": results
+            "calls": results,
+            "rejected_phone_numbers": rejected
         }
 
     except ValidationError as ve:
@@ -1,27 +1,27 @@
-from fastapi import APIRouter, HTTPException, Body, Path, status, UploadFile, File, Query, Request
+from fastapi import APIRouter, HTTPException, Body, Path, status, UploadFile, File, Query, Request, Response
+from typing import Optional
 from app.core.models import VectorStoreConfig
 import logging
-import tempfile
 import shutil
-from pathlib import Path as FsPath
 from bson import ObjectId
 from llama_index.core import (
-    SimpleDirectoryReader,
     VectorStoreIndex,
     StorageContext,
     load_index_from_storage
 )
-from llama_index.core.node_parser import SentenceSplitter
 from datetime import datetime
 from app.utils.vector_store_utils import (
     get_embed_model,
     VECTOR_BASE_DIR,
-    load_vector_store_from_mongo,
+    parse_object_id,
+    read_manifest,
+    persist_index,
 )
 from app.utils.mongodb_client import MongoDBClient
-from io import BytesIO
-import requests
-import uuid
+from app.core.vector_index_cache import vector_index_cache
+from app.core.query_cache import query_cache
+from app.utils.kb_sync import SYNC_FIELD
+from app.core.ingestion_jobs import ingestion_jobs
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -30,6 +30,11 @@ mongo_client = MongoDBClient()
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_vector_store(config: VectorStoreConfig = Body(...)):
+    if config.index_type not in ("exact", "ivf"):
+        raise HTTPException(status_code=400, detail="index_type must be 'exact' or 'ivf'")
+    if config.quantization not in ("none", "float16", "int8"):
+        raise HTTPException(status_code=400, detail="quantization must be 'none', 'float16' or 'int8'")
+
     try:
         # Check if name already exists (optional uniqueness enforcement)
         existing = mongo_client.get_vector_store_by_name(config.name)
@@ -50,9 +55,7 @@ async def create_vector_store(config: VectorStoreConfig = Body(...)):
         result = mongo_client.db["vector_stores"].insert_one(metadata)
         store_id = str(result.inserted_id)
 
-        store_path = VECTOR_BASE_DIR / store_id
-        store_path.mkdir(parents=True, exist_ok=True)
-        index.storage_context.persist(persist_dir=str(store_path))
+        persist_index(store_id, index, config.dict())
 
         return {"store_id": store_id, "name": config.name, "status": "created"}
 
@@ -74,6 +77,27 @@ async def list_vector_stores():
     ]
 
 
+@router.get("/jobs", summary="List ingestion jobs")
+async def list_ingestion_jobs(store_id: Optional[str] = Query(None)):
+    return [job.to_dict() for job in ingestion_jobs.find(store_id)]
+
+
+@router.get("/jobs/{job_id}", summary="Get the status of an ingestion job")
+async def get_ingestion_job(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job.to_dict()
+
+
+@router.post("/jobs/{job_id}/cancel", summary="Cancel an ingestion job")
+async def cancel_ingestion_job(job_id: str):
+    job = ingestion_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job.to_dict()
+
+
 @router.get("/{store_id}", summary="Get details of a specific vector store")
 async def get_vector_store(store_id: str = Path(..., description="Vector store ID")):
     try:
@@ -89,7 +113,12 @@ async def get_vector_store(store_id: str = Path(..., description="Vector store I
         "id": str(store_info["_id"]),
         "name": store_info["name"],
         "documents": store_info["documents"],
-        "config": {k: v for k, v in store_info["config"].items() if k != "api_key"}
+        "config": {k: v for k, v in store_info["config"].items() if k != "api_key"},
+        "manifest": read_manifest(store_id),
+        "synced_documents": [
+            {**{k: v for k, v in entry.items() if k != "node_ids"}, "node_count": len(entry.get("node_ids", []))}
+            for entry in store_info.get(SYNC_FIELD, [])
+        ]
     }
 
 
@@ -104,96 +133,56 @@ async def delete_vector_store(store_id: str = Path(..., description="Vector stor
     if not store_info:
         raise HTTPException(status_code=404, detail="Vector store not found")
 
+    # A sync still running would persist the index and sync state of the deleted store
+    active_jobs = [job for job in ingestion_jobs.find(store_id) if job.active]
+    while active_jobs:
+        for job in active_jobs:
+            ingestion_jobs.cancel(job.job_id)
+        for job in active_jobs:
+            await ingestion_jobs.wait(job)
+        active_jobs = [job for job in ingestion_jobs.find(store_id) if job.active]
+
     try:
         store_path = VECTOR_BASE_DIR / store_id
         if store_path.exists():
             shutil.rmtree(store_path)
 
         mongo_client.delete_vector_store(key)
+        vector_index_cache.invalidate(store_id)
+        query_cache.invalidate(store_id)
         return {"status": "deleted", "store_id": store_id}
     except Exception as e:
         logger.exception(f"Error deleting vector store {store_id}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/{store_id}/vectorize", status_code=status.HTTP_201_CREATED)
+@router.post("/{store_id}/vectorize", status_code=status.HTTP_202_ACCEPTED)
 async def initialize_vector_store_from_knowledgebase(
-    store_id: str = Path(..., description="Vector store ID to initialize")
+    response: Response,
+    store_id: str = Path(..., description="Vector store ID to initialize"),
+    wait: bool = Query(False, description="Wait for the sync to finish and return its result")
 ):
-    try:
-        vs_info = load_vector_store_from_mongo(store_id)
-        config = vs_info["config"]
-        chunk_size = config.get("chunk_size", 512)
-        chunk_overlap = config.get("chunk_overlap", 100)
-        knowledgebase_id = config.get("knowledgeBase_id")
-
-        if not knowledgebase_id:
-            raise HTTPException(status_code=400, detail="No knowledgeBase_id found in vector store config.")
-
-        kb = mongo_client.get_knowledgebase_by_id(knowledgebase_id)
-        if not kb:
-            raise HTTPException(status_code=404, detail="Knowledgebase not found")
+    key = parse_object_id(store_id)
+    if not mongo_client.get_vector_store_metadata(key, ["_id"]):
+        raise HTTPException(status_code=404, detail="Vector store not found")
 
-        documents = kb.get("documents", [])
-        if not documents:
-            raise HTTPException(status_code=404, detail="No documents in knowledgebase")
+    # Runs in the background; poll GET /vector_stores/jobs/{job_id}
+    job = ingestion_jobs.submit(store_id)
+    if not wait:
+        return job.to_dict()
 
-        embed_model = vs_info["embed_model"]
-        store_path = VECTOR_BASE_DIR / store_id
-        index = vs_info.get("index") or VectorStoreIndex(nodes=[], embed_model=embed_model)
-
-        added_docs = []
-
-        for doc in documents:
-            file_url = doc.get("filepath")
-            filename = doc.get("filename")
-
-            if not file_url or not filename:
-                continue
-
-            response = requests.get(file_url)
-            if response.status_code != 200:
-                continue
-
-            file_bytes = BytesIO(response.content)
-            suffix = FsPath(filename).suffix or ".pdf"
-            temp_path = FsPath(tempfile.gettempdir()) / f"{uuid.uuid4()}{suffix}"
-
-            with open(temp_path, "wb") as f:
-                f.write(file_bytes.read())
-
-            try:
-                reader = SimpleDirectoryReader(input_files=[str(temp_path)])
-                loaded_docs = reader.load_data()
-                splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-                nodes = splitter.get_nodes_from_documents(loaded_docs)
-                index.insert_nodes(nodes)
-
-                added_docs.append(filename)
-            finally:
-                try:
-                    temp_path.unlink(missing_ok=True)
-                except Exception:
-                    pass
-
-        index.storage_context.persist(persist_dir=str(store_path))
-
-        # Update just timestamp in MongoDB
-        mongo_client.save_vector_store({
-            "_id": vs_info["_id"],
-            "updatedAt": datetime.utcnow().isoformat()
-        })
-
-        return {
-            "status": "success",
-            "store_id": store_id,
-            "message": f"Initialized vector store with {len(added_docs)} documents from knowledgebase",
-            "document_names": added_docs
-        }
+    await ingestion_jobs.wait(job)
+    if job.status != "succeeded":
+        raise HTTPException(status_code=500, detail=f"Vector store sync {job.status}: {job.error}")
 
-    except HTTPException as http_exc:
-        raise http_exc
-    except Exception as e:
-        import logging
-        logging.exception("Vector store initialization failed")
-        raise HTTPException(status_code=500, detail="Internal error while initializing vector store")
\ No newline at end of file
+    result = job.result
+    synced = len(result["added"]) + len(result["updated"]) + len(result["unchanged"])
+    response.status_code = status.HTTP_201_CREATED
+    return {
+        "status": "success",
+        "store_id": store_id,
+        "job_id": job.job_id,
+        "message": f"Synced vector store with {synced} documents from knowledgebase",
+        "document_names": result["added"] + result["updated"] + result["unchanged"],
+        **result
+    }
\ No newline at end of file
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Body
+import logging
+from app.core.worker_pool import worker_pool
+from app.core.admission import admission_controller
+from app.core.flow_cache import flow_cache
+from app.core.function_cache import function_cache
+from app.core.vector_index_cache import vector_index_cache
+from app.core.query_cache import query_cache
+from app.core.embedding_cache import embedding_cache
+
+logger = logging.getLogger("api")
+
+router = APIRouter()
+
+
+@router.get("/pool", summary="Show the agent worker pool")
+async def get_worker_pool():
+    return worker_pool.stats()
+
+
+@router.put("/pool", summary="Resize the agent worker pool")
+async def resize_worker_pool(size: int = Body(..., embed=True, ge=0)):
+    try:
+        return await worker_pool.resize(size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/load", summary="Show admission control state and host load")
+async def get_worker_load():
+    return admission_controller.stats()
+
+
+@router.get("/caches", summary="Show flow, custom function, vector index, query and embedding cache counters")
+async def get_cache_stats():
+    return {
+        "flows": flow_cache.stats(),
+        "custom_functions": function_cache.stats(),
+        "vector_indexes": vector_index_cache.stats(),
+        "queries": query_cache.stats(),
+        "embeddings": embedding_cache.stats(),
+    }
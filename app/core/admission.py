@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, List, Optional
+import psutil
+from fastapi import HTTPException
+from app.core.config import settings
+
+logger = logging.getLogger("admission")
+
+
+class AdmissionController:
+    """
+    Gate for new agent sessions.
+
+    Tracks active sessions, CPU usage and event-loop lag. A new session is admitted
+    only while the global and per-agent limits have room and the host is not
+    overloaded; otherwise the request waits in a bounded queue and is rejected with
+    429 and a Retry-After header when the wait runs out.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        max_sessions_per_agent: int,
+        max_queue: int,
+        queue_timeout: float,
+        cpu_threshold: float,
+        loop_lag_threshold: float,
+        sample_interval: float = 0.5,
+    ):
+        self.max_sessions = max_sessions
+        self.max_sessions_per_agent = max_sessions_per_agent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.cpu_threshold = cpu_threshold
+        self.loop_lag_threshold = loop_lag_threshold
+        self.sample_interval = sample_interval
+
+        self.active_sessions = 0
+        self.sessions_per_agent: Dict[str, int] = {}
+        self.cpu_percent = 0.0
+        self.loop_lag = 0.0
+        self.admitted = 0
+        self.rejected = 0
+
+        self._waiters: List[asyncio.Future] = []
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    # ---------------------- LOAD SIGNAL ----------------------
+
+    async def start(self):
+        if self._monitor_task and not self._monitor_task.done():
+            return
+        psutil.cpu_percent(interval=None)  # Prime the counter, the first reading is meaningless
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        if self._monitor_task and not self._monitor_task.done():
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _monitor(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(self.sample_interval)
+            lag = max(loop.time() - before - self.sample_interval, 0.0)
+            # Smooth both signals so one slow tick does not flap admission
+            self.loop_lag = 0.7 * self.loop_lag + 0.3 * lag
+            self.cpu_percent = 0.7 * self.cpu_percent + 0.3 * psutil.cpu_percent(interval=None)
+            if not self.is_overloaded():
+                self._wake_waiters()
+
+    def is_overloaded(self) -> bool:
+        return self.cpu_percent >= self.cpu_threshold or self.loop_lag >= self.loop_lag_threshold
+
+    def load(self) -> float:
+        """Load between 0 and 1 shared with the LiveKit workers through `load_fnc`."""
+        session_load = self.active_sessions / self.max_sessions if self.max_sessions > 0 else 0.0
+        cpu_load = self.cpu_percent / 100.0
+        lag_load = self.loop_lag / self.loop_lag_threshold if self.loop_lag_threshold > 0 else 0.0
+        return min(max(session_load, cpu_load, lag_load), 1.0)
+
+    # ---------------------- ADMISSION ----------------------
+
+    def _has_capacity(self, agent_id: str) -> bool:
+        if self.is_overloaded():
+            return False
+        if self.max_sessions > 0 and self.active_sessions >= self.max_sessions:
+            return False
+        if self.max_sessions_per_agent > 0 and \
+                self.sessions_per_agent.get(agent_id, 0) >= self.max_sessions_per_agent:
+            return False
+        return True
+
+    def _admit(self, agent_id: str):
+        self.active_sessions += 1
+        self.sessions_per_agent[agent_id] = self.sessions_per_agent.get(agent_id, 0) + 1
+        self.admitted += 1
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    def _reject(self, agent_id: str, reason: str) -> HTTPException:
+        self.rejected += 1
+        logger.warning(f"Rejected session for agent {agent_id}: {reason}")
+        return HTTPException(
+            status_code=429,
+            detail=f"Server is at capacity ({reason}). Please retry later.",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def _wake_waiters(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def acquire(self, agent_id: str, timeout: Optional[float] = None):
+        """
+        Reserve a session slot for `agent_id`, waiting up to `timeout` seconds
+        (defaults to the queue timeout). Raises HTTPException(429) when no slot frees up.
+        """
+        if self._has_capacity(agent_id):
+            self._admit(agent_id)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(agent_id, "admission queue is full")
+
+        loop = asyncio.get_running_loop()
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = loop.time() + timeout
+        queued_at = time.perf_counter()
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise self._reject(agent_id, "no capacity freed up in time")
+
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=min(remaining, self.sample_interval))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiters.remove(waiter)
+
+            if self._has_capacity(agent_id):
+                self._admit(agent_id)
+                logger.info(f"Admitted queued session for agent {agent_id} after {time.perf_counter() - queued_at:.2f}s")
+                return
+
+    def release(self, agent_id: str):
+        if self.active_sessions > 0:
+            self.active_sessions -= 1
+        remaining = self.sessions_per_agent.get(agent_id, 0) - 1
+        if remaining > 0:
+            self.sessions_per_agent[agent_id] = remaining
+        else:
+            self.sessions_per_agent.pop(agent_id, None)
+        self._wake_waiters()
+
+    def hold_until_done(self, agent_id: str, task: asyncio.Task):
+        """Keep the slot reserved for as long as the session task runs."""
+        task.add_done_callback(lambda _: self.release(agent_id))
+
+    def stats(self) -> dict:
+        return {
+            "load": round(self.load(), 3),
+            "overloaded": self.is_overloaded(),
+            "active_sessions": self.active_sessions,
+            "sessions_per_agent": dict(self.sessions_per_agent),
+            "queued": len(self._waiters),
+            "cpu_percent": round(self.cpu_percent, 1),
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "limits": {
+                "max_sessions": self.max_sessions,
+                "max_sessions_per_agent": self.max_sessions_per_agent,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "cpu_threshold": self.cpu_threshold,
+                "loop_lag_threshold": self.loop_lag_threshold,
+            },
+        }
+
+
+admission_controller = AdmissionController(
+    max_sessions=settings.ADMISSION_MAX_SESSIONS,
+    max_sessions_per_agent=settings.ADMISSION_MAX_SESSIONS_PER_AGENT,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    cpu_threshold=settings.ADMISSION_CPU_THRESHOLD,
+    loop_lag_threshold=settings.ADMISSION_LOOP_LAG_THRESHOLD,
+)
+
+
+def worker_load(worker=None) -> float:
+    """`load_fnc` for the pooled workers, so LiveKit stops routing jobs here when we are full."""
+    return admission_controller.load()
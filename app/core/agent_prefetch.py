@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger("AgentPrefetch")
+
+
+class AgentPrefetcher:
+    """
+    Speculatively builds the agents of the nodes reachable from the current one.
+
+    While a node is speaking, the agents of its route targets are built in the
+    background and kept in a small per-session LRU. When a route tool fires the
+    prebuilt agent is handed over instead of being built on the spot. A prebuilt
+    agent can only be activated once, so it is removed from the cache when taken.
+    """
+
+    def __init__(self, build_agent: Callable[[str], Awaitable[Any]], max_agents: int):
+        """
+        Args:
+            build_agent: Coroutine building the agent of a node, without side effects
+            max_agents: Maximum number of prebuilt agents kept for the session
+        """
+        self.build_agent = build_agent
+        self.max_agents = max_agents
+        self._agents: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.failures = 0
+
+    async def _build(self, node_id: str):
+        start = time.perf_counter()
+        agent = await self.build_agent(node_id)
+        logger.debug(f"Prefetched agent for node {node_id} in {time.perf_counter() - start:.4f}s")
+        return agent
+
+    def prefetch(self, node_ids: Iterable[str]):
+        """Start building the agents for `node_ids` that are not cached yet."""
+        if self.max_agents <= 0:
+            return
+        for node_id in node_ids:
+            if node_id in self._agents:
+                self._agents.move_to_end(node_id)
+                continue
+            self._agents[node_id] = asyncio.create_task(self._build(node_id))
+            while len(self._agents) > self.max_agents:
+                _, task = self._agents.popitem(last=False)
+                task.cancel()
+                self.evictions += 1
+
+    async def take(self, node_id: str) -> Optional[Any]:
+        """Hand over the prebuilt agent for `node_id`, or None if there is none."""
+        task = self._agents.pop(node_id, None)
+        if task is None:
+            self.misses += 1
+            return None
+        try:
+            agent = await task
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+            self.misses += 1
+            return None
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Prefetching agent for node {node_id} failed: {e}")
+            return None
+        self.hits += 1
+        return agent
+
+    def close(self):
+        for task in self._agents.values():
+            task.cancel()
+        self._agents.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": list(self._agents),
+            "max_agents": self.max_agents,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "failures": self.failures,
+        }
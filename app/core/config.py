@@ -11,6 +11,93 @@ class Settings:
     MONGODB_NAME: str = os.getenv("MONGODB_NAME")
     SIP_OUTBOUND_TRUNK_ID: str = os.getenv("SIP_OUTBOUND_TRUNK_ID", "default_trunk_id")
 
+    # Long-lived agent workers shared by every session started from this API process
+    AGENT_WORKER_POOL_SIZE: int = int(os.getenv("AGENT_WORKER_POOL_SIZE", "2"))
+    AGENT_WORKER_PREFIX: str = os.getenv("AGENT_WORKER_PREFIX", "algo-vox-agent")
+    AGENT_SESSION_START_TIMEOUT: float = float(os.getenv("AGENT_SESSION_START_TIMEOUT", "120"))
+
+    # Load VAD (and optionally the turn detector) once per job process instead of once per call
+    AGENT_PREWARM: bool = os.getenv("AGENT_PREWARM", "true").lower() == "true"
+    ENABLE_TURN_DETECTOR: bool = os.getenv("ENABLE_TURN_DETECTOR", "false").lower() == "true"
+
+    # Admission control for new sessions
+    ADMISSION_MAX_SESSIONS: int = int(os.getenv("ADMISSION_MAX_SESSIONS", "50"))
+    ADMISSION_MAX_SESSIONS_PER_AGENT: int = int(os.getenv("ADMISSION_MAX_SESSIONS_PER_AGENT", "20"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+    ADMISSION_CPU_THRESHOLD: float = float(os.getenv("ADMISSION_CPU_THRESHOLD", "85"))
+    ADMISSION_LOOP_LAG_THRESHOLD: float = float(os.getenv("ADMISSION_LOOP_LAG_THRESHOLD", "0.25"))
+    WORKER_LOAD_THRESHOLD: float = float(os.getenv("WORKER_LOAD_THRESHOLD", "0.9"))
+
+    # Session registry: "memory" for a single process, "mongo" to share sessions across processes/hosts
+    SESSION_REGISTRY_BACKEND: str = os.getenv("SESSION_REGISTRY_BACKEND", "memory").lower()
+    SESSION_REGISTRY_TTL_SECONDS: float = float(os.getenv("SESSION_REGISTRY_TTL_SECONDS", "3600"))
+
+    # Compiled flow cache of each process; warm in the API, cold in every agent job
+    FLOW_CACHE_MAX_ENTRIES: int = int(os.getenv("FLOW_CACHE_MAX_ENTRIES", "256"))
+    FLOW_CACHE_TTL_SECONDS: float = float(os.getenv("FLOW_CACHE_TTL_SECONDS", "30"))
+
+    # Compiled custom function code, keyed by a hash of the source
+    CUSTOM_FUNCTION_CACHE_MAX_ENTRIES: int = int(os.getenv("CUSTOM_FUNCTION_CACHE_MAX_ENTRIES", "512"))
+
+    # Build the agents of the next nodes in the background while the current node speaks
+    AGENT_SPECULATIVE_PREFETCH: bool = os.getenv("AGENT_SPECULATIVE_PREFETCH", "false").lower() == "true"
+    AGENT_PREFETCH_MAX_AGENTS: int = int(os.getenv("AGENT_PREFETCH_MAX_AGENTS", "8"))
+
+    # On-disk index format: "memmap" (float32 matrix and chunk records, memory mapped) or llama_index "json"
+    VECTOR_STORE_FORMAT: str = os.getenv("VECTOR_STORE_FORMAT", "memmap").lower()
+
+    # IVF approximate index of stores with index_type "ivf" (memmap format only), built once they reach IVF_MIN_CHUNKS;
+    # IVF_NLIST 0 picks sqrt(chunks) lists, probing more lists per query raises recall and latency
+    IVF_MIN_CHUNKS: int = int(os.getenv("IVF_MIN_CHUNKS", "20000"))
+    IVF_NLIST: int = int(os.getenv("IVF_NLIST", "0"))
+    IVF_NPROBE: int = int(os.getenv("IVF_NPROBE", "16"))
+
+    # Quantised stores (quantization "float16" or "int8") rescore this many candidates per result at full precision
+    VECTOR_RESCORE_FACTOR: int = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+
+    # Loaded vector indexes kept per process, bounded by their approximate size
+    VECTOR_INDEX_CACHE_MAX_MB: int = int(os.getenv("VECTOR_INDEX_CACHE_MAX_MB", "1024"))
+    VECTOR_INDEX_CACHE_MAX_ENTRIES: int = int(os.getenv("VECTOR_INDEX_CACHE_MAX_ENTRIES", "32"))
+
+    # query_info defaults: "retrieval" hands the top-k chunks to the session LLM, "synthesis" answers with a second LLM call
+    KB_QUERY_MODE: str = os.getenv("KB_QUERY_MODE", "retrieval").lower()
+    KB_TOP_K: int = int(os.getenv("KB_TOP_K", "4"))
+    KB_TOKEN_BUDGET: int = int(os.getenv("KB_TOKEN_BUDGET", "800"))
+
+    # BM25 index built at vectorize for the "hybrid" query mode. Its results are returned alone, without an
+    # embedding call, when the best chunk covers KB_LEXICAL_MIN_COVERAGE of the query's idf weight and
+    # outscores the next one by KB_LEXICAL_MIN_MARGIN; otherwise they are fused with the vector results
+    KB_LEXICAL_INDEX_ENABLED: bool = os.getenv("KB_LEXICAL_INDEX_ENABLED", "true").lower() == "true"
+    KB_LEXICAL_MIN_COVERAGE: float = float(os.getenv("KB_LEXICAL_MIN_COVERAGE", "0.9"))
+    KB_LEXICAL_MIN_MARGIN: float = float(os.getenv("KB_LEXICAL_MIN_MARGIN", "1.2"))
+
+    # query_info starts retrieval at once and speaks the filler only if it is still running after the delay;
+    # past the deadline it returns the partial (BM25) or fallback answer instead of waiting
+    KB_FILLER_TEXT: str = os.getenv("KB_FILLER_TEXT", "One moment while I look that up.")
+    KB_FILLER_DELAY_SECONDS: float = float(os.getenv("KB_FILLER_DELAY_SECONDS", "0.3"))
+    KB_FILLER_CACHE_MAX_ENTRIES: int = int(os.getenv("KB_FILLER_CACHE_MAX_ENTRIES", "32"))
+    KB_QUERY_DEADLINE_SECONDS: float = float(os.getenv("KB_QUERY_DEADLINE_SECONDS", "6"))
+
+    # query_info answers cached per store; a semantic threshold in (0, 1] also reuses answers of similar queries
+    KB_QUERY_CACHE_ENABLED: bool = os.getenv("KB_QUERY_CACHE_ENABLED", "true").lower() == "true"
+    KB_QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("KB_QUERY_CACHE_MAX_ENTRIES", "256"))
+    KB_QUERY_CACHE_TTL_SECONDS: float = float(os.getenv("KB_QUERY_CACHE_TTL_SECONDS", "3600"))
+    KB_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("KB_SEMANTIC_CACHE_THRESHOLD", "0"))
+
+    # Chunk embeddings reused across vectorize runs; defaults to vector_stores/embedding_cache.sqlite3
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "")
+
+    # Knowledge base ingestion: concurrent downloads, parse processes (0 = one per core), embedding batches
+    INGEST_DOWNLOAD_CONCURRENCY: int = int(os.getenv("INGEST_DOWNLOAD_CONCURRENCY", "8"))
+    INGEST_PARSE_WORKERS: int = int(os.getenv("INGEST_PARSE_WORKERS", "0"))
+    INGEST_EMBED_BATCH_SIZE: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "100"))
+    INGEST_EMBED_CONCURRENCY: int = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+    # Vectorize jobs running at once (never two for one store) and waiting in the queue
+    INGEST_MAX_CONCURRENT_JOBS: int = int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", "2"))
+    INGEST_MAX_QUEUED_JOBS: int = int(os.getenv("INGEST_MAX_QUEUED_JOBS", "32"))
+
     if not all([LIVEKIT_API_KEY, LIVEKIT_API_SECRET, LIVEKIT_URL, MONGODB_URI, MONGODB_NAME]):
         raise Exception("Environment variables not set properly. Please check your .env file.") 
 
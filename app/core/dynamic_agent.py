@@ -1,14 +1,12 @@
 import logging
-import sys
 from typing import Optional
-import time
-from livekit.agents import RunContext
 from livekit.agents.llm import function_tool
 from livekit.agents.voice import Agent
 from app.utils.call_control_tools import end_call ,detected_answering_machine, hangup
 from app.core.ws_manager import ws_manager
-from app.utils.query_tool import build_query_tool
-import copy
+from app.core.tool_registry import SessionToolRegistry
+from app.core.function_cache import function_cache
+from app.core.flow_graph import FlowGraph, build_flow_graph
 from datetime import datetime, timezone
 from app.utils.silence_detection import SilenceDetector
 
@@ -18,41 +16,14 @@ current_time = f"The current date and time is {now}."
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("DynamicAgent")
 
-async def generate_function_tools(config, module, agent_id, agent_config):
-    for route in config.get("routes", []):
-        tool_name = route["tool_name"]
-        next_node = route["next_node"]
-        tool_definition = route.get("condition", "")
-
-        frozen_config = copy.deepcopy(agent_config)
-
-        def make_tool(next_node_val, frozen_agent_config):
-            @function_tool(name=tool_name, description=f"Use this tool {tool_definition}")
-            async def tool_fn(context: RunContext):
-                start = time.perf_counter()
-                chat_ctx = context.session._chat_ctx
-                agent = await create_agent(
-                    next_node_val,
-                    chat_ctx=chat_ctx,
-                    agent_config=frozen_agent_config,
-                    agent_id=agent_id
-                )
-                end = time.perf_counter()
-                logger.info(f"Time taken to create agent: {end - start} seconds")
-                return agent
-            return tool_fn
-
-        if hasattr(module, tool_name):
-            delattr(module, tool_name)
-
-        setattr(module, tool_name, make_tool(next_node, frozen_config))
-
 class GenericAgent(Agent):
-    def __init__(self, prompt: str, tools: Optional[list] = None, chat_ctx=None, agent_config=None, node_config=None):
+    def __init__(self, prompt: str, tools: Optional[list] = None, chat_ctx=None, agent_config=None, node_config=None,
+                 tool_registry: Optional[SessionToolRegistry] = None):
         global_prompt = agent_config.global_settings.global_prompt if agent_config.global_settings else ""
 
         self._agent_config = agent_config
         self._node_config = node_config
+        self._tool_registry = tool_registry
         self._silence_detector = None  # Changed from _silence_task to _silence_detector
 
         super().__init__(
@@ -87,6 +58,12 @@ class GenericAgent(Agent):
     async def on_enter(self):
         """Start agent and silence detection."""
         logger.info(self.chat_ctx)
+
+        # Build the next nodes' agents while this node is speaking
+        prefetcher = self._tool_registry.prefetcher if self._tool_registry else None
+        if prefetcher and self._node_config:
+            prefetcher.prefetch(self._tool_registry.flow_graph.targets(self._node_config.node_id))
+
         await self.session.generate_reply()
         
         # Get timeout configuration
@@ -101,80 +78,80 @@ class GenericAgent(Agent):
             await self._silence_detector.stop()
             self._silence_detector = None
 
-async def create_agent(node_id: str, chat_ctx=None, agent_config=None, agent_id=None) -> Agent:
-    tools = []
-    if agent_config.global_settings and agent_config.global_settings.vector_store_id:
-        try:
-            query_tool = build_query_tool(agent_config.global_settings.vector_store_id)
-            tools.append(query_tool)
-        except Exception as e:
-            logger.error(f"Failed to load vector store tool: {e}")
+async def create_agent(
+    node_id: str,
+    chat_ctx=None,
+    agent_config=None,
+    agent_id=None,
+    flow_graph: Optional[FlowGraph] = None,
+    tool_registry: Optional[SessionToolRegistry] = None,
+) -> Agent:
+    if tool_registry is None:
+        if flow_graph is None:
+            flow_graph = build_flow_graph(agent_config)
+        # First node of a session; the route tools carry the registry to the following ones
+        tool_registry = SessionToolRegistry(agent_id, flow_graph, create_agent)
+
+    agent = None
+    if tool_registry.prefetcher:
+        agent = await tool_registry.prefetcher.take(node_id)
+        if agent is not None and chat_ctx is not None:
+            await agent.update_chat_ctx(chat_ctx)
+    if agent is None:
+        agent = await build_agent(node_id, tool_registry, chat_ctx=chat_ctx)
 
-    agent_flow = {node.node_id: node for node in agent_config.nodes}
+    if agent_id:
+        await ws_manager.send_node_update(agent_id, node_id)
+        logger.info(f"Node switched to: {node_id}")
 
-    if node_id not in agent_flow:
-        raise ValueError(f"Node '{node_id}' not found. Available nodes: {list(agent_flow.keys())}")
+    return agent
 
-    node_config = agent_flow[node_id]
-    node_type = node_config.type
-    if node_config.prompt:
-        prompt = node_config.prompt
-    elif node_config.static_sentence:
-        prompt = f"Say: {node_config.static_sentence}"
-    else:
-        prompt = ""
+async def build_agent(node_id: str, tool_registry: SessionToolRegistry, chat_ctx=None) -> Agent:
+    """Build the agent for a node without announcing the switch, so it can also be done ahead of time."""
+    flow_graph = tool_registry.flow_graph
+    agent_config = flow_graph.agent_config
+    agent_id = tool_registry.agent_id
 
-    if node_config.routes:
-        module = sys.modules[__name__]
-        await generate_function_tools(node_config.dict(), module, agent_id, agent_config)
-        for route in node_config.routes:
-            tools.append(getattr(module, route.tool_name))
+    node = flow_graph.node(node_id)
 
-    if node_config.is_end_node:
+    tools = []
+    query_tool = tool_registry.query_tool(node)
+    if query_tool:
+        tools.append(query_tool)
+
+    node_config = node.config
+    node_type = node.type
+    prompt = node.prompt
+
+    if node.routes:
+        tools.extend(tool_registry.route_tools(node))
+
+    if node.is_end_node:
         tools.append(end_call)
         logger.info(f"Added end_call tool to node {node_id}")
 
-    if node_config.detected_answering_machine:
+    if node.detected_answering_machine:
         tools.append(detected_answering_machine)
         logger.info(f"Added detected_answering_machine tool to node {node_id}")
 
-    if agent_id:
-        await ws_manager.send_node_update(agent_id, node_id)
-        logger.info(f"Node switched to: {node_id}")
-
     if node_type == "conversation":
         return GenericAgent(
             prompt=prompt,
             tools=tools,
             chat_ctx=chat_ctx,
             agent_config=agent_config,
-            node_config=node_config
+            node_config=node_config,
+            tool_registry=tool_registry
         )
 
     elif node_type == "function":
         tool_data = node_config.custom_function
-        local_vars = {}
-        import codecs
 
         try:
-            code_str = codecs.decode(tool_data.code, "unicode_escape")
-            print("Function code string to exec:\n", code_str)
-
-            exec(code_str, globals(), local_vars)
-            fn_ref = local_vars.get("tool_fn")
-            logger.info(f"Compiling custom tool for node {node_config.node_id}: {tool_data.name}")
-
-            if fn_ref:
-                wrapped_tool = function_tool(
-                    fn_ref,
-                    name=tool_data.name,
-                    description=tool_data.description
-                )
-                tools.append(wrapped_tool)
-                logger.info(f"Custom tool '{tool_data.name}' compiled successfully for node {node_config.node_id}")
-            else:
-                raise ValueError("No 'tool_fn' defined in function_code")
-
+            # Flows from the flow cache arrive compiled; otherwise compile once through the shared cache
+            compiled_function = node.function or function_cache.get(tool_data.code)
+            tools.append(compiled_function.tool(tool_data.name, tool_data.description))
+            logger.info(f"Custom tool '{tool_data.name}' ready for node {node_config.node_id}")
         except Exception as e:
             logger.error(f"Failed to compile custom tool for node {node_config.node_id}: {e}")
 
@@ -183,7 +160,8 @@ async def create_agent(node_id: str, chat_ctx=None, agent_config=None, agent_id=
             tools=tools,
             chat_ctx=chat_ctx,
             agent_config=agent_config,
-            node_config=node_config
+            node_config=node_config,
+            tool_registry=tool_registry
         )
 
     elif node_type == "call_transfer":
@@ -198,7 +176,8 @@ async def create_agent(node_id: str, chat_ctx=None, agent_config=None, agent_id=
             tools=tools,
             chat_ctx=chat_ctx,
             agent_config=agent_config,
-            node_config=node_config
+            node_config=node_config,
+            tool_registry=tool_registry
         )
 
     else:
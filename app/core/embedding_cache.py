@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from llama_index.core.schema import BaseNode, MetadataMode
+from app.core.config import settings
+from app.utils.vector_store_utils import VECTOR_BASE_DIR
+
+logger = logging.getLogger("embedding-cache")
+
+# SQLite's default limit on bound parameters is 999
+_LOOKUP_BATCH = 500
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embed_model_key(provider: str, embed_model) -> Tuple[str, str]:
+    """(provider, model) part of the cache key; vectors of different models are never mixed."""
+    model = getattr(embed_model, "model_name", None) or type(embed_model).__name__
+    return provider.lower(), str(model)
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of chunk embeddings in a SQLite file, keyed by
+    (provider, model, sha256 of the chunk text).
+
+    Vectors are stored as float32 blobs. The connection is shared between threads
+    behind a lock, writes are batched per call.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    dimension INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (provider, model, text_hash)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, provider: str, model: str, text_hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(text_hashes))
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE provider = ? AND model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    (provider, model, *batch),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, provider: str, model: str, items: Iterable[Tuple[str, Sequence[float]]]):
+        now = time.time()
+        rows = [
+            (provider, model, text_hash, len(vector), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text_hash, vector in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def clear(self):
+        with self._lock:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM embeddings")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT provider, model, COUNT(*) FROM embeddings GROUP BY provider, model"
+            ).fetchall()
+        total = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "models": {f"{provider}/{model}": count for provider, model, count in rows},
+            "size_bytes": self.path.stat().st_size if self.path.exists() else 0,
+        }
+
+
+async def aembed_nodes_with_cache(
+    nodes: List[BaseNode],
+    embed_model,
+    provider: str,
+    embed_texts: Callable[[List[str]], Awaitable[List[List[float]]]],
+) -> Tuple[int, int]:
+    """
+    Set `node.embedding` on every node, from the cache where possible and with
+    `embed_texts` for the rest. `insert_nodes` then skips embedding them.
+
+    Returns:
+        (cached, embedded) node counts
+    """
+    if not nodes:
+        return 0, 0
+    provider, model = embed_model_key(provider, embed_model)
+
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    hashes = [hash_text(text) for text in texts]
+    cached = await asyncio.to_thread(embedding_cache.get_many, provider, model, hashes)
+
+    missing = {}
+    for text_hash, text in zip(hashes, texts):
+        if text_hash not in cached:
+            missing.setdefault(text_hash, text)
+    if missing:
+        vectors = await embed_texts(list(missing.values()))
+        fresh = dict(zip(missing.keys(), vectors))
+        await asyncio.to_thread(embedding_cache.put_many, provider, model, list(fresh.items()))
+        cached.update(fresh)
+
+    for node, text_hash in zip(nodes, hashes):
+        node.embedding = cached[text_hash]
+    return len(nodes) - sum(1 for h in hashes if h in missing), len(missing)
+
+
+embedding_cache = EmbeddingCache(
+    Path(settings.EMBEDDING_CACHE_PATH) if settings.EMBEDDING_CACHE_PATH else VECTOR_BASE_DIR / "embedding_cache.sqlite3"
+)
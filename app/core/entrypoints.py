@@ -1,17 +1,22 @@
 import asyncio
 import json
 import logging
+import time
 from livekit import api
-from livekit.plugins import silero
 from livekit.agents import AgentSession, JobContext,BackgroundAudioPlayer, AudioConfig, BuiltinAudioClip
 from app.utils.agent_builder import build_llm_instance, build_stt_instance, build_tts_instance
-from app.utils.node_parser import parse_agent_config
-from app.utils.mongodb_client import MongoDBClient
+from app.core.flow_cache import flow_cache
+from app.core.flow_graph import agent_store_ids, knowledge_base_store_ids
+from app.core.filler_audio_cache import filler_audio_cache
 from app.utils.transcript_fnc import write_transcript_file
-from app.core.dynamic_agent import create_agent
+from app.core.dynamic_agent import build_agent, create_agent
+from app.core.agent_prefetch import AgentPrefetcher
+from app.core.tool_registry import SessionToolRegistry
 from app.core.config import settings
 from app.core.single_agent import SingleAgent
-# from livekit.plugins.turn_detector.english import EnglishModel
+from app.utils.query_tool import knowledge_base_options
+from app.core.prewarm import get_session_models
+from app.utils.latency_metrics import track_time_to_first_audio
 # from livekit.plugins import noise_cancellation
 # from livekit.agents import RoomInputOptions
 
@@ -19,6 +24,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("EntryPoint")
 
 async def entrypoint(ctx: JobContext):
+    job_started = time.perf_counter()
     try:
         logger.info(f"Connecting to room: {ctx.room.name}")
         await ctx.connect()
@@ -26,9 +32,16 @@ async def entrypoint(ctx: JobContext):
         metadata = json.loads(ctx.job.metadata)
         agent_id = metadata["agent_id"]
 
-        mongo_client = MongoDBClient()
-        flow = mongo_client.get_flow_by_id(agent_id)
-        agent_config = parse_agent_config(flow)
+        # Each job runs in a fresh process, so the flow cache is cold here and the flow is
+        # always fetched from MongoDB; the version the start route validated is only checked
+        flow_version = metadata.get("flow_version")
+        compiled_flow = flow_cache.get(agent_id, version=flow_version)
+        if not compiled_flow:
+            logger.error(f"Agent configuration with ID '{agent_id}' not found")
+            return
+        if flow_version and compiled_flow.version != flow_version:
+            logger.warning(f"Flow {agent_id} changed since the call was dispatched, using its current version")
+        agent_config = compiled_flow.agent_config
 
         # Build model instances
         llm = build_llm_instance(
@@ -50,21 +63,24 @@ async def entrypoint(ctx: JobContext):
             credentials_info=agent_config.global_settings.tts.api_key
         )
 
+        # VAD and turn detector are loaded once per process by the prewarm stage
+        models = get_session_models(ctx.proc)
+        session_kwargs = {}
+        if models["turn_detection"] is not None:
+            session_kwargs["turn_detection"] = models["turn_detection"]
+
         # Create AgentSession
         session = AgentSession(
             stt=stt,
             llm=llm,
             tts=tts,
-            vad=silero.VAD.load(
-                min_speech_duration=0.1,
-                min_silence_duration=0.2,
-                prefix_padding_duration=0.05,
-                max_buffered_speech=5.0,
-                activation_threshold=0.5,
-                sample_rate=16000,
-                force_cpu=True
-            )
+            vad=models["vad"],
+            **session_kwargs
         )
+        track_time_to_first_audio(session, prewarmed=models["prewarmed"], started_at=job_started)
+        # The filler cache lives in this job process; fill it while the call starts, not on the first lookup
+        if agent_store_ids(agent_config):
+            filler_audio_cache.warm(tts, settings.KB_FILLER_TEXT)
 
         print(agent_config.flow_type)
 
@@ -73,14 +89,15 @@ async def entrypoint(ctx: JobContext):
         # Choose agent based on flow_type
         if getattr(agent_config, "flow_type", "") == "single-prompt":
             logger.info("Launching Single Prompt Agent")
-            vector_store_id = agent_config.global_settings.vector_store_id
+            vector_store_ids = knowledge_base_store_ids(agent_config.global_settings)
             prompt = agent_config.global_settings.global_prompt or "How can I assist you?"
             timeout = agent_config.global_settings.timeout_seconds or 15
 
             agent = SingleAgent(
                 prompt=prompt,
-                vector_store_id=vector_store_id,
-                timeout_seconds=timeout
+                vector_store_ids=vector_store_ids,
+                timeout_seconds=timeout,
+                query_options=knowledge_base_options(agent_config.global_settings)
             )
         else:
             logger.info("Launching Multi-Flow Agent")
@@ -88,7 +105,24 @@ async def entrypoint(ctx: JobContext):
             if not entry_node:
                 logger.error(f"No entry node defined in agent config for ID: {agent_id}")
                 return
-            agent = await create_agent(entry_node, agent_config=agent_config, agent_id=agent_id)
+            tool_registry = SessionToolRegistry(agent_id, compiled_flow.graph, create_agent)
+            if settings.AGENT_SPECULATIVE_PREFETCH:
+                tool_registry.prefetcher = AgentPrefetcher(
+                    lambda node_id: build_agent(node_id, tool_registry),
+                    max_agents=settings.AGENT_PREFETCH_MAX_AGENTS,
+                )
+
+            async def log_tool_registry():
+                logger.info(f"Tool registry for room {ctx.room.name}: {tool_registry.snapshot()}")
+                if tool_registry.prefetcher:
+                    tool_registry.prefetcher.close()
+
+            ctx.add_shutdown_callback(log_tool_registry)
+            agent = await create_agent(
+                entry_node,
+                agent_id=agent_id,
+                tool_registry=tool_registry
+            )
 
         # Start agent session
         session_started = asyncio.create_task(session.start(agent=agent, room=ctx.room))
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from livekit import rtc
+from app.core.config import settings
+
+logger = logging.getLogger("filler-audio-cache")
+
+
+class FillerAudioCache:
+    """
+    Synthesised audio of fixed filler phrases, per TTS voice, kept per process.
+
+    Each call runs in its own job process, so the entrypoint warms the configured
+    filler for the session's voice when the job starts, well before the first
+    query_info. A phrase that is not cached yet is spoken through the normal TTS
+    path while a copy is synthesised in the background; cached phrases replay
+    their frames, so the filler starts without a TTS round trip.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._frames: "OrderedDict[Tuple, List[rtc.AudioFrame]]" = OrderedDict()
+        self._pending: Dict[Tuple, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(tts, text: str) -> Tuple:
+        # Plugins keep the voice, model and language in their options
+        return (tts.label, tts.sample_rate, tts.num_channels, repr(getattr(tts, "_opts", None)), text)
+
+    def get(self, tts, text: str) -> Optional[List[rtc.AudioFrame]]:
+        key = self.key(tts, text)
+        frames = self._frames.get(key)
+        if frames is not None:
+            self._frames.move_to_end(key)
+        return frames
+
+    async def _synthesize(self, key: Tuple, tts, text: str):
+        try:
+            frames = []
+            async with tts.synthesize(text) as stream:
+                async for audio in stream:
+                    frames.append(audio.frame)
+            self._frames[key] = frames
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+            logger.info(f"Cached filler audio for {tts.label}: {len(frames)} frames")
+        except Exception as e:
+            logger.warning(f"Failed to cache filler audio for {tts.label}: {e}")
+        finally:
+            self._pending.pop(key, None)
+
+    def warm(self, tts, text: str):
+        """Synthesise `text` for `tts` in the background unless it is cached or already being synthesised."""
+        key = self.key(tts, text)
+        if key not in self._frames and key not in self._pending:
+            self._pending[key] = asyncio.create_task(self._synthesize(key, tts, text))
+
+    def say(self, session, text: str):
+        """
+        Speak `text` on the session without waiting for it, from cached audio when available.
+
+        Returns:
+            The SpeechHandle
+        """
+        tts = session.current_agent.tts or session.tts
+        frames = self.get(tts, text) if tts else None
+        if frames is not None:
+            self.hits += 1
+            return session.say(text, audio=_replay(frames), allow_interruptions=False, add_to_chat_ctx=False)
+
+        self.misses += 1
+        if tts:
+            self.warm(tts, text)
+        return session.say(text, allow_interruptions=False, add_to_chat_ctx=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._frames), "hits": self.hits, "misses": self.misses}
+
+
+async def _replay(frames: List[rtc.AudioFrame]) -> AsyncIterator[rtc.AudioFrame]:
+    for frame in frames:
+        yield frame
+
+
+filler_audio_cache = FillerAudioCache(max_entries=settings.KB_FILLER_CACHE_MAX_ENTRIES)
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.models import AgentConfig, NodeConfig
+from app.core.flow_graph import FlowGraph, build_flow_graph
+from app.core.function_cache import CompiledFunction
+from app.utils.mongodb_client import MongoDBClient, FLOW_VERSION_FIELDS
+from app.utils.node_parser import parse_agent_config
+from app.utils.validators import validate_custom_function
+
+logger = logging.getLogger("flow-cache")
+
+
+def compute_flow_version(flow: Dict[str, Any]) -> str:
+    """
+    Version of a flow document: its explicit version/timestamp fields when present,
+    otherwise a hash of the whole document.
+    """
+    marker = {field: flow[field] for field in FLOW_VERSION_FIELDS if flow.get(field) is not None}
+    if marker:
+        return "v:" + json.dumps(marker, sort_keys=True, default=str)
+
+    content = {k: v for k, v in flow.items() if k != "_id"}
+    digest = hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return "h:" + digest
+
+
+class CompiledFlow:
+    """A validated flow ready to start sessions from, without touching MongoDB again."""
+
+    def __init__(self, flow_id: str, version: str, agent_config: AgentConfig, custom_functions: Dict[str, CompiledFunction]):
+        self.flow_id = flow_id
+        self.version = version
+        self.agent_config = agent_config
+        self.node_index: Dict[str, NodeConfig] = {node.node_id: node for node in agent_config.nodes or []}
+        self.custom_functions = custom_functions
+        self.compiled_at = time.time()
+        self.checked_at = time.monotonic()
+        self._graph: Optional[FlowGraph] = None
+
+    @property
+    def graph(self) -> FlowGraph:
+        """Transition table for this flow version, built on first use and shared by its sessions."""
+        if self._graph is None:
+            self._graph = build_flow_graph(self.agent_config, self.custom_functions)
+        return self._graph
+
+
+def compile_flow(flow_id: str, flow: Dict[str, Any], version: Optional[str] = None) -> CompiledFlow:
+    """Parse and validate a raw flow document. Raises ValidationError or HTTPException(400)."""
+    agent_config = parse_agent_config(flow)
+
+    custom_functions = {}
+    for node in agent_config.nodes or []:
+        if node.type == "function" and node.custom_function:
+            custom_functions[node.node_id] = validate_custom_function(node.custom_function.code)
+
+    return CompiledFlow(flow_id, version or compute_flow_version(flow), agent_config, custom_functions)
+
+
+class FlowCache:
+    """
+    LRU cache of compiled flows keyed by flow id.
+
+    Entries are trusted for `ttl_seconds`; after that only the version fields are
+    fetched to revalidate. `update_flow`/`delete_flow` on MongoDBClient invalidate
+    entries immediately.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.mongo_client = MongoDBClient()
+        self._entries: "OrderedDict[str, CompiledFlow]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+        MongoDBClient.add_flow_listener(self.invalidate)
+
+    def get(self, flow_id: str, version: Optional[str] = None) -> Optional[CompiledFlow]:
+        """
+        Return the compiled flow, loading it from MongoDB on a miss.
+
+        Args:
+            flow_id: The flow (agent) id
+            version: Expected version, e.g. from dispatch metadata. A cached entry with
+                a different version is reloaded.
+
+        Returns:
+            The compiled flow, or None if the flow does not exist
+        """
+        flow_id = str(flow_id)
+        entry = self._entries.get(flow_id)
+
+        if entry and (version is None or entry.version == version):
+            if time.monotonic() - entry.checked_at < self.ttl_seconds or self._revalidate(entry):
+                self._entries.move_to_end(flow_id)
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        flow = self.mongo_client.get_flow_by_id(flow_id)
+        if not flow:
+            self.invalidate(flow_id)
+            return None
+
+        current_version = compute_flow_version(flow)
+        if entry and entry.version == current_version:
+            # Document unchanged, skip re-validation
+            entry.checked_at = time.monotonic()
+            self._entries.move_to_end(flow_id)
+            return entry
+
+        start = time.perf_counter()
+        compiled = compile_flow(flow_id, flow, current_version)
+        logger.info(f"Compiled flow {flow_id} ({current_version[:12]}) in {time.perf_counter() - start:.4f}s")
+        self._store(compiled)
+        return compiled
+
+    def _revalidate(self, entry: CompiledFlow) -> bool:
+        """Cheap staleness check using only the version fields of the document."""
+        self.revalidations += 1
+        marker = self.mongo_client.get_flow_version(entry.flow_id)
+        if not marker or not entry.version.startswith("v:"):
+            return False
+        if compute_flow_version(marker) != entry.version:
+            return False
+        entry.checked_at = time.monotonic()
+        return True
+
+    def _store(self, compiled: CompiledFlow):
+        self._entries[compiled.flow_id] = compiled
+        self._entries.move_to_end(compiled.flow_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, flow_id: str):
+        if self._entries.pop(str(flow_id), None):
+            logger.info(f"Invalidated cached flow {flow_id}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+        }
+
+
+flow_cache = FlowCache(
+    max_entries=settings.FLOW_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.FLOW_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+from app.core.models import AgentConfig, CustomFunction, GlobalSettings, NodeConfig
+from app.core.function_cache import CompiledFunction
+
+
+@dataclass(frozen=True)
+class RouteTarget:
+    tool_name: str
+    next_node: str
+    condition: str
+
+
+@dataclass(frozen=True)
+class CompiledNode:
+    node_id: str
+    type: str
+    prompt: str
+    routes: Tuple[RouteTarget, ...]
+    is_end_node: bool
+    detected_answering_machine: bool
+    custom_function: Optional[CustomFunction]
+    function: Optional[CompiledFunction]
+    config: NodeConfig
+    # Vector stores of the node's query_info tool
+    vector_store_ids: Tuple[str, ...] = ()
+
+
+def node_prompt(node: NodeConfig) -> str:
+    if node.prompt:
+        return node.prompt
+    if node.static_sentence:
+        return f"Say: {node.static_sentence}"
+    return ""
+
+
+def knowledge_base_store_ids(global_settings: Optional[GlobalSettings],
+                             node: Optional[NodeConfig] = None) -> Tuple[str, ...]:
+    """Vector stores searched by query_info: the node's own list, otherwise the agent's, without duplicates."""
+    if node is not None and node.vector_store_ids:
+        store_ids = node.vector_store_ids
+    elif global_settings is not None:
+        store_ids = [global_settings.vector_store_id, *(global_settings.vector_store_ids or [])]
+    else:
+        store_ids = []
+    return tuple(dict.fromkeys(str(store_id) for store_id in store_ids if store_id))
+
+
+def agent_store_ids(agent_config: AgentConfig) -> Tuple[str, ...]:
+    """Every vector store the agent can search, at agent or node level, e.g. to validate them all at start."""
+    store_ids = knowledge_base_store_ids(agent_config.global_settings)
+    for node in agent_config.nodes or []:
+        store_ids += knowledge_base_store_ids(None, node)
+    return tuple(dict.fromkeys(store_ids))
+
+
+class FlowGraph:
+    """
+    Immutable view of a flow with everything a node transition needs precomputed:
+    per-node prompt, route targets and compiled custom function. Looking up the
+    next node is a single dict access, independent of the flow size.
+    """
+
+    def __init__(self, agent_config: AgentConfig, nodes: Mapping[str, CompiledNode]):
+        self.agent_config = agent_config
+        self.entry_node = agent_config.entry_node
+        self._nodes = MappingProxyType(dict(nodes))
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def node_ids(self) -> Tuple[str, ...]:
+        return tuple(self._nodes)
+
+    def node(self, node_id: str) -> CompiledNode:
+        try:
+            return self._nodes[node_id]
+        except KeyError:
+            raise ValueError(f"Node '{node_id}' not found. Available nodes: {list(self._nodes.keys())}")
+
+    def targets(self, node_id: str) -> Tuple[str, ...]:
+        return tuple(route.next_node for route in self.node(node_id).routes)
+
+
+def build_flow_graph(agent_config: AgentConfig, custom_functions: Optional[Dict[str, CompiledFunction]] = None) -> FlowGraph:
+    """
+    Compile an AgentConfig into a FlowGraph.
+
+    Args:
+        agent_config: The parsed flow
+        custom_functions: Compiled custom functions by node id, as produced by the flow cache
+    """
+    custom_functions = custom_functions or {}
+    global_settings = agent_config.global_settings
+    configs = {node.node_id: node for node in agent_config.nodes or []}
+
+    nodes = {}
+    for node_id, node in configs.items():
+        routes = tuple(
+            RouteTarget(tool_name=route.tool_name, next_node=route.next_node, condition=route.condition or "")
+            for route in node.routes or []
+        )
+
+        nodes[node_id] = CompiledNode(
+            node_id=node_id,
+            type=node.type,
+            prompt=node_prompt(node),
+            routes=routes,
+            is_end_node=bool(node.is_end_node),
+            detected_answering_machine=bool(node.detected_answering_machine),
+            custom_function=node.custom_function,
+            function=custom_functions.get(node_id),
+            config=node,
+            vector_store_ids=knowledge_base_store_ids(global_settings, node),
+        )
+
+    return FlowGraph(agent_config, nodes)
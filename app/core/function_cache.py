@@ -0,0 +1,158 @@
+import builtins
+import codecs
+import copy
+import hashlib
+import inspect
+import logging
+import sys
+import time
+import types
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from livekit.agents import RunContext
+from livekit.agents.llm import function_tool
+from app.core.config import settings
+
+logger = logging.getLogger("function-cache")
+
+
+def hash_function_source(function_code: str) -> str:
+    return hashlib.sha1(function_code.encode("utf-8")).hexdigest()
+
+
+def _function_namespace() -> Dict[str, Any]:
+    # Custom code used to be exec'd with dynamic_agent's module globals, so stored functions
+    # may rely on any name defined or imported there without importing it themselves.
+    # Imported here, on first compile, as dynamic_agent imports this module.
+    from app.core import dynamic_agent
+    from app.utils.query_tool import build_query_tool
+
+    namespace = {name: value for name, value in vars(dynamic_agent).items() if not name.startswith("__")}
+    # Names dynamic_agent no longer imports itself
+    namespace.update({
+        "sys": sys,
+        "copy": copy,
+        "time": time,
+        "Optional": Optional,
+        "RunContext": RunContext,
+        "function_tool": function_tool,
+        "build_query_tool": build_query_tool,
+    })
+    namespace.update({"__builtins__": builtins, "__name__": "custom_function"})
+    return namespace
+
+
+class CompiledFunction:
+    """A custom function that compiled and defines a callable `tool_fn`."""
+
+    def __init__(self, source_hash: str, code: types.CodeType, fn: Callable):
+        self.source_hash = source_hash
+        self.code = code
+        self.fn = fn
+        self.signature = inspect.signature(fn)
+        self.is_async = inspect.iscoroutinefunction(fn)
+        self._tools: Dict[Tuple[str, Optional[str]], Any] = {}
+
+    def tool(self, name: str, description: Optional[str] = None):
+        """
+        `tool_fn` wrapped as a function tool under `name`.
+
+        function_tool() stores its metadata on the function object, so every
+        (name, description) gets its own copy of the function.
+        """
+        key = (name, description)
+        tool = self._tools.get(key)
+        if tool is None:
+            fn = types.FunctionType(self.fn.__code__, self.fn.__globals__, self.fn.__name__,
+                                    self.fn.__defaults__, self.fn.__closure__)
+            fn.__kwdefaults__ = self.fn.__kwdefaults__
+            fn.__annotations__ = dict(self.fn.__annotations__)
+            fn.__doc__ = self.fn.__doc__
+            fn.__qualname__ = self.fn.__qualname__
+            fn.__module__ = self.fn.__module__
+            tool = function_tool(fn, name=name, description=description)
+            self._tools[key] = tool
+        return tool
+
+
+class CustomFunctionCache:
+    """
+    LRU cache of compiled custom functions keyed by a hash of their source.
+
+    The source is decoded, compiled and executed once, and the `tool_fn` it defines
+    is checked once; start-request validation and node entry at runtime both read
+    from here. Sources that fail are remembered too, so they are not recompiled on
+    every request.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, function_code: str) -> CompiledFunction:
+        """
+        Return the compiled function for `function_code`.
+
+        Raises:
+            ValueError: If the code does not compile or does not define a callable `tool_fn`
+        """
+        source_hash = hash_function_source(function_code)
+        entry = self._entries.get(source_hash)
+
+        if entry is not None:
+            self._entries.move_to_end(source_hash)
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry = self._compile(source_hash, function_code)
+            self._entries[source_hash] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        if isinstance(entry, Exception):
+            raise ValueError(str(entry))
+        return entry
+
+    def _compile(self, source_hash: str, function_code: str):
+        start = time.perf_counter()
+        try:
+            # Decode any escaped characters (e.g., \n) into real newlines
+            decoded_code = codecs.decode(function_code, "unicode_escape")
+            code = compile(decoded_code, f"<custom_function:{source_hash[:12]}>", "exec")
+
+            local_vars = {}
+            exec(code, _function_namespace(), local_vars)
+
+            fn = local_vars.get("tool_fn")
+            if not fn:
+                raise ValueError("Function 'tool_fn' not defined.")
+            if not callable(fn):
+                raise ValueError("'tool_fn' is not callable.")
+            compiled = CompiledFunction(source_hash, code, fn)
+        except Exception as e:
+            logger.warning(f"Custom function {source_hash[:12]} is invalid: {e}")
+            return ValueError(str(e))
+
+        logger.info(f"Compiled custom function {source_hash[:12]} in {time.perf_counter() - start:.4f}s")
+        return compiled
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+function_cache = CustomFunctionCache(max_entries=settings.CUSTOM_FUNCTION_CACHE_MAX_ENTRIES)
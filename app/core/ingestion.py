@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path as FsPath
+from typing import List, Optional
+import aiofiles
+import httpx
+from llama_index.core import SimpleDirectoryReader
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, MetadataMode
+from app.core.config import settings
+from app.core.embedding_cache import aembed_nodes_with_cache
+
+logger = logging.getLogger("ingestion")
+
+
+def _parse_file(path: str, chunk_size: int, chunk_overlap: int) -> List[BaseNode]:
+    """Read and chunk one downloaded file. Runs in a worker process."""
+    loaded_docs = SimpleDirectoryReader(input_files=[path]).load_data()
+    splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.get_nodes_from_documents(loaded_docs)
+
+
+@dataclass
+class Download:
+    status_code: int
+    etag: Optional[str] = None
+    path: Optional[FsPath] = None
+    content_hash: Optional[str] = None
+    size: int = 0
+
+    def discard(self):
+        if self.path:
+            self.path.unlink(missing_ok=True)
+            self.path = None
+
+
+class IngestionPipeline:
+    """
+    Stages of knowledge base ingestion, each with its own concurrency bound:
+
+    - downloads share one pooled HTTP client and stream to temp files, hashing as they go
+    - parsing and chunking run in a process pool, off the event loop
+    - embedding runs in batches, with a cap on concurrent embedding requests
+
+    The client and the pool are created on first use and closed on API shutdown.
+    """
+
+    def __init__(self, download_concurrency: int, parse_workers: int, embed_batch_size: int, embed_concurrency: int):
+        self.download_concurrency = download_concurrency
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size
+        self._download_slots = asyncio.Semaphore(download_concurrency)
+        self._embed_slots = asyncio.Semaphore(embed_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.download_concurrency),
+            )
+        return self._client
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        return self._pool
+
+    async def download(self, url: str, filename: str, etag: Optional[str] = None) -> Download:
+        """
+        Stream a document to a temp file. A `304 Not Modified` answer to `etag`, or any
+        non-200 status, returns without a file.
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        async with self._download_slots:
+            async with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code != 200:
+                    return Download(status_code=response.status_code, etag=response.headers.get("ETag"))
+
+                path = FsPath(tempfile.gettempdir()) / f"{uuid.uuid4()}{FsPath(filename).suffix or '.pdf'}"
+                digest = hashlib.sha256()
+                size = 0
+                try:
+                    async with aiofiles.open(path, "wb") as f:
+                        async for block in response.aiter_bytes(1 << 20):
+                            digest.update(block)
+                            size += len(block)
+                            await f.write(block)
+                except BaseException:
+                    path.unlink(missing_ok=True)
+                    raise
+                return Download(
+                    status_code=200,
+                    etag=response.headers.get("ETag"),
+                    path=path,
+                    content_hash=f"sha256:{digest.hexdigest()}",
+                    size=size,
+                )
+
+    async def parse(self, download: Download, chunk_size: int, chunk_overlap: int) -> List[BaseNode]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.pool, _parse_file, str(download.path), chunk_size, chunk_overlap
+        )
+
+    async def _embed_batches(self, embed_model, texts: List[str]) -> List[List[float]]:
+        async def embed_batch(batch: List[str]):
+            async with self._embed_slots:
+                return await embed_model.aget_text_embedding_batch(batch)
+
+        batches = [texts[i:i + self.embed_batch_size] for i in range(0, len(texts), self.embed_batch_size)]
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    async def embed(self, nodes: List[BaseNode], embed_model, provider: str, use_cache: bool = True):
+        """
+        Set `node.embedding` on every node, so `insert_nodes` does not embed them again.
+
+        Returns:
+            (cached, embedded) node counts
+        """
+        if use_cache:
+            return await aembed_nodes_with_cache(
+                nodes, embed_model, provider, lambda texts: self._embed_batches(embed_model, texts)
+            )
+        vectors = await self._embed_batches(
+            embed_model, [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        )
+        for node, vector in zip(nodes, vectors):
+            node.embedding = vector
+        return 0, len(nodes)
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+ingestion_pipeline = IngestionPipeline(
+    download_concurrency=settings.INGEST_DOWNLOAD_CONCURRENCY,
+    parse_workers=settings.INGEST_PARSE_WORKERS,
+    embed_batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+    embed_concurrency=settings.INGEST_EMBED_CONCURRENCY,
+)
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.query_cache import query_cache
+from app.core.vector_index_cache import vector_index_cache
+from app.utils.kb_sync import sync_knowledge_base
+
+logger = logging.getLogger("ingestion-jobs")
+
+ACTIVE_STATUSES = {"queued", "running"}
+
+
+class IngestionJob:
+    def __init__(self, store_id: str):
+        self.job_id = uuid.uuid4().hex
+        self.store_id = store_id
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Updated by sync_knowledge_base as documents complete
+        self.progress: Dict[str, int] = {
+            "documents_total": 0,
+            "documents_done": 0,
+            "documents_failed": 0,
+            "chunks_embedded": 0,
+            "chunks_from_cache": 0,
+        }
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        throughput = None
+        eta = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            finished = self.progress["documents_done"] + self.progress["documents_failed"]
+            if elapsed > 0 and finished:
+                throughput = finished / elapsed
+                remaining = self.progress["documents_total"] - finished
+                eta = remaining / throughput if self.status == "running" else 0.0
+        return {
+            "job_id": self.job_id,
+            "store_id": self.store_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            **self.progress,
+            "documents_per_second": round(throughput, 3) if throughput is not None else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class IngestionJobQueue:
+    """
+    Runs knowledge base syncs as background jobs in this API process.
+
+    At most `max_concurrent` jobs run at once and at most `max_queued` wait; one store
+    is never synced by two jobs at the same time. Submitting a store that already has a
+    queued job returns that job. Finished jobs are kept for status queries, up to
+    `max_history`.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, max_history: int = 200):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_history = max_history
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._store_locks: Dict[str, asyncio.Lock] = {}
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+
+    def submit(self, store_id: str) -> IngestionJob:
+        """
+        Queue a sync of `store_id` and return its job.
+
+        Raises:
+            HTTPException: 429 when `max_queued` jobs are already waiting
+        """
+        for job in self._jobs.values():
+            if job.store_id == store_id and job.status == "queued":
+                return job
+        if sum(1 for job in self._jobs.values() if job.status == "queued") >= self.max_queued:
+            raise HTTPException(status_code=429, detail="Too many ingestion jobs queued. Please retry later.")
+
+        job = IngestionJob(store_id)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job))
+        job.task.add_done_callback(lambda task: self._on_done(job, task))
+        logger.info(f"Queued ingestion job {job.job_id} for vector store {store_id}")
+        self._trim_history()
+        return job
+
+    async def _run(self, job: IngestionJob):
+        lock = self._store_locks.setdefault(job.store_id, asyncio.Lock())
+        try:
+            async with lock, self._slots:
+                job.status = "running"
+                job.started_at = time.time()
+                result = await sync_knowledge_base(job.store_id, progress=job.progress)
+                if result["added"] or result["updated"] or result["removed"]:
+                    vector_index_cache.invalidate(job.store_id)
+                    query_cache.invalidate(job.store_id)
+                job.result = result
+                job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            logger.info(f"Ingestion job {job.job_id} for vector store {job.store_id} cancelled")
+        except HTTPException as e:
+            job.status = "failed"
+            job.error = e.detail
+        except Exception as e:
+            logger.exception(f"Ingestion job {job.job_id} for vector store {job.store_id} failed")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            if not lock.locked() and not any(j.active for j in self._jobs.values() if j.store_id == job.store_id):
+                self._store_locks.pop(job.store_id, None)
+
+    def _on_done(self, job: IngestionJob, task: asyncio.Task):
+        # A task cancelled before it first ran never reaches _run's handlers
+        if job.active:
+            job.status = "cancelled" if task.cancelled() else "failed"
+            job.finished_at = time.time()
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def find(self, store_id: Optional[str] = None) -> List[IngestionJob]:
+        jobs = [job for job in self._jobs.values() if store_id is None or job.store_id == store_id]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """
+        Cancel a queued or running job. A job already persisting its index changes
+        finishes them and is reported as succeeded.
+        """
+        job = self._jobs.get(job_id)
+        if job and job.active and job.task:
+            job.task.cancel()
+        return job
+
+    async def wait(self, job: IngestionJob) -> IngestionJob:
+        # asyncio.wait neither cancels the job with the waiter nor raises if it was cancelled
+        if job.task:
+            await asyncio.wait([job.task])
+        return job
+
+    async def stop(self):
+        tasks = [job.task for job in self._jobs.values() if job.active and job.task]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"max_concurrent": self.max_concurrent, "max_queued": self.max_queued, "jobs": counts}
+
+
+ingestion_jobs = IngestionJobQueue(
+    max_concurrent=settings.INGEST_MAX_CONCURRENT_JOBS,
+    max_queued=settings.INGEST_MAX_QUEUED_JOBS,
+)
@@ -13,6 +13,13 @@ class VectorStoreConfig(BaseModel):
     provider: str
     model_name: Optional[str] = None
     api_key: Optional[str] = None
+    # "exact" or "ivf" (approximate, for very large knowledge bases); unset IVF parameters use the settings defaults
+    index_type: Optional[str] = "exact"
+    ivf_nlist: Optional[int] = None
+    ivf_nprobe: Optional[int] = None
+    # "none", "float16" or "int8" vectors (memmap format only); rescoring keeps the float32 vectors on disk
+    quantization: Optional[str] = "none"
+    quantization_rescore: Optional[bool] = True
 
 class NodeRoute(BaseModel):
     tool_name: str
@@ -39,6 +46,8 @@ class NodeConfig(BaseModel):
     custom_function: Optional[CustomFunction] = None
     is_end_node : Optional[bool] = False
     detected_answering_machine: Optional[bool] = False
+    # Stores query_info searches at this node; unset uses the agent's
+    vector_store_ids: Optional[List[str]] = None
 
 class SpeechSettings(BaseModel):
     background_sound: Optional[str] = None
@@ -81,8 +90,18 @@ class BackgroundAudioConfig(BaseModel):
     ambient_volume: float = 0.8
     thinking_volume: float = 0.2
 
+class KnowledgeBaseSettings(BaseModel):
+    query_mode: Optional[str] = None  # "retrieval", "hybrid" or "synthesis"
+    top_k: Optional[int] = None
+    token_budget: Optional[int] = None
+    # Multiplier of each store's normalised scores when several stores are searched; unset stores use 1.0
+    store_weights: Optional[Dict[str, float]] = None
+
 class GlobalSettings(BaseModel):
     vector_store_id: Optional[str] = None 
+    # Several stores searched together; vector_store_id is searched as well when both are set
+    vector_store_ids: Optional[List[str]] = None
+    knowledge_base: Optional[KnowledgeBaseSettings] = None
     global_prompt: str
     llm: LLMConfig
     stt: STTConfig
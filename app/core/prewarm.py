@@ -0,0 +1,56 @@
+import logging
+import time
+from livekit.agents import JobProcess
+from livekit.plugins import silero
+from app.core.config import settings
+
+if settings.ENABLE_TURN_DETECTOR:
+    # Importing the plugin registers its inference runner with the worker, so it has
+    # to happen in the main process before any worker is created.
+    from livekit.plugins.turn_detector.english import EnglishModel
+
+logger = logging.getLogger("prewarm")
+
+VAD_OPTIONS = dict(
+    min_speech_duration=0.1,
+    min_silence_duration=0.2,
+    prefix_padding_duration=0.05,
+    max_buffered_speech=5.0,
+    activation_threshold=0.5,
+    sample_rate=16000,
+    force_cpu=True,
+)
+
+
+def load_vad():
+    return silero.VAD.load(**VAD_OPTIONS)
+
+
+def load_turn_detector():
+    if not settings.ENABLE_TURN_DETECTOR:
+        return None
+    return EnglishModel()
+
+
+def prewarm(proc: JobProcess):
+    """Load the per-process models before a job is assigned to this process."""
+    start = time.perf_counter()
+    proc.userdata["vad"] = load_vad()
+    proc.userdata["turn_detection"] = load_turn_detector()
+    proc.userdata["prewarmed"] = True
+    logger.info(f"Prewarmed job process {proc.pid} in {time.perf_counter() - start:.3f} seconds")
+
+
+def get_session_models(proc: JobProcess) -> dict:
+    """Return the models prewarmed for this process, loading any that are missing."""
+    userdata = proc.userdata
+    prewarmed = userdata.get("prewarmed", False)
+    if "vad" not in userdata:
+        logger.info("Job process was not prewarmed, loading models inline")
+        userdata["vad"] = load_vad()
+        userdata["turn_detection"] = load_turn_detector()
+    return {
+        "vad": userdata["vad"],
+        "turn_detection": userdata.get("turn_detection"),
+        "prewarmed": prewarmed,
+    }
@@ -0,0 +1,183 @@
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger("query-cache")
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace, so "What are your hours?" == "what are your hours"."""
+    return " ".join(_PUNCTUATION.sub(" ", query.lower()).split())
+
+
+class _CachedAnswer:
+    __slots__ = ("result", "created_at", "embedding")
+
+    def __init__(self, result: str, embedding: Optional[np.ndarray]):
+        self.result = result
+        self.created_at = time.monotonic()
+        self.embedding = embedding
+
+
+class _StoreCache:
+    """Answers of one vector store, valid for one version (stamp) of its index."""
+
+    def __init__(self, stamp: Any):
+        self.stamp = stamp
+        # Keyed by (query options, normalised query)
+        self.answers: "OrderedDict[Tuple[Any, str], _CachedAnswer]" = OrderedDict()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+
+class QueryCache:
+    """
+    Per-store cache of query_info answers.
+
+    Exact hits match on the normalised query text. When a semantic threshold is
+    set, a query whose embedding has a cosine similarity of at least the threshold
+    with a cached query reuses that answer. Entries are tied to the index stamp of
+    the store, so a re-vectorized index never serves old answers, and expire after
+    `ttl_seconds`. Tools that query the same store with different options (query
+    mode, top_k, ...) share its cache, but only reuse answers given with the same
+    options.
+    """
+
+    def __init__(self, max_entries_per_store: int, ttl_seconds: float, semantic_threshold: float, max_stores: int = 64):
+        self.max_entries_per_store = max_entries_per_store
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self.max_stores = max_stores
+        self._stores: "OrderedDict[str, _StoreCache]" = OrderedDict()
+        self.evictions = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return 0 < self.semantic_threshold <= 1
+
+    def _store(self, store_id: str, stamp: Any, create: bool = False) -> Optional[_StoreCache]:
+        cache = self._stores.get(store_id)
+        if cache is not None and cache.stamp != stamp:
+            # The index was re-vectorized since these answers were cached
+            del self._stores[store_id]
+            cache = None
+        if cache is None and create:
+            cache = self._stores[store_id] = _StoreCache(stamp)
+            while len(self._stores) > self.max_stores:
+                self._stores.popitem(last=False)
+        if cache is not None:
+            self._stores.move_to_end(store_id)
+        return cache
+
+    def _fresh(self, cache: _StoreCache, key: Tuple[Any, str]) -> Optional[_CachedAnswer]:
+        answer = cache.answers.get(key)
+        if answer is None:
+            return None
+        if self.ttl_seconds > 0 and time.monotonic() - answer.created_at > self.ttl_seconds:
+            del cache.answers[key]
+            return None
+        cache.answers.move_to_end(key)
+        return answer
+
+    def get_exact(self, store_id: str, stamp: Any, query: str, options: Hashable = None) -> Optional[str]:
+        cache = self._store(store_id, stamp)
+        if cache is None:
+            return None
+        answer = self._fresh(cache, (options, normalize_query(query)))
+        if answer is None:
+            return None
+        cache.exact_hits += 1
+        return answer.result
+
+    def get_semantic(self, store_id: str, stamp: Any, embedding: Sequence[float],
+                     options: Hashable = None) -> Optional[str]:
+        cache = self._store(store_id, stamp)
+        if cache is None or not self.semantic_enabled:
+            return None
+
+        keys: List[Tuple[Any, str]] = []
+        vectors = []
+        for key in [key for key in cache.answers if key[0] == options]:
+            answer = self._fresh(cache, key)
+            if answer is not None and answer.embedding is not None:
+                keys.append(key)
+                vectors.append(answer.embedding)
+        if not vectors:
+            return None
+
+        similarities = np.vstack(vectors) @ _unit(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.semantic_threshold:
+            return None
+        cache.semantic_hits += 1
+        return self._fresh(cache, keys[best]).result
+
+    def record_miss(self, store_id: str, stamp: Any):
+        self._store(store_id, stamp, create=True).misses += 1
+
+    def put(self, store_id: str, stamp: Any, query: str, result: str, embedding: Optional[Sequence[float]] = None,
+            options: Hashable = None):
+        cache = self._store(store_id, stamp, create=True)
+        key = (options, normalize_query(query))
+        cache.answers[key] = _CachedAnswer(result, _unit(embedding) if embedding is not None else None)
+        cache.answers.move_to_end(key)
+        while len(cache.answers) > self.max_entries_per_store:
+            cache.answers.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, store_id: str):
+        # Federated query_info tools cache under "<id>+<id>..."
+        for key in [key for key in self._stores if str(store_id) in key.split("+")]:
+            del self._stores[key]
+            logger.info(f"Invalidated cached answers of vector store {key}")
+
+    def clear(self):
+        self._stores.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stores = {}
+        exact = semantic = misses = 0
+        for store_id, cache in self._stores.items():
+            lookups = cache.exact_hits + cache.semantic_hits + cache.misses
+            stores[store_id] = {
+                "entries": len(cache.answers),
+                "exact_hits": cache.exact_hits,
+                "semantic_hits": cache.semantic_hits,
+                "misses": cache.misses,
+                "hit_rate": round((cache.exact_hits + cache.semantic_hits) / lookups, 3) if lookups else 0.0,
+            }
+            exact += cache.exact_hits
+            semantic += cache.semantic_hits
+            misses += cache.misses
+        lookups = exact + semantic + misses
+        return {
+            "max_entries_per_store": self.max_entries_per_store,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic_threshold": self.semantic_threshold,
+            "exact_hits": exact,
+            "semantic_hits": semantic,
+            "misses": misses,
+            "hit_rate": round((exact + semantic) / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "stores": stores,
+        }
+
+
+def _unit(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+query_cache = QueryCache(
+    max_entries_per_store=settings.KB_QUERY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.KB_QUERY_CACHE_TTL_SECONDS,
+    semantic_threshold=settings.KB_SEMANTIC_CACHE_THRESHOLD,
+)
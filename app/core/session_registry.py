@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+from pymongo import ASCENDING
+from app.core.config import settings
+from app.utils.mongodb_client import MongoDBClient
+
+logger = logging.getLogger("session-registry")
+
+ACTIVE_STATUSES = {"connected"}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class InMemorySessionBackend:
+    """Session records for a single API process, indexed by agent_id and phone number."""
+
+    name = "memory"
+
+    def __init__(self):
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.by_agent: Dict[str, Set[str]] = {}
+        self.by_phone: Dict[str, Set[str]] = {}
+
+    def _index(self, record: Dict[str, Any]):
+        room_name = record["room_name"]
+        self.by_agent.setdefault(record["agent_id"], set()).add(room_name)
+        if record.get("phone_number"):
+            self.by_phone.setdefault(record["phone_number"], set()).add(room_name)
+
+    def _unindex(self, record: Dict[str, Any]):
+        room_name = record["room_name"]
+        for index, key in ((self.by_agent, record["agent_id"]), (self.by_phone, record.get("phone_number"))):
+            rooms = index.get(key)
+            if rooms is None:
+                continue
+            rooms.discard(room_name)
+            if not rooms:
+                del index[key]
+
+    def put(self, record: Dict[str, Any]):
+        existing = self.records.get(record["room_name"])
+        if existing:
+            self._unindex(existing)
+        self.records[record["room_name"]] = dict(record)
+        self._index(record)
+
+    def update(self, room_name: str, fields: Dict[str, Any]):
+        record = self.records.get(room_name)
+        if record:
+            record.update(fields)
+
+    def get(self, room_name: str) -> Optional[Dict[str, Any]]:
+        record = self.records.get(room_name)
+        return dict(record) if record else None
+
+    def find(self, agent_id: Optional[str] = None, phone_number: Optional[str] = None,
+             active: Optional[bool] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        candidates = None
+        if agent_id is not None:
+            candidates = set(self.by_agent.get(agent_id, ()))
+        if phone_number is not None:
+            rooms = self.by_phone.get(phone_number, set())
+            candidates = rooms.copy() if candidates is None else candidates & rooms
+        if candidates is None:
+            candidates = self.records.keys()
+
+        results = []
+        for room_name in candidates:
+            record = self.records[room_name]
+            if active is not None and record["active"] != active:
+                continue
+            results.append(dict(record))
+        results.sort(key=lambda r: r["started_at"], reverse=True)
+        return results[:limit]
+
+    def delete(self, room_name: str):
+        record = self.records.pop(room_name, None)
+        if record:
+            self._unindex(record)
+
+    def heartbeat(self, room_names: List[str], expires_at: datetime):
+        for room_name in room_names:
+            self.update(room_name, {"expires_at": expires_at})
+
+    def expire(self, now: datetime) -> int:
+        expired = [name for name, record in self.records.items() if record["expires_at"] <= now]
+        for room_name in expired:
+            self.delete(room_name)
+        return len(expired)
+
+    def counts(self) -> Dict[str, int]:
+        active = sum(1 for record in self.records.values() if record["active"])
+        return {"total": len(self.records), "active": active}
+
+
+class MongoSessionBackend:
+    """Session records shared by every API process and host through MongoDB."""
+
+    name = "mongo"
+
+    def __init__(self, collection_name: str = "agent_sessions"):
+        self.mongo_client = MongoDBClient()
+        self.collection_name = collection_name
+        self._indexes_ready = False
+
+    @property
+    def collection(self):
+        self.mongo_client._ensure_connection()
+        collection = self.mongo_client.db[self.collection_name]
+        if not self._indexes_ready:
+            collection.create_index([("room_name", ASCENDING)], unique=True)
+            collection.create_index([("agent_id", ASCENDING), ("started_at", ASCENDING)])
+            collection.create_index([("phone_number", ASCENDING)], sparse=True)
+            # MongoDB removes records on its own once expires_at has passed
+            collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+            self._indexes_ready = True
+        return collection
+
+    def put(self, record: Dict[str, Any]):
+        self.collection.replace_one({"room_name": record["room_name"]}, record, upsert=True)
+
+    def update(self, room_name: str, fields: Dict[str, Any]):
+        self.collection.update_one({"room_name": room_name}, {"$set": fields})
+
+    def get(self, room_name: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"room_name": room_name}, {"_id": 0})
+
+    def find(self, agent_id: Optional[str] = None, phone_number: Optional[str] = None,
+             active: Optional[bool] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {}
+        if agent_id is not None:
+            query["agent_id"] = agent_id
+        if phone_number is not None:
+            query["phone_number"] = phone_number
+        if active is not None:
+            query["active"] = active
+        cursor = self.collection.find(query, {"_id": 0}).sort("started_at", -1).limit(limit)
+        return list(cursor)
+
+    def delete(self, room_name: str):
+        self.collection.delete_one({"room_name": room_name})
+
+    def heartbeat(self, room_names: List[str], expires_at: datetime):
+        if room_names:
+            self.collection.update_many({"room_name": {"$in": room_names}}, {"$set": {"expires_at": expires_at}})
+
+    def expire(self, now: datetime) -> int:
+        # The TTL monitor only runs once a minute, so also sweep explicitly
+        return self.collection.delete_many({"expires_at": {"$lte": now}}).deleted_count
+
+    def counts(self) -> Dict[str, int]:
+        collection = self.collection
+        return {
+            "total": collection.count_documents({}),
+            "active": collection.count_documents({"active": True}),
+        }
+
+
+class SessionRegistry:
+    """
+    Registry of agent sessions started through the API.
+
+    Records live in a pluggable backend so they can be shared across processes;
+    the asyncio task following each session stays local to the process that
+    started it. Finished tasks are reaped automatically, and every record carries
+    an `expires_at` that live sessions keep pushing forward, so records of ended
+    sessions, or of sessions whose host went away, are evicted after the TTL.
+    """
+
+    def __init__(self, backend, ttl_seconds: float, reap_interval: float = 30.0):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.reap_interval = reap_interval
+        self.host = socket.gethostname()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._reaper_task: Optional[asyncio.Task] = None
+        self.reaped = 0
+        self.evicted = 0
+
+    def _expiry(self) -> datetime:
+        return datetime.fromtimestamp(time.time() + self.ttl_seconds, tz=timezone.utc)
+
+    def register(
+        self,
+        agent_id: str,
+        room_name: str,
+        agent_name: str,
+        task: Optional[asyncio.Task] = None,
+        phone_number: Optional[str] = None,
+        kind: str = "web",
+    ) -> Dict[str, Any]:
+        record = {
+            "agent_id": agent_id,
+            "room_name": room_name,
+            "agent_name": agent_name,
+            "phone_number": phone_number,
+            "kind": kind,
+            "host": self.host,
+            "active": True,
+            "status": "connected",
+            "started_at": _utcnow(),
+            "ended_at": None,
+            "expires_at": self._expiry(),
+        }
+        self.backend.put(record)
+
+        if task is not None:
+            self._tasks[room_name] = task
+            task.add_done_callback(lambda t: self._on_task_done(room_name, t))
+        return record
+
+    def _on_task_done(self, room_name: str, task: asyncio.Task):
+        if self._tasks.get(room_name) is not task:
+            return
+        del self._tasks[room_name]
+        self.reaped += 1
+
+        if task.cancelled():
+            status = "cancelled"
+        elif task.exception() is not None:
+            status = "failed"
+            logger.warning(f"Session in room {room_name} ended with error: {task.exception()}")
+        else:
+            status = "completed"
+
+        try:
+            self.mark_ended(room_name, status)
+        except Exception as e:
+            logger.error(f"Failed to record end of session {room_name}: {e}")
+
+    def mark_ended(self, room_name: str, status: str = "disconnected"):
+        self.backend.update(room_name, {
+            "active": False,
+            "status": status,
+            "ended_at": _utcnow(),
+            "expires_at": self._expiry(),
+        })
+
+    def get(self, room_name: str) -> Optional[Dict[str, Any]]:
+        return self.backend.get(room_name)
+
+    def find(self, agent_id: Optional[str] = None, phone_number: Optional[str] = None,
+             active: Optional[bool] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return self.backend.find(agent_id=agent_id, phone_number=phone_number, active=active, limit=limit)
+
+    def get_task(self, room_name: str) -> Optional[asyncio.Task]:
+        return self._tasks.get(room_name)
+
+    async def cancel_task(self, room_name: str):
+        task = self._tasks.get(room_name)
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                logger.info(f"Task for session {room_name} cancelled.")
+            except Exception as e:
+                logger.exception(f"Error while cancelling task for session {room_name}: {str(e)}")
+
+    # ---------------------- REAPING ----------------------
+
+    async def start(self):
+        if self._reaper_task and not self._reaper_task.done():
+            return
+        self._reaper_task = asyncio.create_task(self._reaper())
+
+    async def stop(self):
+        if self._reaper_task and not self._reaper_task.done():
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+
+    def reap(self) -> int:
+        """Push the expiry of sessions this process still follows and evict expired records."""
+        self.backend.heartbeat(list(self._tasks), self._expiry())
+        evicted = self.backend.expire(_utcnow())
+        self.evicted += evicted
+        return evicted
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                evicted = await asyncio.to_thread(self.reap)
+                if evicted:
+                    logger.info(f"Evicted {evicted} expired session records")
+            except Exception as e:
+                logger.error(f"Session reaper failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "host": self.host,
+            "ttl_seconds": self.ttl_seconds,
+            "local_tasks": len(self._tasks),
+            "reaped_tasks": self.reaped,
+            "evicted_records": self.evicted,
+            **self.backend.counts(),
+        }
+
+
+def _build_backend():
+    if settings.SESSION_REGISTRY_BACKEND == "mongo":
+        return MongoSessionBackend()
+    return InMemorySessionBackend()
+
+
+session_registry = SessionRegistry(
+    backend=_build_backend(),
+    ttl_seconds=settings.SESSION_REGISTRY_TTL_SECONDS,
+)
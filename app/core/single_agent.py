@@ -1,5 +1,5 @@
 import logging
-from typing import Optional
+from typing import Optional, Sequence
 from datetime import datetime, timezone
 from livekit.agents.voice import Agent
 from livekit.agents.llm import function_tool
@@ -19,20 +19,22 @@ class SingleAgent(Agent):
     def __init__(
         self,
         prompt: str,
-        vector_store_id: str,
-        timeout_seconds: Optional[int] = None
+        vector_store_ids: Sequence[str],
+        timeout_seconds: Optional[int] = None,
+        query_options: Optional[dict] = None
     ):
         self._silence_detector = None
         self._timeout = timeout_seconds
 
         tools = [end_call]
 
-        try:
-            query_tool = build_query_tool(vector_store_id)
-            tools.append(query_tool)
-            logger.info(f"Loaded query_info tool for vector store: {vector_store_id}")
-        except Exception as e:
-            logger.error(f"Failed to load query_info tool: {e}")
+        if vector_store_ids:
+            try:
+                query_tool = build_query_tool(vector_store_ids, **(query_options or {}))
+                tools.append(query_tool)
+                logger.info(f"Loaded query_info tool for vector stores: {', '.join(vector_store_ids)}")
+            except Exception as e:
+                logger.error(f"Failed to load query_info tool: {e}")
 
         instructions = f"{prompt}\n\n{current_time}"
 
@@ -1,28 +1,40 @@
 from typing import Optional
 import logging
-from livekit.agents import Worker, WorkerOptions, JobProcess
+from livekit.agents import Worker, WorkerOptions
 from app.core.config import settings
-from app.core.entrypoints import entrypoint 
-from livekit.plugins import silero
+from app.core.entrypoints import entrypoint
+from app.core.prewarm import prewarm
+from app.core.admission import worker_load
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("agent-runner")
 
-async def agent_run(agent_name: str, agent_id: Optional[str] = None):
-    if not agent_id:
-        logger.error("Agent ID is required")
-        return
-    
-    # def prewarm(proc:JobProcess):
-    #     proc.userdata["vad"] = silero.VAD.load()
+def build_worker_options(agent_name: str) -> WorkerOptions:
+    extra_options = {}
+    if settings.AGENT_PREWARM:
+        extra_options["prewarm_fnc"] = prewarm
 
-    worker_options = WorkerOptions(
+    return WorkerOptions(
         entrypoint_fnc=entrypoint,
         ws_url=settings.LIVEKIT_URL,
         agent_name=agent_name,
         api_key=settings.LIVEKIT_API_KEY,
         api_secret=settings.LIVEKIT_API_SECRET,
-        # prewarm_fnc=prewarm,
+        # Several workers share this process, so let each health server pick a free port
+        port=0,
+        load_fnc=worker_load,
+        load_threshold=settings.WORKER_LOAD_THRESHOLD,
+        **extra_options
     )
 
-    worker = Worker(opts=worker_options)
-    await worker.run()
\ No newline at end of file
+async def agent_run(agent_name: str, agent_id: Optional[str] = None):
+    """Run a standalone worker for a single agent name.
+
+    Sessions started through the API are served by the shared pool in
+    app/core/worker_pool.py; this is kept for running a dedicated worker.
+    """
+    if not agent_id:
+        logger.error("Agent ID is required")
+        return
+
+    worker = Worker(opts=build_worker_options(agent_name))
+    await worker.run()
@@ -0,0 +1,108 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from livekit.agents import RunContext
+from livekit.agents.llm import function_tool
+from app.core.flow_graph import CompiledNode, FlowGraph, RouteTarget, knowledge_base_store_ids
+from app.utils.query_tool import build_query_tool, knowledge_base_options
+
+logger = logging.getLogger("ToolRegistry")
+
+
+class SessionToolRegistry:
+    """
+    Tools of a single agent session.
+
+    Route tools are built the first time their node is entered and cached by
+    (node_id, tool_name), so re-entering a node reuses them and concurrent
+    sessions in the same process never see each other's tools. The knowledge
+    base tool is loaded once per session and set of vector stores instead of
+    once per node.
+    """
+
+    def __init__(self, agent_id: Optional[str], flow_graph: FlowGraph, agent_factory: Callable[..., Awaitable[Any]]):
+        """
+        Args:
+            agent_id: Agent (flow) id of the session
+            flow_graph: Compiled flow the session runs
+            agent_factory: Coroutine building the agent for a node, i.e. `create_agent`
+        """
+        self.agent_id = agent_id
+        self.flow_graph = flow_graph
+        self.agent_factory = agent_factory
+        self._route_tools: Dict[Tuple[str, str], Any] = {}
+        self._query_tools: Dict[Tuple[str, ...], Any] = {}
+        self.created_at = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.transitions: List[Dict[str, Any]] = []
+        # Set by the entrypoint when speculative prefetch is enabled
+        self.prefetcher = None
+
+    def _make_route_tool(self, node: CompiledNode, route: RouteTarget):
+        registry = self
+        next_node = route.next_node
+
+        @function_tool(name=route.tool_name, description=f"Use this tool {route.condition}")
+        async def tool_fn(context: RunContext):
+            start = time.perf_counter()
+            agent = await registry.agent_factory(
+                next_node,
+                chat_ctx=context.session._chat_ctx,
+                agent_id=registry.agent_id,
+                flow_graph=registry.flow_graph,
+                tool_registry=registry,
+            )
+            elapsed = time.perf_counter() - start
+            registry.transitions.append({"from": node.node_id, "to": next_node, "tool": route.tool_name, "seconds": elapsed})
+            logger.info(f"Time taken to create agent: {elapsed} seconds")
+            return agent
+
+        return tool_fn
+
+    def route_tools(self, node: CompiledNode) -> list:
+        """Tools leading out of `node`, built on first use."""
+        tools = []
+        for route in node.routes:
+            key = (node.node_id, route.tool_name)
+            tool = self._route_tools.get(key)
+            if tool is None:
+                self.misses += 1
+                tool = self._make_route_tool(node, route)
+                self._route_tools[key] = tool
+            else:
+                self.hits += 1
+            tools.append(tool)
+        return tools
+
+    def query_tool(self, node: Optional[CompiledNode] = None):
+        """
+        Knowledge base tool for the vector stores of `node` (the flow's when no node is given),
+        or None when there are none or they failed to load.
+        """
+        global_settings = self.flow_graph.agent_config.global_settings
+        store_ids = node.vector_store_ids if node is not None else knowledge_base_store_ids(global_settings)
+        if not store_ids:
+            return None
+        if store_ids not in self._query_tools:
+            self._query_tools[store_ids] = None
+            try:
+                self._query_tools[store_ids] = build_query_tool(store_ids, **knowledge_base_options(global_settings))
+            except Exception as e:
+                logger.error(f"Failed to load vector store tool: {e}")
+        return self._query_tools[store_ids]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Debug view of the tools built so far for this session."""
+        return {
+            "agent_id": self.agent_id,
+            "route_tools": [
+                {"node_id": node_id, "tool_name": tool_name} for node_id, tool_name in self._route_tools
+            ],
+            "query_tool_loaded": any(tool is not None for tool in self._query_tools.values()),
+            "query_tool_stores": [list(store_ids) for store_ids, tool in self._query_tools.items() if tool is not None],
+            "hits": self.hits,
+            "misses": self.misses,
+            "transitions": list(self.transitions),
+            "prefetch": self.prefetcher.stats() if self.prefetcher else None,
+        }
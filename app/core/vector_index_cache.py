@@ -0,0 +1,139 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+from app.core.config import settings
+from app.utils.vector_store_utils import get_vector_store_dir, load_vector_store_from_mongo
+
+logger = logging.getLogger("vector-index-cache")
+
+
+def disk_stamp(store_id: str) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    (name, mtime_ns, size) of every file in the store directory: the JSON docstore and
+    index files, and the headers and generation-named data files of the memmap vectors,
+    IVF index and BM25 index. Any write replaces one of them, so the stamp changes.
+    """
+    store_path = get_vector_store_dir(store_id)
+    if not store_path.is_dir():
+        return ()
+    stamp = []
+    for path in sorted(store_path.iterdir()):
+        if path.is_file():
+            stat = path.stat()
+            stamp.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+class CachedVectorStore:
+    def __init__(self, store_id: str, stamp: Tuple, vs_info: Dict[str, Any], load_seconds: float):
+        self.store_id = store_id
+        self.stamp = stamp
+        self.vs_info = vs_info
+        self.load_seconds = load_seconds
+        # Approximated by the size on disk of every file in the stamp
+        self.approx_bytes = sum(size for _, _, size in stamp)
+        self.loaded_at = time.time()
+
+
+class VectorIndexCache:
+    """
+    LRU cache of loaded vector indexes, keyed by store id and the modification stamp
+    of the persisted files.
+
+    A hit costs a few stat() calls; the Mongo metadata read, embedding model and
+    `load_index_from_storage` only happen on a miss or after the index on disk has
+    changed. The cache is bounded by entry count and by approximate size, and the
+    vectorize/delete endpoints invalidate it.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedVectorStore]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.load_seconds_total = 0.0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.approx_bytes for entry in self._entries.values())
+
+    def get(self, store_id: str) -> Dict[str, Any]:
+        """
+        Return the loaded vector store (metadata with `index`, `embed_model` and `config`),
+        as `load_vector_store_from_mongo` does. The index is shared, treat it as read-only.
+
+        Raises:
+            HTTPException: From `load_vector_store_from_mongo` when the store cannot be loaded
+        """
+        store_id = str(store_id)
+        entry = self._entries.get(store_id)
+        if entry is not None:
+            if entry.stamp == disk_stamp(store_id):
+                self._entries.move_to_end(store_id)
+                self.hits += 1
+                return entry.vs_info
+            self.stale += 1
+            self._entries.pop(store_id, None)
+
+        self.misses += 1
+        start = time.perf_counter()
+        vs_info = load_vector_store_from_mongo(store_id)
+        load_seconds = time.perf_counter() - start
+        self.load_seconds_total += load_seconds
+
+        # Stamp after loading, the loader may have just persisted an empty index
+        entry = CachedVectorStore(store_id, disk_stamp(store_id), vs_info, load_seconds)
+        # Identifies this version of the index, e.g. for the query_info answer cache
+        vs_info["index_stamp"] = entry.stamp
+        logger.info(f"Loaded vector store {store_id} (~{entry.approx_bytes / 2**20:.1f} MB) in {load_seconds:.3f}s")
+        self._store(entry)
+        return vs_info
+
+    def _store(self, entry: CachedVectorStore):
+        if self.max_bytes > 0 and entry.approx_bytes > self.max_bytes:
+            logger.warning(f"Vector store {entry.store_id} is larger than the cache budget, not caching it")
+            return
+        self._entries[entry.store_id] = entry
+        while self._entries and (
+            len(self._entries) > self.max_entries or (self.max_bytes > 0 and self.total_bytes > self.max_bytes)
+        ):
+            evicted_id, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"Evicted vector store {evicted_id} from the index cache")
+
+    def invalidate(self, store_id: str):
+        if self._entries.pop(str(store_id), None):
+            logger.info(f"Invalidated cached vector store {store_id}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "approx_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_reloads": self.stale,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "load_seconds_total": round(self.load_seconds_total, 3),
+            "load_seconds_avg": round(self.load_seconds_total / self.misses, 3) if self.misses else 0.0,
+            "stores": {
+                store_id: {"approx_bytes": entry.approx_bytes, "load_seconds": round(entry.load_seconds, 3)}
+                for store_id, entry in self._entries.items()
+            },
+        }
+
+
+vector_index_cache = VectorIndexCache(
+    max_bytes=settings.VECTOR_INDEX_CACHE_MAX_MB * 2**20,
+    max_entries=settings.VECTOR_INDEX_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,228 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional, Any
+from livekit.agents import Worker
+from app.core.config import settings
+from app.core.start_agent import build_worker_options
+from app.utils.dispatch_service import create_agent_dispatch
+
+logger = logging.getLogger("worker-pool")
+
+
+class PooledWorker:
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        self.worker: Optional[Worker] = None
+        self.task: Optional[asyncio.Task] = None
+        self.started_at = time.time()
+        self.restarts = 0
+        self.dispatched = 0
+        self.pending = 0  # Sessions routed here whose job has not shown up yet
+        self.retiring = False
+
+    @property
+    def active_jobs(self) -> list:
+        if not self.worker:
+            return []
+        try:
+            return self.worker.active_jobs
+        except Exception:
+            return []
+
+    @property
+    def load(self) -> int:
+        return len(self.active_jobs) + self.pending
+
+    def has_room(self, room_name: str) -> bool:
+        return any(job.job.room.name == room_name for job in self.active_jobs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "agent_name": self.agent_name,
+            "running": bool(self.task and not self.task.done()),
+            "retiring": self.retiring,
+            "active_jobs": len(self.active_jobs),
+            "pending_sessions": self.pending,
+            "dispatched": self.dispatched,
+            "restarts": self.restarts,
+            "started_at": self.started_at,
+        }
+
+
+class WorkerPool:
+    """
+    A fixed set of long-lived LiveKit workers registered under stable agent names.
+
+    Sessions are routed to the least loaded worker and reach it through explicit
+    dispatch, so starting a session costs a dispatch round trip instead of a new
+    worker registration.
+    """
+
+    def __init__(self, size: int, prefix: str):
+        self.prefix = prefix
+        self.target_size = max(size, 0)
+        self.workers: Dict[str, PooledWorker] = {}
+        self._round_robin = itertools.count()
+        self._lock = asyncio.Lock()
+        self._retire_tasks: set = set()
+
+    def _agent_name(self, index: int) -> str:
+        return f"{self.prefix}-{index}"
+
+    async def start(self):
+        await self.resize(self.target_size)
+
+    async def stop(self):
+        async with self._lock:
+            workers = list(self.workers.values())
+            self.workers.clear()
+        await asyncio.gather(*(self._close_worker(pw) for pw in workers), return_exceptions=True)
+        logger.info("Worker pool stopped")
+
+    async def resize(self, size: int) -> Dict[str, Any]:
+        """
+        Grow or shrink the pool to `size` workers.
+
+        Removed workers are drained in the background so live calls are not cut off.
+        """
+        if size < 0:
+            raise ValueError("Pool size must be zero or greater")
+
+        async with self._lock:
+            self.target_size = size
+            for index in range(size):
+                agent_name = self._agent_name(index)
+                if agent_name not in self.workers:
+                    self.workers[agent_name] = self._spawn(agent_name)
+
+            for agent_name in [name for name in self.workers if int(name.rsplit("-", 1)[1]) >= size]:
+                pooled = self.workers.pop(agent_name)
+                pooled.retiring = True
+                task = asyncio.create_task(self._close_worker(pooled, drain=True))
+                self._retire_tasks.add(task)
+                task.add_done_callback(self._retire_tasks.discard)
+
+        logger.info(f"Worker pool resized to {size} workers")
+        return self.stats()
+
+    def _spawn(self, agent_name: str) -> PooledWorker:
+        pooled = PooledWorker(agent_name)
+        pooled.task = asyncio.create_task(self._run_worker(pooled), name=f"worker:{agent_name}")
+        return pooled
+
+    async def _run_worker(self, pooled: PooledWorker):
+        backoff = 1.0
+        while not pooled.retiring:
+            pooled.worker = Worker(opts=build_worker_options(pooled.agent_name))
+            pooled.started_at = time.time()
+            try:
+                logger.info(f"Starting pooled worker {pooled.agent_name}")
+                await pooled.worker.run()
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Pooled worker {pooled.agent_name} crashed: {e}")
+
+            if pooled.retiring:
+                break
+
+            pooled.restarts += 1
+            logger.warning(f"Restarting pooled worker {pooled.agent_name} in {backoff:.0f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _close_worker(self, pooled: PooledWorker, drain: bool = False):
+        pooled.retiring = True
+        worker = pooled.worker
+        if worker:
+            try:
+                if drain:
+                    await worker.drain()
+                await worker.aclose()
+            except Exception as e:
+                logger.error(f"Error closing pooled worker {pooled.agent_name}: {e}")
+
+        if pooled.task and not pooled.task.done():
+            pooled.task.cancel()
+            try:
+                await pooled.task
+            except (asyncio.CancelledError, Exception):
+                pass
+        logger.info(f"Pooled worker {pooled.agent_name} closed")
+
+    def acquire(self) -> PooledWorker:
+        """Pick the least loaded running worker, rotating between equally loaded ones."""
+        candidates = [pw for pw in self.workers.values() if not pw.retiring]
+        if not candidates:
+            raise RuntimeError("No agent workers available in the pool")
+
+        offset = next(self._round_robin)
+        rotated = candidates[offset % len(candidates):] + candidates[:offset % len(candidates)]
+        pooled = min(rotated, key=lambda pw: pw.load)
+        pooled.dispatched += 1
+        return pooled
+
+    async def dispatch(
+        self,
+        agent_id: str,
+        room_name: str,
+        phone_number: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """Route a new session to a pooled worker through an explicit agent dispatch."""
+        pooled = self.acquire()
+        dispatch = await create_agent_dispatch(
+            agent_id=agent_id,
+            phone_number=phone_number,
+            agent_name=pooled.agent_name,
+            room_name=room_name,
+            metadata=metadata,
+        )
+        return pooled.agent_name, dispatch
+
+    async def wait_for_session(self, agent_name: str, room_name: str, start_timeout: Optional[float] = None):
+        """
+        Follow a session on its pooled worker: resolves once the job for `room_name`
+        has started and finished, or raises TimeoutError if it never started.
+        """
+        start_timeout = start_timeout or settings.AGENT_SESSION_START_TIMEOUT
+        pooled = self.workers.get(agent_name)
+        if not pooled:
+            raise RuntimeError(f"Agent worker '{agent_name}' is not part of the pool")
+
+        pooled.pending += 1
+        started = False
+        try:
+            deadline = time.monotonic() + start_timeout
+            while not pooled.has_room(room_name):
+                if time.monotonic() > deadline:
+                    raise asyncio.TimeoutError(f"Session in room '{room_name}' did not start on {agent_name}")
+                await asyncio.sleep(0.5)
+
+            started = True
+            pooled.pending -= 1
+            logger.info(f"Session for room {room_name} running on {agent_name}")
+
+            while pooled.has_room(room_name):
+                await asyncio.sleep(1.0)
+            logger.info(f"Session for room {room_name} finished on {agent_name}")
+        finally:
+            if not started:
+                pooled.pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        workers: List[Dict[str, Any]] = [pw.to_dict() for pw in self.workers.values()]
+        return {
+            "target_size": self.target_size,
+            "size": len(workers),
+            "active_jobs": sum(w["active_jobs"] for w in workers),
+            "pending_sessions": sum(w["pending_sessions"] for w in workers),
+            "retiring": len(self._retire_tasks),
+            "workers": workers,
+        }
+
+
+worker_pool = WorkerPool(size=settings.AGENT_WORKER_POOL_SIZE, prefix=settings.AGENT_WORKER_PREFIX)
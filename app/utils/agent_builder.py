@@ -1,8 +1,11 @@
 from livekit.plugins import openai, google, deepgram, groq
 from google.cloud.texttospeech import VoiceSelectionParams
 from typing import Optional
+from app.utils.fake_providers import FakeLLM, FakeSTT, FakeTTS
 
 def build_llm_instance(provider: str, model: str, api_key: str, temperature: Optional[float]=None):
+    if provider == "fake":
+        return FakeLLM(model=model)
     if provider == "gemini":
         return google.LLM(model=model, api_key=api_key,temperature=temperature)
     elif provider == "groq":
@@ -10,6 +13,8 @@ def build_llm_instance(provider: str, model: str, api_key: str, temperature: Opt
     return openai.LLM(model=model, api_key=api_key,temperature=temperature)
 
 def build_stt_instance(provider: str, model: str, language: str, api_key: str):
+    if provider == "fake":
+        return FakeSTT(model=model, language=language)
     if provider == "openai":
         return openai.STT(model=model, language=language, api_key=api_key)
     if provider == "deepgram":
@@ -17,6 +22,8 @@ def build_stt_instance(provider: str, model: str, language: str, api_key: str):
     return deepgram.STT(model="nova-3", language="en", api_key=api_key)
 
 def build_tts_instance(provider: str, model: str, language: str, credentials_info: dict | str = None):
+    if provider == "fake":
+        return FakeTTS(model=model, language=language)
     if provider == "google":
         return google.TTS(voice=VoiceSelectionParams(name=model, language_code=language),credentials_info=credentials_info)
     elif provider == "deepgram":
@@ -0,0 +1,208 @@
+import json
+import logging
+import math
+import re
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.utils.store_files import (
+    FILES_ID_KEY, new_files_id, publish_header, read_published, remove_stale_files, versioned_name,
+)
+
+logger = logging.getLogger(__name__)
+
+# BM25 index of a store's chunk text, next to its other files. Data files are named after the
+# build that wrote them (bm25.<files_id>.rows, ...), see app/utils/store_files.py:
+#   bm25.json      header: chunk count, average chunk length, k1, b and the id of its data files
+#   bm25.vocab     JSON list of terms and the node id of every row
+#   bm25.offsets   int64 start of every term's postings, plus the end
+#   bm25.rows      uint32 row of every posting, grouped by term
+#   bm25.tf        uint16 term frequency of every posting
+#   bm25.doclen    uint32 token count of every row
+BM25_HEADER_FILE = "bm25.json"
+BM25_VOCAB_FILE = "bm25.vocab"
+BM25_OFFSETS_FILE = "bm25.offsets"
+BM25_ROWS_FILE = "bm25.rows"
+BM25_TF_FILE = "bm25.tf"
+BM25_DOCLEN_FILE = "bm25.doclen"
+BM25_DATA_FILES = (BM25_VOCAB_FILE, BM25_OFFSETS_FILE, BM25_ROWS_FILE, BM25_TF_FILE, BM25_DOCLEN_FILE)
+
+K1 = 1.2
+B = 0.75
+
+_WORD = re.compile(r"[0-9a-z]+")
+# Codes such as "ZX-900", "A/12" or "v2.1"; also indexed joined, so "zx900" matches "ZX-900"
+_CODE = re.compile(r"[0-9a-z]+(?:[-_./][0-9a-z]+)+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from have how i if in is it its me my of on or our "
+    "please should tell that the their there this to was we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words without stopwords or single letters, plus the joined form of codes that contain digits."""
+    text = text.lower()
+    tokens = [token for token in _WORD.findall(text)
+              if token not in _STOPWORDS and (len(token) > 1 or token.isdigit())]
+    for code in _CODE.findall(text):
+        if any(char.isdigit() for char in code):
+            tokens.append(re.sub(r"[-_./]", "", code))
+    return tokens
+
+
+def build_bm25_index(store_path: Path, rows: Iterable[Tuple[str, str]]) -> Dict[str, Any]:
+    """
+    Build and write the BM25 index of (node_id, text) rows.
+
+    Returns:
+        The header
+    """
+    start = time.perf_counter()
+    vocab: Dict[str, int] = {}
+    node_ids: List[str] = []
+    doclen = array("I")
+    post_terms, post_rows, post_tf = array("I"), array("I"), array("H")
+    for row, (node_id, text) in enumerate(rows):
+        counts = Counter(tokenize(text))
+        node_ids.append(node_id)
+        doclen.append(sum(counts.values()))
+        for term, tf in counts.items():
+            post_terms.append(vocab.setdefault(term, len(vocab)))
+            post_rows.append(row)
+            post_tf.append(min(tf, 65535))
+
+    terms = np.frombuffer(post_terms, dtype=np.uint32) if post_terms else np.zeros(0, dtype=np.uint32)
+    order = np.argsort(terms, kind="stable")
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+
+    lengths = np.frombuffer(doclen, dtype=np.uint32) if doclen else np.zeros(0, dtype=np.uint32)
+    files = {
+        BM25_OFFSETS_FILE: offsets,
+        BM25_ROWS_FILE: np.frombuffer(post_rows, dtype=np.uint32)[order] if post_rows else np.zeros(0, np.uint32),
+        BM25_TF_FILE: np.frombuffer(post_tf, dtype=np.uint16)[order] if post_tf else np.zeros(0, np.uint16),
+        BM25_DOCLEN_FILE: lengths,
+    }
+    # Loaded indexes keep mapping the files they opened, so a build writes new files and publishes them at once
+    files_id = new_files_id()
+    for name, values in files.items():
+        values.tofile(store_path / versioned_name(name, files_id))
+    (store_path / versioned_name(BM25_VOCAB_FILE, files_id)).write_text(
+        json.dumps({"terms": list(vocab), "ids": node_ids})
+    )
+
+    header = {
+        FILES_ID_KEY: files_id,
+        "count": len(node_ids),
+        "terms": len(vocab),
+        "avgdl": float(lengths.mean()) if len(lengths) else 0.0,
+        "k1": K1,
+        "b": B,
+        "build_seconds": round(time.perf_counter() - start, 3),
+    }
+    publish_header(store_path, BM25_HEADER_FILE, header)
+    remove_stale_files(store_path, BM25_DATA_FILES, keep=files_id)
+    logger.info(f"Built BM25 index of {store_path.name}: {len(node_ids)} chunks, {len(vocab)} terms "
+                f"in {header['build_seconds']}s")
+    return header
+
+
+def remove_bm25_index(store_path: Path):
+    (store_path / BM25_HEADER_FILE).unlink(missing_ok=True)
+    remove_stale_files(store_path, BM25_DATA_FILES)
+
+
+def _load_array(path: Path, dtype) -> np.ndarray:
+    # numpy cannot map an empty file
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+@dataclass
+class LexicalResult:
+    # (node_id, BM25 score) best first
+    hits: List[Tuple[str, float]] = field(default_factory=list)
+    # Share of the query's idf weight matched by the best chunk
+    coverage: float = 0.0
+    # Best score over the second best
+    margin: float = 0.0
+
+
+class Bm25Index:
+    """
+    In-process BM25 index over the chunk text of one store.
+
+    Postings are memory mapped; a query reads only the postings of its terms.
+    """
+
+    def __init__(self, header: Dict[str, Any], terms: List[str], node_ids: List[str], offsets: np.ndarray,
+                 rows: np.ndarray, tf: np.ndarray, doclen: np.ndarray):
+        self.header = header
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.node_ids = node_ids
+        self.offsets = offsets
+        self.rows = rows
+        self.tf = tf
+        self.doclen = doclen
+        count = header["count"]
+        df = np.diff(offsets).astype(np.float64)
+        self.idf = np.log(1.0 + (count - df + 0.5) / (df + 0.5))
+        # Weight of a query term no chunk contains
+        self.unseen_idf = math.log(1.0 + (count + 0.5) / 0.5)
+
+    @classmethod
+    def load(cls, store_path: Path) -> Optional["Bm25Index"]:
+        def open_files(header: Dict[str, Any]):
+            files_id = header.get(FILES_ID_KEY)
+            vocab = json.loads((store_path / versioned_name(BM25_VOCAB_FILE, files_id)).read_text())
+            return (
+                vocab["terms"],
+                vocab["ids"],
+                np.fromfile(store_path / versioned_name(BM25_OFFSETS_FILE, files_id), dtype=np.int64),
+                _load_array(store_path / versioned_name(BM25_ROWS_FILE, files_id), np.uint32),
+                _load_array(store_path / versioned_name(BM25_TF_FILE, files_id), np.uint16),
+                _load_array(store_path / versioned_name(BM25_DOCLEN_FILE, files_id), np.uint32),
+            )
+
+        try:
+            header, files = read_published(store_path, BM25_HEADER_FILE, open_files)
+        except FileNotFoundError:
+            return None
+        return cls(header, *files)
+
+    def search(self, query: str, k: int) -> LexicalResult:
+        """Top-k chunks of `query` by BM25, with the coverage and margin of the best one."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        term_ids = [self.vocab[token] for token in tokens if token in self.vocab]
+        if not term_ids or not self.header["count"]:
+            return LexicalResult()
+
+        k1, b, avgdl = self.header["k1"], self.header["b"], self.header["avgdl"] or 1.0
+        rows, weights, idfs = [], [], []
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            term_rows = np.asarray(self.rows[start:end], dtype=np.int64)
+            tf = np.asarray(self.tf[start:end], dtype=np.float64)
+            norm = k1 * (1 - b + b * self.doclen[term_rows] / avgdl)
+            rows.append(term_rows)
+            weights.append(self.idf[term_id] * tf * (k1 + 1) / (tf + norm))
+            idfs.append(np.full(len(term_rows), self.idf[term_id]))
+
+        candidates, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        matched = np.bincount(inverse, weights=np.concatenate(idfs))
+
+        top = np.argsort(-scores)[:max(k, 2)]
+        query_weight = float(sum(self.idf[self.vocab[t]] if t in self.vocab else self.unseen_idf for t in tokens))
+        best = top[0]
+        second = scores[top[1]] if len(top) > 1 else 0.0
+        return LexicalResult(
+            hits=[(self.node_ids[candidates[i]], float(scores[i])) for i in top[:k]],
+            coverage=float(matched[best]) / query_weight,
+            margin=float(scores[best] / second) if second else float("inf"),
+        )
@@ -6,16 +6,16 @@ from app.core.config import settings
 
 async def create_agent_dispatch(
     agent_id: str,
-    phone_number: str,
+    phone_number: Optional[str],
     agent_name: str,
     room_name: str,
     metadata: Optional[Dict[str, Any]] = None,
 ) -> Optional[api.AgentDispatch]:
     """
-    Create an agent dispatch for outbound calling.
+    Create an agent dispatch, dialing out when a phone number is given.
     
     Args:
-        phone_number: The phone number to call (e.g., "+918108709605")
+        phone_number: The phone number to call (e.g., "+918108709605"), or None for a web session
         agent_name: Name of the agent to dispatch (default: "outbound-caller")
         metadata: Additional metadata to pass to the agent. If None, only phone_number is included.
         room_prefix: Prefix for the generated room name (default: "outbound")
@@ -29,13 +29,11 @@ async def create_agent_dispatch(
     # Use provided values or fall back to environment variables
 
     # Prepare metadata
-    if metadata is None:
-        metadata = {"phone_number": phone_number, "agent_id": agent_id}
-       
-    else:
-        # Ensure phone_number is in metadata
+    metadata = dict(metadata or {})
+    metadata["agent_id"] = agent_id
+    if phone_number:
+        # The entrypoint dials out whenever phone_number is present
         metadata["phone_number"] = phone_number
-        metadata["agent_id"]= agent_id
     
     
     # Create API client
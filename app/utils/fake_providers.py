@@ -0,0 +1,281 @@
+"""
+Offline stand-ins for the STT, LLM and TTS providers, selected with provider "fake".
+
+They need no network or API keys and behave deterministically, so they can be used
+to load-test the agent pipeline (see benchmarks/load_test.py). Latencies and scripts
+are read from `fake_options` when an instance is created.
+"""
+import asyncio
+import json
+import math
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+import numpy as np
+from livekit import rtc
+from livekit.agents import APIConnectOptions, llm, stt, tts
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS, NOT_GIVEN, NotGivenOr
+
+# Tools with side effects outside the session (hang up, transfer, ...) are never called by the fake LLM
+NON_ROUTE_TOOLS = {"end_call", "hangup", "detected_answering_machine", "transfer_call", "query_info"}
+
+
+@dataclass
+class FakeProviderOptions:
+    # LLM
+    llm_ttft: float = 0.3
+    llm_tokens_per_second: float = 60.0
+    llm_reply: str = "Sure, I can help with that. Could you tell me a little more about what you need?"
+    llm_route_every: int = 2
+    # STT
+    stt_script: List[str] = field(default_factory=lambda: [
+        "Hi, I am calling about my account.",
+        "Yes, that's right.",
+        "Can you tell me more about the options?",
+        "Okay, let's go with the first one.",
+        "Thank you, that's all.",
+    ])
+    stt_utterance_interval: float = 4.0
+    stt_delay: float = 0.1
+    # TTS
+    tts_ttfb: float = 0.1
+    tts_words_per_second: float = 2.5
+    tts_sample_rate: int = 24000
+    tts_tone_hz: float = 0.0
+
+
+fake_options = FakeProviderOptions()
+
+
+def configure_fake_providers(**options) -> FakeProviderOptions:
+    """Update the options used by fake providers created afterwards."""
+    for name, value in options.items():
+        if not hasattr(fake_options, name):
+            raise ValueError(f"Unknown fake provider option: {name}")
+        setattr(fake_options, name, value)
+    return fake_options
+
+
+# ---------------------- LLM ----------------------
+
+class FakeLLM(llm.LLM):
+    """
+    Deterministic LLM. Every `route_every`-th user turn it calls one of the route tools
+    offered by the current node (picked from the turn number), otherwise it streams a
+    canned reply at `tokens_per_second` after `ttft`. Use one instance per session.
+    """
+
+    def __init__(self, model: str = "fake", ttft: Optional[float] = None, tokens_per_second: Optional[float] = None,
+                 reply: Optional[str] = None, route_every: Optional[int] = None):
+        super().__init__()
+        self.model = model
+        self.ttft = fake_options.llm_ttft if ttft is None else ttft
+        self.tokens_per_second = fake_options.llm_tokens_per_second if tokens_per_second is None else tokens_per_second
+        self.reply = fake_options.llm_reply if reply is None else reply
+        self.route_every = fake_options.llm_route_every if route_every is None else route_every
+        self.calls = 0
+        self.routed_turn = 0
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: Optional[list] = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        parallel_tool_calls: NotGivenOr[bool] = NOT_GIVEN,
+        tool_choice: NotGivenOr[llm.ToolChoice] = NOT_GIVEN,
+        extra_kwargs: NotGivenOr[dict] = NOT_GIVEN,
+    ) -> "FakeLLMStream":
+        self.calls += 1
+        return FakeLLMStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class FakeLLMStream(llm.LLMStream):
+    def _pick_route_tool(self) -> Optional[str]:
+        fake_llm: FakeLLM = self._llm
+        if fake_llm.route_every <= 0:
+            return None
+
+        items = self._chat_ctx.items
+        # A tool was just called for this turn, answer it instead of routing again
+        if items and items[-1].type == "function_call_output":
+            return None
+
+        user_turns = sum(1 for item in items if item.type == "message" and item.role == "user")
+        if user_turns == 0 or user_turns % fake_llm.route_every != 0:
+            return None
+        # The next node's agent replies to the same turn; route at most once per caller turn
+        if user_turns <= fake_llm.routed_turn:
+            return None
+
+        names = sorted(
+            name for name in (llm.utils.get_function_info(tool).name for tool in self._tools if llm.is_function_tool(tool))
+            if name not in NON_ROUTE_TOOLS
+        )
+        if not names:
+            return None
+        fake_llm.routed_turn = user_turns
+        return names[user_turns // fake_llm.route_every % len(names)]
+
+    async def _run(self) -> None:
+        fake_llm: FakeLLM = self._llm
+        request_id = f"fake-{uuid.uuid4().hex[:12]}"
+        await asyncio.sleep(fake_llm.ttft)
+
+        tool_name = self._pick_route_tool()
+        if tool_name:
+            self._event_ch.send_nowait(llm.ChatChunk(
+                id=request_id,
+                delta=llm.ChoiceDelta(role="assistant", tool_calls=[
+                    llm.FunctionToolCall(name=tool_name, arguments=json.dumps({}), call_id=f"call_{uuid.uuid4().hex[:12]}")
+                ]),
+            ))
+            completion_tokens = 1
+        else:
+            words = fake_llm.reply.split(" ")
+            delay = 1.0 / fake_llm.tokens_per_second if fake_llm.tokens_per_second > 0 else 0.0
+            for i, word in enumerate(words):
+                self._event_ch.send_nowait(llm.ChatChunk(
+                    id=request_id,
+                    delta=llm.ChoiceDelta(role="assistant", content=word if i == 0 else f" {word}"),
+                ))
+                if delay:
+                    await asyncio.sleep(delay)
+            completion_tokens = len(words)
+
+        prompt_tokens = sum(len(str(item)) // 4 for item in self._chat_ctx.items)
+        self._event_ch.send_nowait(llm.ChatChunk(
+            id=request_id,
+            usage=llm.CompletionUsage(
+                completion_tokens=completion_tokens,
+                prompt_tokens=prompt_tokens,
+                total_tokens=completion_tokens + prompt_tokens,
+            ),
+        ))
+
+
+# ---------------------- STT ----------------------
+
+class FakeSTT(stt.STT):
+    """
+    Scripted streaming STT. Ignores the audio content and emits the next scripted
+    transcript after every `utterance_interval` seconds of received audio.
+    """
+
+    def __init__(self, model: str = "fake", language: str = "en", script: Optional[List[str]] = None,
+                 utterance_interval: Optional[float] = None, delay: Optional[float] = None):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=True, interim_results=False))
+        self.model = model
+        self.language = language
+        self.script = list(fake_options.stt_script if script is None else script)
+        self.utterance_interval = fake_options.stt_utterance_interval if utterance_interval is None else utterance_interval
+        self.delay = fake_options.stt_delay if delay is None else delay
+
+    async def _recognize_impl(self, buffer, *, language: NotGivenOr[str] = NOT_GIVEN,
+                              conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS) -> stt.SpeechEvent:
+        await asyncio.sleep(self.delay)
+        text = self.script[0] if self.script else ""
+        return stt.SpeechEvent(
+            type=stt.SpeechEventType.FINAL_TRANSCRIPT,
+            alternatives=[stt.SpeechData(language=self.language, text=text, confidence=1.0)],
+        )
+
+    def stream(self, *, language: NotGivenOr[Optional[str]] = NOT_GIVEN,
+               conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS) -> "FakeRecognizeStream":
+        return FakeRecognizeStream(stt=self, conn_options=conn_options)
+
+
+class FakeRecognizeStream(stt.RecognizeStream):
+    def __init__(self, *, stt: FakeSTT, conn_options: APIConnectOptions):
+        super().__init__(stt=stt, conn_options=conn_options)
+        self.utterances_sent = 0
+
+    async def _emit_utterance(self, text: str, audio_duration: float):
+        fake_stt: FakeSTT = self._stt
+        request_id = f"fake-{uuid.uuid4().hex[:12]}"
+        data = stt.SpeechData(language=fake_stt.language, text=text, confidence=1.0)
+        self._event_ch.send_nowait(stt.SpeechEvent(type=stt.SpeechEventType.START_OF_SPEECH, request_id=request_id))
+        await asyncio.sleep(fake_stt.delay)
+        self._event_ch.send_nowait(stt.SpeechEvent(
+            type=stt.SpeechEventType.FINAL_TRANSCRIPT, request_id=request_id, alternatives=[data]
+        ))
+        self._event_ch.send_nowait(stt.SpeechEvent(type=stt.SpeechEventType.END_OF_SPEECH, request_id=request_id))
+        self._event_ch.send_nowait(stt.SpeechEvent(
+            type=stt.SpeechEventType.RECOGNITION_USAGE,
+            request_id=request_id,
+            recognition_usage=stt.RecognitionUsage(audio_duration=audio_duration),
+        ))
+
+    async def _run(self) -> None:
+        fake_stt: FakeSTT = self._stt
+        received = 0.0
+        async for frame in self._input_ch:
+            if isinstance(frame, self._FlushSentinel):
+                continue
+            received += frame.duration
+            if received < fake_stt.utterance_interval:
+                continue
+            if self.utterances_sent >= len(fake_stt.script):
+                continue
+            text = fake_stt.script[self.utterances_sent]
+            self.utterances_sent += 1
+            await self._emit_utterance(text, received)
+            received = 0.0
+
+
+# ---------------------- TTS ----------------------
+
+class FakeTTS(tts.TTS):
+    """Produces silence (or a sine tone) lasting as long as the text would take to speak."""
+
+    def __init__(self, model: str = "fake", language: str = "en", ttfb: Optional[float] = None,
+                 words_per_second: Optional[float] = None, sample_rate: Optional[int] = None,
+                 tone_hz: Optional[float] = None):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=fake_options.tts_sample_rate if sample_rate is None else sample_rate,
+            num_channels=1,
+        )
+        self.model = model
+        self.language = language
+        self.ttfb = fake_options.tts_ttfb if ttfb is None else ttfb
+        self.words_per_second = fake_options.tts_words_per_second if words_per_second is None else words_per_second
+        self.tone_hz = fake_options.tts_tone_hz if tone_hz is None else tone_hz
+
+    def synthesize(self, text: str, *,
+                   conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS) -> "FakeChunkedStream":
+        return FakeChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class FakeChunkedStream(tts.ChunkedStream):
+    FRAME_MS = 20
+
+    def _frame(self, index: int, samples_per_frame: int) -> rtc.AudioFrame:
+        fake_tts: FakeTTS = self._tts
+        if fake_tts.tone_hz > 0:
+            t = (np.arange(samples_per_frame) + index * samples_per_frame) / fake_tts.sample_rate
+            data = (np.sin(2 * math.pi * fake_tts.tone_hz * t) * 3000).astype(np.int16)
+        else:
+            data = np.zeros(samples_per_frame, dtype=np.int16)
+        return rtc.AudioFrame(
+            data=data.tobytes(),
+            sample_rate=fake_tts.sample_rate,
+            num_channels=1,
+            samples_per_channel=samples_per_frame,
+        )
+
+    async def _run(self) -> None:
+        fake_tts: FakeTTS = self._tts
+        request_id = f"fake-{uuid.uuid4().hex[:12]}"
+        await asyncio.sleep(fake_tts.ttfb)
+
+        words = max(len(self._input_text.split()), 1)
+        duration = words / fake_tts.words_per_second if fake_tts.words_per_second > 0 else 0.0
+        samples_per_frame = fake_tts.sample_rate * self.FRAME_MS // 1000
+        num_frames = max(int(duration * 1000 / self.FRAME_MS), 1)
+        for index in range(num_frames):
+            self._event_ch.send_nowait(tts.SynthesizedAudio(
+                frame=self._frame(index, samples_per_frame),
+                request_id=request_id,
+                is_final=index == num_frames - 1,
+            ))
@@ -0,0 +1,197 @@
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from app.utils.store_files import (
+    FILES_ID_KEY, new_files_id, publish_header, read_published, remove_stale_files, versioned_name,
+)
+from app.utils.vector_search import normalise, top_k_rows
+
+logger = logging.getLogger(__name__)
+
+# IVF (inverted file) index of a memmap store, next to its files. Data files are named after
+# the build that wrote them (ivf.<files_id>.rows, ...), see app/utils/store_files.py:
+#   ivf.json         header: list count, row count, the generation of the vectors it was built from
+#                    and the id of its data files
+#   ivf.centroids    (nlist, D) float32 unit-normalised k-means centroids
+#   ivf.rows         int64 row numbers grouped by list
+#   ivf.offsets      int64 start of every list in ivf.rows, plus the end
+IVF_HEADER_FILE = "ivf.json"
+IVF_CENTROIDS_FILE = "ivf.centroids"
+IVF_ROWS_FILE = "ivf.rows"
+IVF_OFFSETS_FILE = "ivf.offsets"
+IVF_DATA_FILES = (IVF_CENTROIDS_FILE, IVF_ROWS_FILE, IVF_OFFSETS_FILE)
+
+# Rows assigned to centroids per matrix product, bounding the (rows, nlist) score buffer
+ASSIGN_BLOCK_ROWS = 65536
+# k-means is trained on a sample of this many rows per list
+TRAIN_ROWS_PER_LIST = 64
+
+
+def default_nlist(count: int) -> int:
+    return max(1, int(np.sqrt(count)))
+
+
+def assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest (highest cosine) centroid of every row of `matrix`, computed block-wise."""
+    labels = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], ASSIGN_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + ASSIGN_BLOCK_ROWS])
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(matrix: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means over a random sample of the unit-normalised rows of `matrix`.
+
+    Args:
+        matrix: (N, D) normalised embeddings, e.g. a memmap
+        nlist: Number of centroids, at most N
+        iterations: Lloyd iterations
+        seed: Sampling seed, so rebuilding the same store gives the same lists
+
+    Returns:
+        (nlist, D) unit-normalised float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    sample_size = min(n, nlist * TRAIN_ROWS_PER_LIST)
+    sample = np.asarray(matrix[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[filled] = np.add.reduceat(sample[np.argsort(labels, kind="stable")], starts[filled], axis=0)
+        # Empty lists restart from random sample rows
+        empty = ~filled
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        centroids = normalise(sums)
+    return centroids
+
+
+def build_ivf_index(store_path: Path, matrix: np.ndarray, generation: Optional[str], nlist: int,
+                    previous: Optional["IvfIndex"] = None) -> Dict[str, Any]:
+    """
+    Build and write the IVF index of a store's vectors.
+
+    Centroids of a previous index with the same list count and dimension are kept and
+    only the rows are reassigned, so a sync does not retrain k-means.
+
+    Returns:
+        The IVF header
+    """
+    start = time.perf_counter()
+    n, dimension = matrix.shape
+    nlist = max(1, min(nlist, n))
+    if previous is not None and previous.centroids.shape == (nlist, dimension):
+        centroids = previous.centroids
+        retrained = False
+    else:
+        centroids = train_centroids(matrix, nlist)
+        retrained = True
+
+    labels = assign(matrix, centroids)
+    order = np.argsort(labels, kind="stable").astype(np.int64)
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=nlist), out=offsets[1:])
+
+    # Loaded indexes keep mapping the files they opened, so a build writes new files and publishes them at once
+    files_id = new_files_id()
+    for name, array in ((IVF_CENTROIDS_FILE, centroids.astype(np.float32)), (IVF_ROWS_FILE, order),
+                        (IVF_OFFSETS_FILE, offsets)):
+        array.tofile(store_path / versioned_name(name, files_id))
+    header = {
+        FILES_ID_KEY: files_id,
+        "nlist": nlist,
+        "count": n,
+        "dimension": dimension,
+        "generation": generation,
+        "retrained": retrained,
+        "build_seconds": round(time.perf_counter() - start, 3),
+    }
+    publish_header(store_path, IVF_HEADER_FILE, header)
+    remove_stale_files(store_path, IVF_DATA_FILES, keep=files_id)
+    logger.info(f"Built IVF index of {store_path.name}: {n} rows in {nlist} lists in {header['build_seconds']}s")
+    return header
+
+
+def remove_ivf_index(store_path: Path):
+    (store_path / IVF_HEADER_FILE).unlink(missing_ok=True)
+    remove_stale_files(store_path, IVF_DATA_FILES)
+
+
+def _open_files(store_path: Path, header: Dict[str, Any], count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    files_id = header.get(FILES_ID_KEY)
+    centroids = np.fromfile(store_path / versioned_name(IVF_CENTROIDS_FILE, files_id), dtype=np.float32)
+    rows = np.memmap(store_path / versioned_name(IVF_ROWS_FILE, files_id), dtype=np.int64, mode="r", shape=(count,))
+    offsets = np.fromfile(store_path / versioned_name(IVF_OFFSETS_FILE, files_id), dtype=np.int64)
+    return centroids.reshape(header["nlist"], header["dimension"]), rows, offsets
+
+
+class IvfIndex:
+    """
+    Inverted file index over the rows of a memmap store.
+
+    A query is compared with the centroids, and only the rows of the `nprobe` closest
+    lists are scored exactly; `nprobe` trades recall for latency.
+    """
+
+    def __init__(self, header: Dict[str, Any], centroids: np.ndarray, rows: np.ndarray, offsets: np.ndarray):
+        self.header = header
+        self.centroids = centroids
+        self.rows = rows
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, store_path: Path, count: int, generation: Optional[str]) -> Optional["IvfIndex"]:
+        """The store's IVF index, or None when it has none or it was built from other vectors."""
+        def open_files(header: Dict[str, Any]):
+            if header.get("count") != count or header.get("generation") != generation:
+                return None
+            return _open_files(store_path, header, count)
+
+        try:
+            header, files = read_published(store_path, IVF_HEADER_FILE, open_files)
+        except FileNotFoundError:
+            return None
+        if files is None:
+            logger.warning(f"IVF index of {store_path.name} does not match its vectors, using exact search")
+            return None
+        return cls(header, *files)
+
+    @property
+    def nlist(self) -> int:
+        return self.header["nlist"]
+
+    def search(self, matrix: np.ndarray, queries: np.ndarray, k: int, nprobe: int,
+               excluded_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate cosine top-k, with the same (rows, scores) result as `vector_search.search`.
+        Queries whose probed lists hold fewer than k rows are padded with -inf scores.
+        """
+        queries = normalise(queries)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        probes = top_k_rows(queries @ self.centroids.T, min(max(1, nprobe), self.nlist))
+
+        result_rows = np.zeros((len(queries), k), dtype=np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.sort(np.concatenate([
+                self.rows[self.offsets[lst]:self.offsets[lst + 1]] for lst in lists
+            ]))
+            if excluded_rows is not None and len(excluded_rows):
+                candidates = candidates[~np.isin(candidates, excluded_rows)]
+            if not len(candidates):
+                continue
+            scores = np.asarray(matrix[candidates]) @ query
+            top = top_k_rows(scores[None, :], min(k, len(candidates)))[0]
+            result_rows[i, :len(top)] = candidates[top]
+            result_scores[i, :len(top)] = scores[top]
+        return result_rows, result_scores
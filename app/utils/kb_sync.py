@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import httpx
+from fastapi import HTTPException
+from llama_index.core import VectorStoreIndex
+from app.core.config import settings
+from app.core.ingestion import ingestion_pipeline
+from app.utils.mongodb_client import MongoDBClient
+from app.utils.vector_store_utils import load_vector_store_from_mongo, persist_index
+
+logger = logging.getLogger(__name__)
+
+mongo_client = MongoDBClient()
+
+# Vector store field holding one entry per synced knowledge base document
+SYNC_FIELD = "synced_documents"
+
+
+def delete_document_nodes(index: VectorStoreIndex, node_ids: List[str]):
+    """Remove the chunks of one document from the vector store, docstore and index struct."""
+    if not node_ids:
+        return
+    index.delete_nodes(node_ids, delete_from_docstore=True)
+    if not index.vector_store.stores_text:
+        for node_id in node_ids:
+            index.index_struct.delete(node_id)
+        index.storage_context.index_store.add_index_struct(index.index_struct)
+
+
+async def _fetch_document(doc: Dict[str, Any], previous: Optional[Dict[str, Any]], store_id: str,
+                          config: Dict[str, Any], embed_model) -> Dict[str, Any]:
+    """Download, parse and embed one document; unchanged documents stop after the download."""
+    url, filename = doc["filepath"], doc["filename"]
+    outcome = {"url": url, "filename": filename, "previous": previous, "cached": 0, "embedded": 0}
+    try:
+        download = await ingestion_pipeline.download(url, filename, previous and previous.get("etag"))
+    except httpx.HTTPError as e:
+        logger.warning(f"Failed to download {filename} for vector store {store_id}: {e}")
+        return {**outcome, "state": "failed"}
+
+    if previous and download.status_code == 304:
+        return {**outcome, "state": "unchanged", "entry": previous}
+    if download.status_code != 200:
+        logger.warning(f"Failed to download {filename} for vector store {store_id}: HTTP {download.status_code}")
+        return {**outcome, "state": "failed"}
+
+    try:
+        if previous and previous.get("content_hash") == download.content_hash:
+            return {**outcome, "state": "unchanged", "entry": {**previous, "etag": download.etag}}
+
+        nodes = await ingestion_pipeline.parse(download, config.get("chunk_size", 512), config.get("chunk_overlap", 100))
+        cached, embedded = await ingestion_pipeline.embed(
+            nodes, embed_model, config.get("provider", "openai"), use_cache=settings.EMBEDDING_CACHE_ENABLED
+        )
+    except Exception as e:
+        logger.exception(f"Failed to ingest {filename} for vector store {store_id}: {e}")
+        return {**outcome, "state": "failed"}
+    finally:
+        download.discard()
+
+    return {
+        **outcome,
+        "state": "updated" if previous else "added",
+        "nodes": nodes,
+        "cached": cached,
+        "embedded": embedded,
+        "entry": {
+            "url": url,
+            "filename": filename,
+            "etag": download.etag,
+            "content_hash": download.content_hash,
+            "node_ids": [node.node_id for node in nodes],
+            "synced_at": datetime.utcnow().isoformat(),
+        },
+    }
+
+
+def _apply_changes(store_id: str, index: VectorStoreIndex, outcomes: List[Dict[str, Any]],
+                   removed: List[Dict[str, Any]], persist: bool, config: Dict[str, Any]):
+    """Swap the nodes of changed documents, drop removed ones and persist once. Runs in a thread."""
+    for outcome in outcomes:
+        if outcome["state"] in ("added", "updated"):
+            if outcome["previous"]:
+                delete_document_nodes(index, outcome["previous"].get("node_ids", []))
+            index.insert_nodes(outcome["nodes"])
+    for entry in removed:
+        delete_document_nodes(index, entry.get("node_ids", []))
+
+    if persist:
+        persist_index(store_id, index, config)
+
+
+async def sync_knowledge_base(store_id: str, progress: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Bring the index of a vector store in line with its knowledge base.
+
+    Every synced document is recorded in the store's `synced_documents` with its URL,
+    ETag, content hash and node ids. Documents whose ETag or content hash is unchanged
+    are skipped, changed ones have their old nodes replaced, and documents no longer
+    in the knowledge base have their nodes deleted. Stores indexed before sync state
+    existed are rebuilt once, since their nodes cannot be attributed to documents.
+
+    Documents are downloaded, parsed and embedded concurrently by the ingestion
+    pipeline; the index is then updated and persisted once, off the event loop.
+    Cancelling the sync before that point leaves the store untouched; once it has
+    started, the update completes and the sync returns its result regardless.
+
+    Args:
+        store_id: The vector store id
+        progress: Optional counters updated as documents complete (documents_total,
+            documents_done, documents_failed, chunks_embedded, chunks_from_cache)
+
+    Returns:
+        Lists of added, updated, unchanged, removed and failed filenames, and chunk counts
+
+    Raises:
+        HTTPException: 400/404 when the store or its knowledge base is missing
+    """
+    start = time.perf_counter()
+    # Load a private copy, the cached index is shared by running sessions
+    vs_info = await asyncio.to_thread(load_vector_store_from_mongo, store_id)
+    config = vs_info["config"]
+    knowledgebase_id = config.get("knowledgeBase_id")
+
+    if not knowledgebase_id:
+        raise HTTPException(status_code=400, detail="No knowledgeBase_id found in vector store config.")
+
+    kb = await asyncio.to_thread(mongo_client.get_knowledgebase_by_id, knowledgebase_id)
+    if not kb:
+        raise HTTPException(status_code=404, detail="Knowledgebase not found")
+
+    documents = [doc for doc in kb.get("documents", []) if doc.get("filepath") and doc.get("filename")]
+    if not documents:
+        raise HTTPException(status_code=404, detail="No documents in knowledgebase")
+
+    embed_model = vs_info["embed_model"]
+    index = vs_info.get("index")
+    synced = {entry["url"]: entry for entry in vs_info.get(SYNC_FIELD) or []}
+    if not synced and index is not None and index.docstore.docs:
+        logger.info(f"Vector store {store_id} has no sync state, rebuilding its index")
+        index = None
+    if index is None:
+        index = VectorStoreIndex(nodes=[], embed_model=embed_model)
+
+    # A URL listed twice is ingested once
+    documents = list({doc["filepath"]: doc for doc in documents}.values())
+    progress = progress if progress is not None else {}
+    progress.update(documents_total=len(documents), documents_done=0, documents_failed=0,
+                    chunks_embedded=0, chunks_from_cache=0)
+
+    async def fetch(doc):
+        outcome = await _fetch_document(doc, synced.get(doc["filepath"]), store_id, config, embed_model)
+        progress["documents_failed" if outcome["state"] == "failed" else "documents_done"] += 1
+        progress["chunks_embedded"] += outcome["embedded"]
+        progress["chunks_from_cache"] += outcome["cached"]
+        return outcome
+
+    outcomes = await asyncio.gather(*(fetch(doc) for doc in documents))
+
+    result = {"added": [], "updated": [], "unchanged": [], "removed": [], "failed": [],
+              "chunks_embedded": 0, "chunks_from_cache": 0}
+    current = {}
+    for outcome in outcomes:
+        result[outcome["state"]].append(outcome["filename"])
+        result["chunks_embedded"] += outcome["embedded"]
+        result["chunks_from_cache"] += outcome["cached"]
+        # A failed download keeps what is indexed rather than dropping the document
+        entry = outcome.get("entry") or outcome["previous"]
+        if entry:
+            current[outcome["url"]] = entry
+
+    removed = [entry for url, entry in synced.items() if url not in current]
+    result["removed"] = [entry.get("filename", entry["url"]) for entry in removed]
+
+    changed = bool(result["added"] or result["updated"] or result["removed"])
+
+    async def commit():
+        await asyncio.to_thread(_apply_changes, store_id, index, outcomes, removed, changed or not synced, config)
+        # Not an upsert, so a sync cannot recreate a store deleted meanwhile
+        updated = await asyncio.to_thread(mongo_client.update_vector_store, vs_info["_id"], {
+            SYNC_FIELD: list(current.values()),
+            "updatedAt": datetime.utcnow().isoformat()
+        })
+        if not updated:
+            raise HTTPException(status_code=404, detail="Vector store was deleted or could not be updated during the sync")
+
+    # The persisted index and the sync state must not diverge: once the commit has
+    # started, a cancel waits for it and the sync is reported as done
+    committing = asyncio.ensure_future(commit())
+    while not committing.done():
+        try:
+            await asyncio.shield(committing)
+        except asyncio.CancelledError:
+            if not committing.done():
+                logger.info(f"Sync of vector store {store_id} cancelled while committing, finishing the commit")
+    committing.result()
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(
+        f"Synced vector store {store_id} in {result['seconds']}s: {len(result['added'])} added, "
+        f"{len(result['updated'])} updated, {len(result['unchanged'])} unchanged, "
+        f"{len(result['removed'])} removed, {len(result['failed'])} failed"
+    )
+    return result
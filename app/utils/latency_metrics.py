@@ -0,0 +1,36 @@
+import logging
+import time
+from typing import Dict
+
+# Every job runs in its own process, so samples are logged rather than kept for a stats endpoint
+logger = logging.getLogger("latency-metrics")
+
+
+def record_time_to_first_audio(seconds: float, prewarmed: bool):
+    logger.info(f"time_to_first_audio={seconds:.3f}s prewarmed={prewarmed}")
+
+
+def record_query_spans(store_id: str, spans: Dict[str, float], outcome: str):
+    """Log the stage timings of one query_info call; outcome is answered, partial, fallback, cancelled or failed."""
+    timings = " ".join(f"{stage}={seconds:.3f}s" for stage, seconds in spans.items())
+    logger.info(f"query_info store={store_id} outcome={outcome} {timings}")
+
+
+def track_time_to_first_audio(session, prewarmed: bool, started_at: float = None):
+    """
+    Measure the time from job start until the agent first starts speaking.
+
+    Args:
+        session: The AgentSession to watch
+        prewarmed: Whether the models came from the process prewarm stage
+        started_at: perf_counter timestamp of the job start (defaults to now)
+    """
+    started_at = started_at if started_at is not None else time.perf_counter()
+
+    def on_agent_state_changed(ev):
+        if ev.new_state != "speaking":
+            return
+        session.off("agent_state_changed", on_agent_state_changed)
+        record_time_to_first_audio(time.perf_counter() - started_at, prewarmed)
+
+    session.on("agent_state_changed", on_agent_state_changed)
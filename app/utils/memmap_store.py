@@ -0,0 +1,334 @@
+import json
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from app.utils.ivf_index import IvfIndex
+from app.utils.store_files import (
+    FILES_ID_KEY, new_files_id, publish_header, read_published, remove_stale_files, versioned_name,
+)
+from app.utils.vector_search import DequantizedMatrix, normalise, quantize, rescore, search
+
+# On-disk layout of a memmap vector store, all in the store directory. Data files are named
+# after the write that produced them (vectors.<files_id>.f32, ...), see app/utils/store_files.py:
+#   vectors.json  header: format version, row count, dimension, vector dtype, whether the float32
+#                 vectors are kept, and a generation id that changes on every write and names
+#                 its data files
+#   vectors.f32   row-major float32 matrix of unit-normalised embeddings, opened with numpy.memmap;
+#                 optional for quantised stores, which only read it to rescore candidates
+#   vectors.f16   the same matrix as float16, for stores quantised to float16
+#   vectors.i8    the same matrix as int8 codes, for stores quantised to int8 ...
+#   vectors.scale ... with the float32 scale of every dimension (value = code * scale)
+#   ids.json      node id and ref doc id of every row
+#   chunks.idx    uint64 offset of every row's record in chunks.bin, plus the end offset
+#   chunks.bin    length-prefixed records: uint32 byte length + UTF-8 JSON of the node text and metadata
+HEADER_FILE = "vectors.json"
+VECTORS_FILE = "vectors.f32"
+QUANTIZED_FILES = {"float16": "vectors.f16", "int8": "vectors.i8"}
+SCALE_FILE = "vectors.scale"
+IDS_FILE = "ids.json"
+OFFSETS_FILE = "chunks.idx"
+CHUNKS_FILE = "chunks.bin"
+MEMMAP_FILES = (HEADER_FILE, VECTORS_FILE, *QUANTIZED_FILES.values(), SCALE_FILE, IDS_FILE, OFFSETS_FILE, CHUNKS_FILE)
+DATA_FILES = tuple(name for name in MEMMAP_FILES if name != HEADER_FILE)
+# Vector dtypes of memmap stores; "float32" is unquantised
+VECTOR_DTYPES = ("float32", *QUANTIZED_FILES)
+# 2: data files named after the generation
+FORMAT_VERSION = 2
+
+_LENGTH = struct.Struct("<I")
+
+
+def is_memmap_store(store_path: Path) -> bool:
+    return (store_path / HEADER_FILE).exists()
+
+
+def _open_memmap(path: Path, dtype, shape) -> np.ndarray:
+    # numpy cannot map an empty file
+    if not shape[0] or path.stat().st_size == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def _data_path(store_path: Path, header: Dict[str, Any], name: str) -> Path:
+    return store_path / versioned_name(name, header.get(FILES_ID_KEY))
+
+
+def write_memmap_store(store_path: Path, rows: Iterable[Tuple[BaseNode, Sequence[float]]],
+                       dtype: str = "float32", full_precision: bool = True) -> Dict[str, Any]:
+    """
+    Write (node, embedding) rows as a memmap vector store, replacing any previous one.
+    The data files get new names and the header that names them is replaced last, in
+    one step, so readers load either the previous store or this one, never a mix.
+
+    Args:
+        store_path: The store directory
+        rows: (node, embedding) pairs
+        dtype: Vector dtype searched at query time, one of VECTOR_DTYPES
+        full_precision: For quantised stores, also keep the float32 vectors for rescoring
+
+    Returns:
+        The header
+    """
+    store_path.mkdir(parents=True, exist_ok=True)
+    generation = new_files_id()
+    header = {FILES_ID_KEY: generation}
+    ids: List[str] = []
+    ref_doc_ids: List[Optional[str]] = []
+    vectors: List[np.ndarray] = []
+    offsets = [0]
+
+    with open(_data_path(store_path, header, CHUNKS_FILE), "wb") as chunks:
+        for node, embedding in rows:
+            record = json.dumps({
+                "text": node.get_content(),
+                "metadata": node_to_metadata_dict(node, remove_text=True, flat_metadata=False),
+            }).encode("utf-8")
+            chunks.write(_LENGTH.pack(len(record)))
+            chunks.write(record)
+            offsets.append(offsets[-1] + _LENGTH.size + len(record))
+            ids.append(node.node_id)
+            ref_doc_ids.append(node.ref_doc_id)
+            vectors.append(np.asarray(embedding, dtype=np.float32))
+
+    dimension = len(vectors[0]) if vectors else 0
+    matrix = normalise(np.vstack(vectors)) if vectors else np.zeros((0, 0), dtype=np.float32)
+    full_precision = full_precision or dtype == "float32"
+    if full_precision:
+        matrix.astype(np.float32).tofile(_data_path(store_path, header, VECTORS_FILE))
+    if dtype != "float32":
+        codes, scale = quantize(matrix, dtype)
+        codes.tofile(_data_path(store_path, header, QUANTIZED_FILES[dtype]))
+        if scale is not None:
+            scale.tofile(_data_path(store_path, header, SCALE_FILE))
+    np.asarray(offsets, dtype=np.uint64).tofile(_data_path(store_path, header, OFFSETS_FILE))
+    _data_path(store_path, header, IDS_FILE).write_text(json.dumps({"ids": ids, "ref_doc_ids": ref_doc_ids}))
+
+    header.update({
+        "format_version": FORMAT_VERSION,
+        "count": len(ids),
+        "dimension": dimension,
+        "dtype": dtype,
+        "full_precision": full_precision,
+        "generation": generation,
+    })
+    publish_header(store_path, HEADER_FILE, header)
+    remove_stale_files(store_path, DATA_FILES, keep=generation)
+    return header
+
+
+def remove_memmap_store(store_path: Path):
+    (store_path / HEADER_FILE).unlink(missing_ok=True)
+    remove_stale_files(store_path, DATA_FILES)
+
+
+def _open_vectors(store_path: Path, header: Dict[str, Any]) -> Tuple[Any, Optional[np.ndarray]]:
+    """(searched matrix, float32 matrix or None) of a store; quantised matrices dequantise on read."""
+    shape = (header["count"], header["dimension"])
+    dtype = header.get("dtype", "float32")
+    full = (_open_memmap(_data_path(store_path, header, VECTORS_FILE), np.float32, shape)
+            if header.get("full_precision", True) else None)
+    if dtype == "float32":
+        return full, full
+    codes = _open_memmap(_data_path(store_path, header, QUANTIZED_FILES[dtype]), np.dtype(dtype), shape)
+    scale = np.fromfile(_data_path(store_path, header, SCALE_FILE), dtype=np.float32) if dtype == "int8" else None
+    return DequantizedMatrix(codes, scale), full
+
+
+def read_vectors(store_path: Path) -> Tuple[Dict[str, Any], Any]:
+    """The header and best-precision vector matrix of a memmap store, memory mapped."""
+    header, (matrix, full) = read_published(store_path, HEADER_FILE, lambda h: _open_vectors(store_path, h))
+    return header, full if full is not None else matrix
+
+
+def _open_store(store_path: Path, header: Dict[str, Any]) -> Tuple[Dict[str, Any], Any, Optional[np.ndarray],
+                                                                   np.ndarray, Optional[np.ndarray]]:
+    """(id table, searched matrix, float32 matrix, record offsets, records) of the write `header` names."""
+    table = json.loads(_data_path(store_path, header, IDS_FILE).read_text())
+    matrix, full = _open_vectors(store_path, header)
+    offsets = _open_memmap(_data_path(store_path, header, OFFSETS_FILE), np.uint64, (header["count"] + 1,))
+    chunks_path = _data_path(store_path, header, CHUNKS_FILE)
+    chunks = np.memmap(chunks_path, dtype=np.uint8, mode="r") if chunks_path.stat().st_size else None
+    return table, matrix, full, offsets, chunks
+
+
+class MemmapVectorStore(BasePydanticVectorStore):
+    """
+    Read-mostly vector store over the memmap files of one store directory.
+
+    Vectors and chunk records are memory mapped, so loading only parses the header
+    and the id table, and worker processes share the pages through the OS page cache.
+    Nodes added or deleted by a sync are kept in memory on top of the mapped rows
+    until the store is written again with `write_memmap_store`.
+
+    When the store has an IVF index built from its current vectors, unrestricted
+    queries probe `nprobe` of its lists instead of scoring every row. Quantised stores
+    are searched on their float16 or int8 vectors; with `rescore_factor` and the float32
+    vectors kept, the top k * rescore_factor candidates are re-ranked at full precision.
+    """
+
+    stores_text: bool = True
+    is_embedding_query: bool = True
+
+    _path: Path = PrivateAttr()
+    _header: Dict[str, Any] = PrivateAttr()
+    _ids: List[str] = PrivateAttr()
+    _ref_doc_ids: List[Optional[str]] = PrivateAttr()
+    _rows: Dict[str, int] = PrivateAttr()
+    _matrix: Any = PrivateAttr()
+    _full: Optional[np.ndarray] = PrivateAttr()
+    _offsets: np.ndarray = PrivateAttr()
+    _chunks: Optional[np.ndarray] = PrivateAttr()
+    _deleted: Set[str] = PrivateAttr()
+    _added: Dict[str, Tuple[BaseNode, np.ndarray]] = PrivateAttr()
+    _ivf: Optional[IvfIndex] = PrivateAttr()
+    _nprobe: int = PrivateAttr()
+    _rescore_factor: int = PrivateAttr()
+
+    def __init__(self, store_path: Path, nprobe: Optional[int] = None, rescore_factor: int = 0, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._path = Path(store_path)
+        self._header, (table, self._matrix, self._full, self._offsets, self._chunks) = read_published(
+            self._path, HEADER_FILE, lambda header: _open_store(self._path, header)
+        )
+        count = self._header["count"]
+        self._ids = table["ids"]
+        self._ref_doc_ids = table["ref_doc_ids"]
+        self._rows = {node_id: row for row, node_id in enumerate(self._ids)}
+        self._deleted = set()
+        self._added = {}
+        # Without nprobe the store is searched exhaustively even if it has an IVF index
+        self._ivf = IvfIndex.load(self._path, count, self._header.get("generation")) if count and nprobe else None
+        self._nprobe = nprobe
+        quantized = self._full is not None and self._full is not self._matrix
+        self._rescore_factor = max(1, rescore_factor) if quantized and rescore_factor else 0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MemmapVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def count(self) -> int:
+        return len(self._ids) - len(self._deleted) + len(self._added)
+
+    @property
+    def dimension(self) -> int:
+        if self._header["dimension"]:
+            return self._header["dimension"]
+        for _, embedding in self._added.values():
+            return len(embedding)
+        return 0
+
+    @property
+    def ivf(self) -> Optional[IvfIndex]:
+        return self._ivf
+
+    def _search(self, queries: np.ndarray, k: int, excluded: np.ndarray, exact: bool = False):
+        candidates = k * self._rescore_factor if self._rescore_factor else k
+        if self._ivf is not None and not exact:
+            rows, scores = self._ivf.search(self._matrix, queries, candidates, self._nprobe, excluded)
+        else:
+            rows, scores = search(self._matrix, queries, candidates, excluded)
+        if self._rescore_factor:
+            return rescore(self._full, queries, rows, scores, k)
+        return rows, scores
+
+    def _node(self, row: int) -> BaseNode:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        record = json.loads(bytes(self._chunks[start + _LENGTH.size:end]).decode("utf-8"))
+        return metadata_dict_to_node(record["metadata"], text=record["text"])
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        for node in nodes:
+            self._added[node.node_id] = (node, normalise(node.get_embedding()))
+            if node.node_id in self._rows:
+                self._deleted.add(node.node_id)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._deleted.update(
+            node_id for node_id, ref in zip(self._ids, self._ref_doc_ids) if ref == ref_doc_id
+        )
+        for node_id in [nid for nid, (node, _) in self._added.items() if node.ref_doc_id == ref_doc_id]:
+            del self._added[node_id]
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters=None, **delete_kwargs: Any) -> None:
+        for node_id in node_ids or []:
+            self._added.pop(node_id, None)
+            if node_id in self._rows:
+                self._deleted.add(node_id)
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters=None, **kwargs: Any) -> List[BaseNode]:
+        nodes = []
+        for node_id in node_ids or []:
+            if node_id in self._added:
+                nodes.append(self._added[node_id][0])
+            elif node_id in self._rows and node_id not in self._deleted:
+                nodes.append(self._node(self._rows[node_id]))
+        return nodes
+
+    def rows(self) -> Iterator[Tuple[BaseNode, np.ndarray]]:
+        """Every live (node, unit embedding) row, mapped rows first, for writing the store again."""
+        for row, node_id in enumerate(self._ids):
+            if node_id not in self._deleted:
+                yield self._node(row), self._full[row] if self._full is not None else self._matrix[row]
+        yield from self._added.values()
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("Metadata filters are not supported by memmap vector stores")
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"Query mode {query.mode} is not supported by memmap vector stores")
+
+        q = normalise(query.query_embedding)
+
+        # as_retriever passes the (empty) index struct node ids of text-storing stores
+        allowed = set(query.node_ids) if query.node_ids else None
+        candidates: List[Tuple[float, str, Optional[int]]] = []
+        if len(self._ids):
+            excluded = [self._rows[node_id] for node_id in self._deleted]
+            if allowed is not None:
+                excluded += [row for row, node_id in enumerate(self._ids) if node_id not in allowed]
+            rows, scores = self._search(q, query.similarity_top_k, np.asarray(excluded, dtype=np.int64),
+                                        exact=allowed is not None)
+            candidates = [
+                (float(score), self._ids[row], int(row)) for row, score in zip(rows[0], scores[0]) if np.isfinite(score)
+            ]
+        for node_id, (_, embedding) in self._added.items():
+            if allowed is None or node_id in allowed:
+                candidates.append((float(embedding @ q), node_id, None))
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        top = candidates[:query.similarity_top_k]
+        return VectorStoreQueryResult(
+            nodes=[self._added[node_id][0] if row is None else self._node(row) for _, node_id, row in top],
+            similarities=[score for score, _, _ in top],
+            ids=[node_id for _, node_id, _ in top],
+        )
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], k: int) -> List[List[Tuple[str, float]]]:
+        """(node_id, score) top-k lists of the mapped rows for several query embeddings at once."""
+        excluded = np.asarray([self._rows[node_id] for node_id in self._deleted], dtype=np.int64)
+        rows, scores = self._search(np.asarray(query_embeddings), k, excluded)
+        return [
+            [(self._ids[row], float(score)) for row, score in zip(r, s) if np.isfinite(score)]
+            for r, s in zip(rows, scores)
+        ]
+
+    def persist(self, persist_path: str, fs=None) -> None:
+        write_memmap_store(Path(persist_path).parent, list(self.rows()),
+                           dtype=self._header.get("dtype", "float32"),
+                           full_precision=self._header.get("full_precision", True))
@@ -1,6 +1,6 @@
 from pymongo import MongoClient
 from bson import ObjectId
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List, Union, Callable
 import logging
 from dotenv import load_dotenv
 from app.core.config import Settings
@@ -9,8 +9,12 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+FLOW_VERSION_FIELDS = ("version", "updated_at", "updatedAt")
+
+
 class MongoDBClient:
     _instance = None
+    _flow_listeners: List[Callable[[str], None]] = []
 
     def __new__(cls):
         if cls._instance is None:
@@ -44,6 +48,18 @@ class MongoDBClient:
             return id_str
 
     # ---------------- Flows ---------------- #
+    @classmethod
+    def add_flow_listener(cls, callback: Callable[[str], None]):
+        """Register a callback invoked with the flow id whenever a flow is updated or deleted."""
+        cls._flow_listeners.append(callback)
+
+    def _notify_flow_changed(self, flow_id: str):
+        for callback in self._flow_listeners:
+            try:
+                callback(str(flow_id))
+            except Exception as e:
+                logger.error(f"Flow listener failed for {flow_id}: {e}")
+
     def get_flow_by_id(self, flow_id: str) -> Optional[Dict[str, Any]]:
         self._ensure_connection()
         try:
@@ -53,6 +69,17 @@ class MongoDBClient:
             logger.error(f"Error retrieving flow {flow_id}: {e}")
             return None
 
+    def get_flow_version(self, flow_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch only the version/timestamp fields of a flow, or None if it does not exist."""
+        self._ensure_connection()
+        try:
+            key = self._normalize_id(flow_id)
+            projection = {field: 1 for field in FLOW_VERSION_FIELDS}
+            return self.db["flows"].find_one({"_id": key}, projection)
+        except Exception as e:
+            logger.error(f"Error retrieving version of flow {flow_id}: {e}")
+            return None
+
     def get_all_flows(self) -> List[Dict[str, Any]]:
         self._ensure_connection()
         try:
@@ -66,6 +93,7 @@ class MongoDBClient:
         try:
             key = self._normalize_id(flow_id)
             result = self.db["flows"].update_one({"_id": key}, {"$set": updates})
+            self._notify_flow_changed(flow_id)
             return result.modified_count > 0
         except Exception as e:
             logger.error(f"Error updating flow {flow_id}: {e}")
@@ -85,6 +113,7 @@ class MongoDBClient:
         try:
             key = self._normalize_id(flow_id)
             result = self.db["flows"].delete_one({"_id": key})
+            self._notify_flow_changed(flow_id)
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"Error deleting flow {flow_id}: {e}")
@@ -133,6 +162,17 @@ class MongoDBClient:
             logger.error(f"Error saving vector store {store_data.get('id')}: {e}")
             return False
 
+    def update_vector_store(self, store_id: Union[str, ObjectId], updates: Dict[str, Any]) -> bool:
+        """Update fields of an existing vector store; never creates one. False if it does not exist."""
+        self._ensure_connection()
+        try:
+            key = self._normalize_id(store_id)
+            result = self.db["vectorstores"].update_one({"_id": key}, {"$set": updates})
+            return result.matched_count > 0
+        except Exception as e:
+            logger.error(f"Error updating vector store {store_id}: {e}")
+            return False
+
     def get_vector_store(self, store_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
         self._ensure_connection()
         try:
@@ -142,6 +182,16 @@ class MongoDBClient:
             logger.error(f"Error retrieving vector store {store_id}: {e}")
             return None
 
+    def get_vector_store_metadata(self, store_id: Union[str, ObjectId], fields: List[str]) -> Optional[Dict[str, Any]]:
+        """Fetch only `fields` of a vector store, or None if it does not exist."""
+        self._ensure_connection()
+        try:
+            key = self._normalize_id(store_id)
+            return self.db["vectorstores"].find_one({"_id": key}, {field: 1 for field in fields})
+        except Exception as e:
+            logger.error(f"Error retrieving metadata of vector store {store_id}: {e}")
+            return None
+
     def get_vector_store_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         self._ensure_connection()
         try:
@@ -1,42 +1,511 @@
-from pathlib import Path
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
 from livekit.agents import RunContext
 from livekit.agents.llm import function_tool
-from llama_index.core import StorageContext, load_index_from_storage
+from llama_index.core import get_response_synthesizer
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
 from llama_index.llms.openai import OpenAI
-from app.utils.vector_store_utils import load_vector_store_from_mongo
+from app.core.config import settings
+from app.core.vector_index_cache import vector_index_cache
+from app.core.query_cache import query_cache
+from app.core.filler_audio_cache import filler_audio_cache
+from app.utils.bm25_index import Bm25Index, LexicalResult
+from app.utils.latency_metrics import record_query_spans
 import logging
 
 logger = logging.getLogger(__name__)
 
-def build_query_tool(store_id: str):
-    # Load store metadata and hydrate index + embed_model
+QUERY_MODES = ("retrieval", "hybrid", "synthesis")
+CHARS_PER_TOKEN = 4
+# Reciprocal rank fusion constant; larger values flatten the weight of the top ranks
+RRF_K = 60
+FALLBACK_ANSWER = (
+    "The knowledge base lookup is taking too long. Tell the caller you could not find the details "
+    "right now and offer to help with something else or follow up later."
+)
+
+
+class QueryTrace:
+    """Stage timings of one query_info call, and the answers found so far."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        # Confident answer found before retrieval, and the best answer to fall back on at the deadline
+        self.answer: Optional[str] = None
+        self.partial: Optional[str] = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[stage] = time.perf_counter() - start
+
+
+def _log_late_lookup(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"query_info lookup failed after its deadline: {task.exception()}")
+
+
+def knowledge_base_options(global_settings) -> dict:
+    """Agent-level query_info options from GlobalSettings.knowledge_base, for build_query_tool."""
+    kb_settings = getattr(global_settings, "knowledge_base", None)
+    if not kb_settings:
+        return {}
+    return {
+        "query_mode": kb_settings.query_mode,
+        "top_k": kb_settings.top_k,
+        "token_budget": kb_settings.token_budget,
+        "store_weights": kb_settings.store_weights,
+    }
+
+
+def format_retrieved_nodes(nodes: List[NodeWithScore], token_budget: int) -> str:
+    """Number the retrieved chunks with their scores, cutting off once the token budget is spent."""
+    if not nodes:
+        return "No relevant information was found in the knowledge base."
+
+    budget = token_budget * CHARS_PER_TOKEN
+    parts = []
+    for i, node in enumerate(nodes, start=1):
+        text = " ".join(node.node.get_content().split())
+        score = f"{node.score:.2f}" if node.score is not None else "n/a"
+        header = f"[{i}] (score {score}) "
+        room = budget - len(header)
+        if room <= 0:
+            break
+        if len(text) > room:
+            text = text[:room].rsplit(" ", 1)[0] + " ..."
+        parts.append(header + text)
+        budget -= len(header) + len(text) + 1
+
+    return "Knowledge base excerpts, most relevant first. Answer from them only:\n" + "\n".join(parts)
+
+
+def _get_nodes(index, node_ids: List[str]) -> Dict[str, BaseNode]:
+    if index.vector_store.stores_text:
+        nodes = index.vector_store.get_nodes(node_ids)
+    else:
+        nodes = [node for node in index.docstore.get_nodes(node_ids, raise_error=False) if node is not None]
+    return {node.node_id: node for node in nodes}
+
+
+def lexical_nodes(index, result: LexicalResult) -> List[NodeWithScore]:
+    """The chunks of BM25 hits, best first, with their BM25 scores."""
+    nodes = _get_nodes(index, [node_id for node_id, _ in result.hits])
+    return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in result.hits if node_id in nodes]
+
+
+def is_confident(result: LexicalResult) -> bool:
+    """Whether BM25 hits are good enough to answer without vector retrieval."""
+    return (
+        bool(result.hits)
+        and result.coverage >= settings.KB_LEXICAL_MIN_COVERAGE
+        and result.margin >= settings.KB_LEXICAL_MIN_MARGIN
+    )
+
+
+def fuse_results(rankings: List[List[NodeWithScore]], top_k: int) -> List[NodeWithScore]:
+    """Reciprocal rank fusion of several rankings; scores become the fused scores."""
+    fused: Dict[str, NodeWithScore] = {}
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, node in enumerate(ranking, start=1):
+            fused.setdefault(node.node.node_id, node)
+            scores[node.node.node_id] = scores.get(node.node.node_id, 0.0) + 1.0 / (RRF_K + rank)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [NodeWithScore(node=fused[node_id].node, score=scores[node_id]) for node_id in best]
+
+
+def merge_store_results(rankings: Dict[str, List[NodeWithScore]], weights: Dict[str, float], top_k: int,
+                        scales: Optional[Dict[str, Any]] = None) -> List[NodeWithScore]:
+    """
+    Merge the rankings of several stores into one top-k.
+
+    Scores are min-max normalised to [0, 1], then multiplied by the store's weight. Stores
+    with the same scale (e.g. cosine similarities of one embedding model, or fused ranks)
+    are normalised together, so a store whose best match is weak stays below one whose best
+    match is strong; otherwise each store is normalised on its own. A chunk found in several
+    stores keeps its best score.
+
+    Args:
+        rankings: Results per store id, best first
+        weights: Score multiplier per store id, 1.0 when missing
+        top_k: Number of chunks to keep
+        scales: Scale key per store id; unset stores get a scale of their own
+    """
+    scales = scales or {}
+    bounds: Dict[Any, Tuple[float, float]] = {}
+    for store_id, nodes in rankings.items():
+        scale = scales.get(store_id, store_id)
+        for node in nodes:
+            low, high = bounds.get(scale, (node.score or 0.0, node.score or 0.0))
+            bounds[scale] = (min(low, node.score or 0.0), max(high, node.score or 0.0))
+
+    merged: Dict[str, NodeWithScore] = {}
+    for store_id, nodes in rankings.items():
+        low, high = bounds.get(scales.get(store_id, store_id), (0.0, 0.0))
+        weight = weights.get(store_id, 1.0)
+        for node in nodes:
+            score = ((node.score or 0.0) - low) / (high - low) if high > low else 1.0
+            best = merged.get(node.node.node_id)
+            if best is None or score * weight > best.score:
+                merged[node.node.node_id] = NodeWithScore(node=node.node, score=score * weight)
+    return sorted(merged.values(), key=lambda node: node.score, reverse=True)[:top_k]
+
+
+def _load_store(store_id: str) -> dict:
+    # Store metadata with the hydrated index and embed_model, loaded once per process
     try:
-        vs_info = load_vector_store_from_mongo(store_id)
+        vs_info = vector_index_cache.get(store_id)
     except Exception as e:
         logger.error(f"Failed to load vector store for query tool: {e}")
         raise ValueError(f"Vector store '{store_id}' not found or could not be loaded.")
+    if not vs_info.get("index"):
+        raise ValueError(f"Failed to load index for vector store '{store_id}'")
+    return vs_info
+
+
+def _resolve_options(store_id: str, vs_info: dict, query_mode: Optional[str], top_k: Optional[int],
+                     token_budget: Optional[int]) -> Tuple[str, int, int]:
+    query_mode = (query_mode or vs_info.get("query_mode") or settings.KB_QUERY_MODE).lower()
+    if query_mode not in QUERY_MODES:
+        logger.warning(f"Unknown query mode '{query_mode}' for vector store {store_id}, using retrieval")
+        query_mode = "retrieval"
+    top_k = top_k or vs_info.get("top_k") or settings.KB_TOP_K
+    token_budget = token_budget or vs_info.get("token_budget") or settings.KB_TOKEN_BUDGET
+    return query_mode, top_k, token_budget
+
+
+class StoreSearch:
+    """One vector store of a federated query_info, shared by concurrent queries."""
+
+    def __init__(self, store_id: str, vs_info: dict, top_k: int, hybrid: bool, weight: float):
+        self.store_id = store_id
+        self.index = vs_info["index"]
+        self.embed_model = vs_info.get("embed_model")
+        self.index_stamp = vs_info.get("index_stamp")
+        self.top_k = top_k
+        self.weight = weight
+        config = vs_info["config"]
+        # Stores embedded by the same model share one query embedding
+        self.embed_key = (config.get("provider", "").lower(), config.get("model_name"))
+        self.retriever = self.index.as_retriever(similarity_top_k=top_k)
+        self.lexical_index: Optional[Bm25Index] = vs_info.get("lexical_index") if hybrid else None
+        if hybrid and self.lexical_index is None:
+            logger.warning(f"Vector store {store_id} has no BM25 index yet, hybrid queries use vector retrieval only")
+
+    def lexical_search(self, query: str) -> Tuple[List[NodeWithScore], bool]:
+        """BM25 chunks of the query, and whether they are confident enough to skip vector retrieval."""
+        if self.lexical_index is None:
+            return [], False
+        result = self.lexical_index.search(query, self.top_k)
+        return lexical_nodes(self.index, result), is_confident(result)
+
+    def vector_search(self, query: QueryBundle) -> List[NodeWithScore]:
+        # Called in a worker thread; with the embedding in the bundle this is only the in-process search
+        return self.retriever.retrieve(query)
 
-    provider = vs_info["config"].get("provider", "").lower()
+
+class FederatedSearch:
+    """
+    query_info over several vector stores.
+
+    All stores are searched concurrently. The query is embedded once per distinct
+    embedding model, and the in-process vector searches run in worker threads, so a
+    lookup takes about as long as the slowest store rather than the sum. Results are
+    merged by `merge_store_results`. A store that fails is logged and left out of the
+    answer, which is then not cached.
+    """
+
+    def __init__(self, store_ids: List[str], query_mode: Optional[str], top_k: Optional[int],
+                 token_budget: Optional[int], store_weights: Optional[Dict[str, float]]):
+        infos = {store_id: _load_store(store_id) for store_id in store_ids}
+        first = infos[store_ids[0]]
+        # Store metadata options come from the first store
+        self.query_mode, self.top_k, self.token_budget = _resolve_options(
+            store_ids[0], first, query_mode, top_k, token_budget
+        )
+        weights = store_weights or {}
+        self.weights = {store_id: float(weights.get(store_id, 1.0)) for store_id in store_ids}
+        self.stores = [
+            StoreSearch(store_id, infos[store_id], self.top_k, self.query_mode == "hybrid", self.weights[store_id])
+            for store_id in store_ids
+        ]
+        self.label = "+".join(store_ids)
+        # Cached answers are valid for these versions of the indexes, and only for these options
+        self.index_stamp = tuple(store.index_stamp for store in self.stores)
+        self.options = (tuple(self.weights.values()), self.query_mode, self.top_k, self.token_budget)
+        self.synthesizer = None
+        if self.query_mode == "synthesis":
+            api_key = first["config"].get("api_key", "")
+            self.synthesizer = get_response_synthesizer(llm=OpenAI(api_key=api_key), use_async=True)
+        logger.info(f"query_info for vector stores {self.label}: mode={self.query_mode}, top_k={self.top_k}, "
+                    f"weights={self.weights}")
+
+    async def _embed(self, stores: List[StoreSearch], trace: QueryTrace, query: str) -> Dict[Tuple, Any]:
+        groups: Dict[Tuple, StoreSearch] = {}
+        for store in stores:
+            if store.embed_model is not None:
+                groups.setdefault(store.embed_key, store)
+        if not groups:
+            return {}
+        with trace.span("embedding"):
+            embeddings = await asyncio.gather(
+                *(store.embed_model.aget_query_embedding(query) for store in groups.values()), return_exceptions=True
+            )
+        return dict(zip(groups, embeddings))
+
+    def _answer(self, nodes: List[NodeWithScore]) -> str:
+        return format_retrieved_nodes(nodes, self.token_budget)
+
+    async def cached_query(self, query: str, trace: QueryTrace) -> str:
+        cache_enabled = settings.KB_QUERY_CACHE_ENABLED
+        if cache_enabled:
+            result = query_cache.get_exact(self.label, self.index_stamp, query, self.options)
+            if result is not None:
+                logger.info(f"query_info cache hit (exact) for vector stores {self.label}")
+                return result
+
+        # Final rankings per store with their score scale, and BM25 chunks still to be fused with the vector results
+        rankings: Dict[str, List[NodeWithScore]] = {}
+        scales: Dict[str, Any] = {}
+        lexical: Dict[str, List[NodeWithScore]] = {}
+        if any(store.lexical_index is not None for store in self.stores):
+            with trace.span("lexical"):
+                for store in self.stores:
+                    nodes, confident = store.lexical_search(query)
+                    if confident:
+                        rankings[store.store_id] = nodes
+                    elif nodes:
+                        lexical[store.store_id] = nodes
+            partial = merge_store_results({**lexical, **rankings}, self.weights, self.top_k, scales)
+            if partial:
+                trace.partial = self._answer(partial)
+
+        pending = [store for store in self.stores if store.store_id not in rankings]
+        if not pending:
+            logger.info(f"query_info answered from the BM25 indexes of vector stores {self.label}")
+            trace.answer = trace.partial
+            if cache_enabled:
+                query_cache.put(self.label, self.index_stamp, query, trace.answer, options=self.options)
+            return trace.answer
+
+        embeddings = await self._embed(pending, trace, query)
+        # The semantic cache needs one embedding that stands for the whole query
+        embedding = next(iter(embeddings.values())) if len(embeddings) == 1 else None
+        if isinstance(embedding, BaseException):
+            embedding = None
+        if cache_enabled and embedding is not None and query_cache.semantic_enabled:
+            result = query_cache.get_semantic(self.label, self.index_stamp, embedding, self.options)
+            if result is not None:
+                logger.info(f"query_info cache hit (semantic) for vector stores {self.label}")
+                return result
+        if cache_enabled:
+            query_cache.record_miss(self.label, self.index_stamp)
+
+        async def search(store: StoreSearch) -> List[NodeWithScore]:
+            store_embedding = embeddings.get(store.embed_key)
+            if isinstance(store_embedding, BaseException):
+                raise store_embedding
+            return await asyncio.to_thread(
+                store.vector_search, QueryBundle(query_str=query, embedding=store_embedding)
+            )
+
+        with trace.span("retrieval"):
+            results = await asyncio.gather(*(search(store) for store in pending), return_exceptions=True)
+        failures = []
+        for store, result in zip(pending, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"query_info search of vector store {store.store_id} failed: {result}")
+                failures.append(result)
+            elif store.store_id in lexical:
+                rankings[store.store_id] = fuse_results([lexical[store.store_id], result], self.top_k)
+                scales[store.store_id] = "fused"
+            else:
+                rankings[store.store_id] = result
+                scales[store.store_id] = store.embed_key
+        if failures and not rankings:
+            raise failures[0]
+
+        nodes = merge_store_results(rankings, self.weights, self.top_k, scales)
+        if self.synthesizer is not None:
+            with trace.span("synthesis"):
+                result = str(await self.synthesizer.asynthesize(query, nodes))
+        else:
+            result = self._answer(nodes)
+        if cache_enabled and not failures:
+            query_cache.put(self.label, self.index_stamp, query, result, embedding, self.options)
+        return result
+
+
+def build_query_tool(store_ids: Union[str, Sequence[str]], query_mode: Optional[str] = None,
+                     top_k: Optional[int] = None, token_budget: Optional[int] = None,
+                     store_weights: Optional[Dict[str, float]] = None):
+    """
+    Build the query_info tool for one or several vector stores.
+
+    Args:
+        store_ids: The vector store id, or several ids searched together by `FederatedSearch`
+        query_mode: "retrieval" returns the top-k chunks to the session LLM; "hybrid" does
+            the same from the store's BM25 index alone when its match is confident, and
+            otherwise fuses BM25 and vector results; "synthesis" answers with an extra
+            OpenAI completion over the top-k chunks
+        top_k: Number of chunks to retrieve
+        token_budget: Approximate token limit of the chunks returned in retrieval mode
+        store_weights: Score multiplier per store id when several stores are searched
+
+    Unset options fall back to the store's metadata (the first store's when there are
+    several), then to the KB_* settings.
+
+    Raises:
+        ValueError: When no store is given or a store cannot be loaded
+    """
+    store_ids = [store_ids] if isinstance(store_ids, str) else list(dict.fromkeys(store_ids))
+    if not store_ids:
+        raise ValueError("No vector store configured for query_info")
+    if len(store_ids) > 1:
+        federated = FederatedSearch(store_ids, query_mode, top_k, token_budget, store_weights)
+        return _query_info_tool(federated.label, federated.cached_query)
+
+    store_id = store_ids[0]
+    vs_info = _load_store(store_id)
+    index = vs_info["index"]
     api_key = vs_info["config"].get("api_key", "")
+    query_mode, top_k, token_budget = _resolve_options(store_id, vs_info, query_mode, top_k, token_budget)
 
-    index = vs_info.get("index")
-    if not index:
-        raise ValueError(f"Failed to load index for vector store '{store_id}'")
+    embed_model = vs_info.get("embed_model")
+    lexical_index: Optional[Bm25Index] = vs_info.get("lexical_index") if query_mode == "hybrid" else None
+    if query_mode == "hybrid" and lexical_index is None:
+        logger.warning(f"Vector store {store_id} has no BM25 index yet, hybrid queries use vector retrieval only")
+
+    if query_mode == "synthesis":
+        query_engine = index.as_query_engine(llm=OpenAI(api_key=api_key), similarity_top_k=top_k, use_async=True)
+
+        async def run_query(query: QueryBundle, lexical: Optional[List[NodeWithScore]] = None) -> str:
+            result = await query_engine.aquery(query)
+            return str(result)
+    else:
+        retriever = index.as_retriever(similarity_top_k=top_k)
+
+        async def run_query(query: QueryBundle, lexical: Optional[List[NodeWithScore]] = None) -> str:
+            # Only the embedding call is awaited; the in-process search runs in a worker
+            # thread, as in the federated path, so large stores do not block the event loop
+            if query.embedding is None and embed_model is not None:
+                query.embedding = await embed_model.aget_query_embedding(query.query_str)
+            nodes = await asyncio.to_thread(retriever.retrieve, query)
+            if lexical:
+                nodes = fuse_results([lexical, nodes], top_k)
+            return format_retrieved_nodes(nodes, token_budget)
+
+    # Answers depend on the index version and on the options above; the store's cache is
+    # shared with tools using other options, so those only go into the answer key
+    index_stamp = vs_info.get("index_stamp")
+    options = (query_mode, top_k, token_budget)
+
+    def local_query(query: str, trace: QueryTrace) -> Optional[List[NodeWithScore]]:
+        """
+        BM25 chunks of a hybrid query. A confident match becomes the trace's answer, so the
+        embedding call is skipped; otherwise it is the partial answer if the deadline passes.
+        """
+        if lexical_index is None:
+            return None
+        with trace.span("lexical"):
+            lexical = lexical_index.search(query, top_k)
+            nodes = lexical_nodes(index, lexical)
+        if nodes:
+            trace.partial = format_retrieved_nodes(nodes, token_budget)
+        if is_confident(lexical):
+            logger.info(f"query_info answered from the BM25 index of vector store {store_id} "
+                        f"(coverage {lexical.coverage:.2f}, margin {lexical.margin:.2f})")
+            trace.answer = trace.partial
+        return nodes
+
+    async def cached_query(query: str, trace: QueryTrace) -> str:
+        if not settings.KB_QUERY_CACHE_ENABLED:
+            lexical = local_query(query, trace)
+            if trace.answer is not None:
+                return trace.answer
+            with trace.span("retrieval"):
+                return await run_query(QueryBundle(query_str=query), lexical)
+
+        result = query_cache.get_exact(store_id, index_stamp, query, options)
+        if result is not None:
+            logger.info(f"query_info cache hit (exact) for vector store {store_id}")
+            return result
 
-    query_engine = index.as_query_engine(llm=OpenAI(api_key=api_key), use_async=True)
+        lexical = local_query(query, trace)
+        if trace.answer is not None:
+            query_cache.put(store_id, index_stamp, query, trace.answer, options=options)
+            return trace.answer
+
+        # The query embedding is computed once and reused by the retriever
+        embedding = None
+        if query_cache.semantic_enabled and embed_model is not None:
+            with trace.span("embedding"):
+                embedding = await embed_model.aget_query_embedding(query)
+            result = query_cache.get_semantic(store_id, index_stamp, embedding, options)
+            if result is not None:
+                logger.info(f"query_info cache hit (semantic) for vector store {store_id}")
+                return result
+
+        query_cache.record_miss(store_id, index_stamp)
+        with trace.span("retrieval"):
+            result = await run_query(QueryBundle(query_str=query, embedding=embedding), lexical)
+        query_cache.put(store_id, index_stamp, query, result, embedding, options)
+        return result
+
+    logger.info(f"query_info for vector store {store_id}: mode={query_mode}, top_k={top_k}")
+    return _query_info_tool(store_id, cached_query)
+
+
+def _query_info_tool(label: str, cached_query: Callable[[str, QueryTrace], Awaitable[str]]):
+    """The query_info function tool around a lookup, with the filler, the deadline and the timing spans."""
 
     @function_tool(name="query_info", description="Use this tool to search information from the knowledge base.")
     async def query_info(context: RunContext, query: str) -> str:
-        await context.session.generate_reply(
-            instructions=f"Searching for: \"{query}\". Please hold on while I fetch the information.",
-            allow_interruptions=False
-        )
         context.session.input.set_audio_enabled(False)
-
+        trace = QueryTrace()
+        # Retrieval starts right away; the filler only covers lookups that are not answered within the delay
+        lookup = asyncio.create_task(cached_query(query, trace))
+        outcome = "answered"
         try:
-            result = await query_engine.aquery(query)
-            return str(result)
+            done, _ = await asyncio.wait({lookup}, timeout=settings.KB_FILLER_DELAY_SECONDS)
+            if not done:
+                trace.spans["filler_start"] = trace.elapsed()
+                try:
+                    filler_audio_cache.say(context.session, settings.KB_FILLER_TEXT)
+                except RuntimeError as e:
+                    logger.warning(f"Could not play the query_info filler: {e}")
+            remaining = max(0.0, settings.KB_QUERY_DEADLINE_SECONDS - trace.elapsed())
+            try:
+                result = await asyncio.wait_for(asyncio.shield(lookup), timeout=remaining)
+                trace.spans["lookup"] = trace.elapsed()
+                return result
+            except asyncio.TimeoutError:
+                # The lookup keeps running and caches its answer for a repeated question
+                lookup.add_done_callback(_log_late_lookup)
+                outcome = "partial" if trace.partial else "fallback"
+                logger.warning(f"query_info for vector store {label} missed its "
+                               f"{settings.KB_QUERY_DEADLINE_SECONDS}s deadline, returning the {outcome} answer")
+                return trace.partial or FALLBACK_ANSWER
+        except asyncio.CancelledError:
+            lookup.cancel()
+            outcome = "cancelled"
+            raise
+        except Exception:
+            outcome = "failed"
+            raise
         finally:
             context.session.input.set_audio_enabled(True)
+            trace.spans["total"] = trace.elapsed()
+            record_query_spans(label, trace.spans, outcome)
 
     return query_info
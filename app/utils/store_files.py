@@ -0,0 +1,63 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+# The memmap vectors, IVF index and BM25 index of a store are each a set of data files
+# described by a JSON header. Every write names its data files after a fresh id
+# ("ids.json" -> "ids.<files_id>.json") and records that id in the header, which is
+# replaced last with a single os.replace. Readers open the files their header names,
+# so they see one complete write or the other, never a mix. Files of older writes are
+# deleted after the new header is in place; processes that mapped them keep their pages.
+FILES_ID_KEY = "files_id"
+
+T = TypeVar("T")
+
+
+def new_files_id() -> str:
+    return uuid.uuid4().hex
+
+
+def versioned_name(name: str, files_id: Optional[str]) -> str:
+    """`name` with the write id before its extension; headers written before ids existed use the plain name."""
+    if not files_id:
+        return name
+    stem, dot, extension = name.rpartition(".")
+    return f"{stem}.{files_id}.{extension}" if dot else f"{name}.{files_id}"
+
+
+def publish_header(store_path: Path, header_name: str, header: Dict[str, Any]):
+    """Atomically replace a header; written after all the data files it names."""
+    tmp_path = store_path / f"{header_name}.tmp"
+    tmp_path.write_text(json.dumps(header))
+    os.replace(tmp_path, store_path / header_name)
+
+
+def remove_stale_files(store_path: Path, names: Iterable[str], keep: Optional[str] = None):
+    """Delete the data files `names` of every write but `keep`, including plain-named files of older layouts."""
+    for name in names:
+        stem, _, extension = name.rpartition(".")
+        for path in [store_path / name, *store_path.glob(f"{stem}.*.{extension}")]:
+            if keep is None or path.name != versioned_name(name, keep):
+                path.unlink(missing_ok=True)
+
+
+def read_published(store_path: Path, header_name: str, open_files: Callable[[Dict[str, Any]], T],
+                   attempts: int = 3) -> Tuple[Dict[str, Any], T]:
+    """
+    Read a header and open the data files it names.
+
+    A writer deletes the files of the previous write once its header is published, so a
+    reader that read the old header can find them gone; it then retries with the new one.
+
+    Raises:
+        FileNotFoundError: When there is no header, or its files keep disappearing
+    """
+    for attempt in range(attempts):
+        header = json.loads((store_path / header_name).read_text())
+        try:
+            return header, open_files(header)
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
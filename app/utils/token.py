@@ -1,5 +1,7 @@
 # server.py
 import datetime
+import json
+from typing import Optional
 from livekit import api
 from app.core.config import settings
 import time
@@ -8,7 +10,8 @@ import jwt
 LIVEKIT_API_KEY = settings.LIVEKIT_API_KEY
 LIVEKIT_API_SECRET = settings.LIVEKIT_API_SECRET
 
-def get_token(agent:str,agent_id:str, identity:str,room:str):
+def get_token(agent:str,agent_id:str, identity:str,room:str, metadata: Optional[dict] = None):
+    job_metadata = {"agent_id": agent_id, **(metadata or {})}
     token = (
         api.AccessToken(
             api_key=LIVEKIT_API_KEY,
@@ -23,7 +26,7 @@ def get_token(agent:str,agent_id:str, identity:str,room:str):
                 agents=[
                     api.RoomAgentDispatch(
                         agent_name=agent,
-                        metadata=f'{{"agent_id": "{agent_id}"}}'
+                        metadata=json.dumps(job_metadata)
                     )
                 ],
             )
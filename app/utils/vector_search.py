@@ -0,0 +1,217 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery, VectorStoreQueryMode, VectorStoreQueryResult
+
+# Queries are scored against at most this many rows at a time, bounding the score buffer
+SCORE_BLOCK_ROWS = 262144
+# Within a score block, quantised rows are converted to float32 this many bytes at a time,
+# so the converted rows stay in cache and no float32 copy of the block is materialised
+DEQUANTIZE_BLOCK_BYTES = 1024 * 1024
+
+
+def normalise(vectors) -> np.ndarray:
+    """Unit-normalise a vector or the rows of a matrix as contiguous float32; zero rows stay zero."""
+    array = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return array / norms
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k highest scores of each row, best first."""
+    if k >= scores.shape[1]:
+        return np.argsort(-scores, axis=1)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantise normalised float32 rows to float16, or to int8 codes with a symmetric
+    per-dimension scale.
+
+    Returns:
+        (codes, scale); scale is None for float16
+    """
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    scale = np.abs(matrix).max(axis=0) / 127 if len(matrix) else np.ones(matrix.shape[1], dtype=np.float32)
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+class DequantizedMatrix:
+    """
+    Read-only view of quantised rows that returns float32 rows when sliced or
+    indexed, so `search` and the IVF index work on it like on a float32 matrix.
+    """
+
+    def __init__(self, codes: np.ndarray, scale: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scale = scale
+        self.shape = codes.shape
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        rows = self.codes[key].astype(np.float32)
+        return rows * self.scale if self.scale is not None else rows
+
+    def scores(self, queries: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """queries @ rows[start:stop].T, scaling the queries rather than every row."""
+        if self.scale is not None:
+            queries = queries * self.scale
+        stop = min(stop, self.shape[0])
+        scores = np.empty((queries.shape[0], max(0, stop - start)), dtype=np.float32)
+        step = max(1, DEQUANTIZE_BLOCK_BYTES // (4 * self.shape[1]))
+        for chunk in range(start, stop, step):
+            end = min(stop, chunk + step)
+            np.matmul(queries, self.codes[chunk:end].astype(np.float32).T, out=scores[:, chunk - start:end - start])
+        return scores
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+
+def search(matrix: np.ndarray, queries: np.ndarray, k: int,
+           excluded_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact cosine top-k over the unit-normalised rows of `matrix` for a batch of queries.
+
+    Scores are one matrix product per block of rows; each block keeps its top k with
+    `argpartition`, and the block winners are merged at the end.
+
+    Args:
+        matrix: (N, D) float32 matrix of normalised embeddings, e.g. a memmap, or any
+            object whose row slices are such arrays (a DequantizedMatrix)
+        queries: (Q, D) or (D,) query embeddings, normalised here
+        k: Number of results per query
+        excluded_rows: Optional row indices that must not be returned (deleted rows)
+
+    Returns:
+        (rows, scores), both (Q, min(k, N)), best first
+    """
+    queries = normalise(queries)
+    if queries.ndim == 1:
+        queries = queries[None, :]
+    n = matrix.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.zeros((queries.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+
+    step = SCORE_BLOCK_ROWS
+    block_rows = []
+    block_scores = []
+    for start in range(0, n, step):
+        if isinstance(matrix, DequantizedMatrix):
+            scores = matrix.scores(queries, start, start + step)
+        else:
+            scores = queries @ np.asarray(matrix[start:start + step]).T
+        if excluded_rows is not None and len(excluded_rows):
+            local = excluded_rows[(excluded_rows >= start) & (excluded_rows < start + scores.shape[1])] - start
+            scores[:, local] = -np.inf
+        top = top_k_rows(scores, min(k, scores.shape[1]))
+        block_rows.append(top + start)
+        block_scores.append(np.take_along_axis(scores, top, axis=1))
+
+    rows = np.concatenate(block_rows, axis=1)
+    scores = np.concatenate(block_scores, axis=1)
+    if len(block_rows) > 1:
+        top = top_k_rows(scores, k)
+        rows = np.take_along_axis(rows, top, axis=1)
+        scores = np.take_along_axis(scores, top, axis=1)
+    # Excluded rows only surface when fewer than k rows remain; callers skip -inf scores
+    return rows, scores
+
+
+def rescore(full_matrix: np.ndarray, queries: np.ndarray, rows: np.ndarray, scores: np.ndarray,
+            k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-rank candidate rows found on quantised vectors with their full-precision vectors.
+
+    Args:
+        full_matrix: (N, D) float32 normalised embeddings, usually a memmap of which only
+            the candidate rows are read
+        queries: (Q, D) or (D,) query embeddings
+        rows: (Q, C) candidate rows per query, as returned by `search` on the quantised vectors
+        scores: (Q, C) their approximate scores; rows with non-finite scores are not candidates
+        k: Number of results per query
+
+    Returns:
+        (rows, scores), both (Q, k), best first, padded with -inf scores
+    """
+    queries = normalise(queries)
+    if queries.ndim == 1:
+        queries = queries[None, :]
+    result_rows = np.zeros((len(queries), k), dtype=np.int64)
+    result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    for i, (query, candidates, approximate) in enumerate(zip(queries, rows, scores)):
+        candidates = np.unique(candidates[np.isfinite(approximate)])
+        if not len(candidates):
+            continue
+        exact = np.asarray(full_matrix[candidates]) @ query
+        top = top_k_rows(exact[None, :], min(k, len(candidates)))[0]
+        result_rows[i, :len(top)] = candidates[top]
+        result_scores[i, :len(top)] = exact[top]
+    return result_rows, result_scores
+
+
+class NumpySimpleVectorStore(SimpleVectorStore):
+    """
+    SimpleVectorStore that answers default-mode queries with `search` over a cached
+    float32 matrix instead of llama_index's per-row Python loop. Used for stores still
+    persisted in the JSON format; other query modes and metadata filters fall back to
+    the parent implementation.
+    """
+
+    _matrix_cache: Optional[Tuple[List[str], np.ndarray]] = None
+    # A retriever passes the same node_ids list with every query, so its exclusions are computed once
+    _excluded_cache: Optional[Tuple[list, np.ndarray]] = None
+
+    def add(self, nodes, **add_kwargs):
+        self._matrix_cache = None
+        return super().add(nodes, **add_kwargs)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs) -> None:
+        self._matrix_cache = None
+        super().delete(ref_doc_id, **delete_kwargs)
+
+    def delete_nodes(self, node_ids=None, filters=None, **delete_kwargs) -> None:
+        self._matrix_cache = None
+        super().delete_nodes(node_ids, filters, **delete_kwargs)
+
+    def _matrix(self) -> Tuple[List[str], np.ndarray]:
+        if self._matrix_cache is None:
+            self._excluded_cache = None
+            ids = list(self.data.embedding_dict)
+            matrix = normalise([self.data.embedding_dict[node_id] for node_id in ids]) if ids else np.zeros((0, 0), np.float32)
+            self._matrix_cache = (ids, matrix)
+        return self._matrix_cache
+
+    def query(self, query: VectorStoreQuery, **kwargs) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.DEFAULT or query.filters is not None:
+            return super().query(query, **kwargs)
+
+        ids, matrix = self._matrix()
+        excluded = None
+        if query.node_ids:
+            if self._excluded_cache is None or self._excluded_cache[0] is not query.node_ids:
+                allowed = set(query.node_ids)
+                rows = [row for row, node_id in enumerate(ids) if node_id not in allowed]
+                self._excluded_cache = (query.node_ids, np.asarray(rows, dtype=np.int64))
+            excluded = self._excluded_cache[1]
+        rows, scores = search(matrix, np.asarray(query.query_embedding), query.similarity_top_k, excluded)
+        hits = [(ids[row], float(score)) for row, score in zip(rows[0], scores[0]) if np.isfinite(score)]
+        return VectorStoreQueryResult(similarities=[score for _, score in hits], ids=[node_id for node_id, _ in hits])
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], k: int) -> List[List[Tuple[str, float]]]:
+        """(node_id, score) top-k lists for several query embeddings at once."""
+        ids, matrix = self._matrix()
+        rows, scores = search(matrix, np.asarray(query_embeddings), k)
+        return [[(ids[row], float(score)) for row, score in zip(r, s)] for r, s in zip(rows, scores)]
@@ -1,20 +1,36 @@
+import hashlib
 import json
 import logging
+import time
 from pathlib import Path as FsPath
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
 from bson import ObjectId
+import numpy as np
 from llama_index.core import StorageContext, load_index_from_storage, VectorStoreIndex
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.embeddings.gemini import GeminiEmbedding
 
+from app.core.config import settings
 from app.utils.mongodb_client import MongoDBClient
+from app.utils.bm25_index import Bm25Index, build_bm25_index, remove_bm25_index
+from app.utils.ivf_index import build_ivf_index, default_nlist, remove_ivf_index
+from app.utils.memmap_store import (
+    MemmapVectorStore, is_memmap_store, read_vectors, remove_memmap_store, write_memmap_store,
+)
+from app.utils.vector_search import NumpySimpleVectorStore
 
 logger = logging.getLogger(__name__)
 
 VECTOR_BASE_DIR = FsPath("vector_stores")
 VECTOR_BASE_DIR.mkdir(exist_ok=True)
 
+MANIFEST_FILE = "manifest.json"
+# Files of llama_index's default JSON persistence, removed once a store is written as memmap
+JSON_INDEX_FILES = ("docstore.json", "index_store.json", "default__vector_store.json",
+                    "graph_store.json", "image__vector_store.json")
+VECTOR_STORE_METADATA_FIELDS = ["name", "provider", "model_name", "knowledgeBase_id", "updatedAt"]
+
 mongo_client = MongoDBClient()
 
 
@@ -31,6 +47,180 @@ def get_vector_store_dir(store_id: str) -> FsPath:
     return VECTOR_BASE_DIR / store_id
 
 
+def _index_files(store_path: FsPath):
+    return sorted(path for path in store_path.iterdir() if path.is_file() and path.name != MANIFEST_FILE)
+
+
+def _embedding_dimension(index) -> Optional[int]:
+    vector_store = getattr(index, "vector_store", None)
+    if isinstance(vector_store, MemmapVectorStore):
+        return vector_store.dimension or None
+    embedding_dict = getattr(getattr(vector_store, "data", None), "embedding_dict", None) or {}
+    for embedding in embedding_dict.values():
+        return len(embedding)
+    return None
+
+
+def _node_count(index) -> int:
+    vector_store = getattr(index, "vector_store", None)
+    if isinstance(vector_store, MemmapVectorStore):
+        return vector_store.count
+    return len(index.docstore.docs)
+
+
+def index_exists(store_id: str) -> bool:
+    store_path = get_vector_store_dir(store_id)
+    return is_memmap_store(store_path) or (store_path / "docstore.json").exists()
+
+
+def _index_rows(index):
+    """(node, embedding) of every node of an index, whichever vector store backs it."""
+    vector_store = index.vector_store
+    if isinstance(vector_store, MemmapVectorStore):
+        yield from vector_store.rows()
+        return
+    embedding_dict = vector_store.data.embedding_dict
+    for node_id, node in index.docstore.docs.items():
+        embedding = embedding_dict.get(node_id)
+        if embedding is not None:
+            yield node, embedding
+
+
+def _vector_dtype(config: Dict[str, Any]) -> str:
+    quantization = config.get("quantization") or "none"
+    return "float32" if quantization == "none" else quantization
+
+
+def _build_ann_index(store_id: str, store_path: FsPath, index, config: Dict[str, Any]):
+    """Rebuild the IVF index of a freshly written memmap store, or drop it when the store does not use one."""
+    header, matrix = read_vectors(store_path)
+    if config.get("index_type") != "ivf" or header["count"] < settings.IVF_MIN_CHUNKS:
+        remove_ivf_index(store_path)
+        return
+    previous = index.vector_store.ivf if isinstance(index.vector_store, MemmapVectorStore) else None
+    nlist = config.get("ivf_nlist") or settings.IVF_NLIST or default_nlist(header["count"])
+    build_ivf_index(store_path, matrix, header.get("generation"), nlist, previous=previous)
+
+
+def persist_index(store_id: str, index, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Persist an index in the VECTOR_STORE_FORMAT of this deployment and write its manifest.
+    Stores are converted between formats as they are persisted. Memmap stores are
+    written with the vector quantization of their config, and those with index_type
+    "ivf" get their IVF index rebuilt. The BM25 index of the chunk text is rebuilt
+    for both formats.
+
+    Args:
+        store_id: The vector store id
+        index: The index to persist
+        config: The store config (index_type, ivf_nlist, quantization, quantization_rescore),
+            as built by load_vector_store_from_mongo
+
+    Returns:
+        The manifest
+    """
+    config = config or {}
+    store_path = get_vector_store_dir(store_id)
+    store_path.mkdir(parents=True, exist_ok=True)
+    rows = list(_index_rows(index))
+    if settings.VECTOR_STORE_FORMAT == "memmap":
+        write_memmap_store(store_path, rows, dtype=_vector_dtype(config),
+                           full_precision=config.get("quantization_rescore", True))
+        _build_ann_index(store_id, store_path, index, config)
+        for name in JSON_INDEX_FILES:
+            (store_path / name).unlink(missing_ok=True)
+    else:
+        if config.get("index_type") == "ivf" or _vector_dtype(config) != "float32":
+            logger.warning(f"IVF indexes and quantization of vector store {store_id} need VECTOR_STORE_FORMAT=memmap")
+        if isinstance(index.vector_store, MemmapVectorStore):
+            nodes = []
+            for node, embedding in rows:
+                node.embedding = np.asarray(embedding, dtype=np.float32).tolist()
+                nodes.append(node)
+            index = VectorStoreIndex(nodes=nodes, embed_model=index._embed_model)
+        index.storage_context.persist(persist_dir=str(store_path))
+        remove_memmap_store(store_path)
+        remove_ivf_index(store_path)
+
+    if settings.KB_LEXICAL_INDEX_ENABLED:
+        build_bm25_index(store_path, ((node.node_id, node.get_content()) for node, _ in rows))
+    else:
+        remove_bm25_index(store_path)
+    return write_manifest(store_id, index)
+
+
+def write_manifest(store_id: str, index) -> Dict[str, Any]:
+    """
+    Write manifest.json next to a freshly persisted index, so the store can be validated
+    without loading it. `persist_index` calls it after every write.
+    """
+    store_path = get_vector_store_dir(store_id)
+    checksum = hashlib.sha256()
+    files = {}
+    for path in _index_files(store_path):
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                checksum.update(block)
+        files[path.name] = path.stat().st_size
+
+    manifest = {
+        "store_id": store_id,
+        "node_count": _node_count(index),
+        "embedding_dimension": _embedding_dimension(index),
+        "checksum": f"sha256:{checksum.hexdigest()}",
+        "files": files,
+        "written_at": time.time(),
+    }
+    (store_path / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def read_manifest(store_id: str) -> Optional[Dict[str, Any]]:
+    path = get_vector_store_dir(store_id) / MANIFEST_FILE
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Unreadable manifest for vector store {store_id}: {e}")
+        return None
+
+
+def validate_vector_store(store_id: str) -> Dict[str, Any]:
+    """
+    Check that a vector store exists and its index is persisted, using only a Mongo
+    projection, the manifest and stat() calls. Nothing is loaded or created.
+
+    Returns:
+        The store metadata with a `manifest` key (None for stores persisted before manifests existed)
+
+    Raises:
+        HTTPException: 400 for a malformed id, 404 when the store does not exist,
+            409 when the index files do not match the manifest
+    """
+    key = parse_object_id(store_id)
+    metadata = mongo_client.get_vector_store_metadata(key, VECTOR_STORE_METADATA_FIELDS)
+    if not metadata:
+        raise HTTPException(status_code=404, detail=f"Vector store '{store_id}' not found in database")
+
+    store_path = get_vector_store_dir(store_id)
+    if not index_exists(store_id):
+        # Same outcome as before: the first load creates an empty index
+        logger.warning(f"Index for vector store {store_id} is not persisted yet")
+        metadata["manifest"] = None
+        return metadata
+
+    manifest = read_manifest(store_id)
+    if manifest:
+        for name, size in manifest.get("files", {}).items():
+            path = store_path / name
+            if not path.exists() or path.stat().st_size != size:
+                raise HTTPException(status_code=409, detail=f"Index files of vector store '{store_id}' do not match its manifest")
+
+    metadata["manifest"] = manifest
+    return metadata
+
+
 def parse_object_id(id_str: str) -> ObjectId:
     try:
         return ObjectId(id_str)
@@ -48,7 +238,8 @@ def load_vector_store_from_mongo(store_id: str) -> Dict[str, Any]:
     if not metadata:
         raise HTTPException(status_code=404, detail=f"Vector store '{store_id}' not found in database")
 
-    # Build config from root-level fields
+    # Build config from root-level fields; index options are set at creation, in the nested config
+    stored_config = metadata.get("config") or {}
     config = {
         "provider": metadata.get("provider", "openai"),
         "model_name": metadata.get("model_name"),
@@ -56,6 +247,11 @@ def load_vector_store_from_mongo(store_id: str) -> Dict[str, Any]:
         "knowledgeBase_id": metadata.get("knowledgeBase_id"),
         "chunk_size": metadata.get("chunk_size", 512),
         "chunk_overlap": metadata.get("chunk_overlap", 100),
+        "index_type": metadata.get("index_type", stored_config.get("index_type")) or "exact",
+        "ivf_nlist": metadata.get("ivf_nlist", stored_config.get("ivf_nlist")),
+        "ivf_nprobe": metadata.get("ivf_nprobe", stored_config.get("ivf_nprobe")),
+        "quantization": metadata.get("quantization", stored_config.get("quantization")) or "none",
+        "quantization_rescore": metadata.get("quantization_rescore", stored_config.get("quantization_rescore", True)),
     }
 
     store_path = get_vector_store_dir(store_id)
@@ -71,19 +267,35 @@ def load_vector_store_from_mongo(store_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Failed to initialize embedding model")
 
     # Check if index directory exists
-    if store_path.exists() and (store_path / "docstore.json").exists():
+    if index_exists(store_id):
         try:
-            storage_context = StorageContext.from_defaults(persist_dir=store_path)
-            index = load_index_from_storage(storage_context, embed_model=embed_model)
+            if is_memmap_store(store_path):
+                # Only the header and id table are read, vectors and text stay memory mapped
+                nprobe = (config["ivf_nprobe"] or settings.IVF_NPROBE) if config["index_type"] == "ivf" else None
+                rescore_factor = settings.VECTOR_RESCORE_FACTOR if config["quantization_rescore"] else 0
+                index = VectorStoreIndex.from_vector_store(
+                    MemmapVectorStore(store_path, nprobe=nprobe, rescore_factor=rescore_factor),
+                    embed_model=embed_model,
+                )
+            else:
+                storage_context = StorageContext.from_defaults(
+                    persist_dir=store_path,
+                    vector_store=NumpySimpleVectorStore.from_persist_dir(str(store_path)),
+                )
+                index = load_index_from_storage(storage_context, embed_model=embed_model)
+            if read_manifest(store_id) is None:
+                # Stores persisted before manifests existed get one on first load
+                write_manifest(store_id, index)
         except Exception as e:
             logger.error(f"Error loading index from disk for store {store_id}: {e}")
             raise HTTPException(status_code=500, detail="Failed to load vector index")
     else:
         logger.warning(f"Index not found for store {store_id}. Creating new empty index.")
         index = VectorStoreIndex(nodes=[], embed_model=embed_model)
-        index.storage_context.persist(persist_dir=str(store_path))
+        persist_index(store_id, index, config)
 
     metadata["index"] = index
+    metadata["lexical_index"] = Bm25Index.load(store_path)
     metadata["embed_model"] = embed_model
     metadata["config"] = config  # Provide constructed config
 
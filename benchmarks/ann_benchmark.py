@@ -0,0 +1,66 @@
+"""
+Recall and latency of the IVF index against exact search.
+
+Builds an IVF index over synthetic clustered embeddings (real chunk embeddings are
+clustered by topic, uniform random vectors are not) and reports recall@k and
+per-query latency for several nprobe values, next to exact vector_search.search.
+
+    python -m benchmarks.ann_benchmark [--dim 384] [--sizes 100000 1000000] [--nprobe 1 4 16 64]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from app.utils.ivf_index import IvfIndex, build_ivf_index, default_nlist
+from app.utils.vector_search import normalise, search
+
+TOP_K = 10
+QUERIES = 100
+TOPICS = 2000
+
+
+def make_embeddings(rng, size: int, dim: int) -> np.ndarray:
+    topics = rng.standard_normal((TOPICS, dim), dtype=np.float32)
+    matrix = topics[rng.integers(0, TOPICS, size)]
+    matrix += 1.2 * rng.standard_normal((size, dim), dtype=np.float32)
+    return normalise(matrix)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'nlist':>6} {'build':>8} {'search':>10} {'recall@10':>10} {'latency/query':>14} {'speedup':>8}")
+    for size in args.sizes:
+        matrix = make_embeddings(rng, size, args.dim)
+        # Queries are perturbed chunks, as a caller's question is close to, not equal to, its answer
+        noise = rng.standard_normal((QUERIES, args.dim), dtype=np.float32) / np.sqrt(args.dim)
+        queries = normalise(matrix[rng.integers(0, size, QUERIES)] + noise)
+
+        start = time.perf_counter()
+        exact_rows = np.vstack([search(matrix, query, TOP_K)[0] for query in queries])
+        exact = (time.perf_counter() - start) / QUERIES
+
+        with tempfile.TemporaryDirectory() as tmp:
+            header = build_ivf_index(Path(tmp), matrix, None, default_nlist(size))
+            ivf = IvfIndex.load(Path(tmp), size, None)
+            print(f"{size:>8} {'-':>6} {'-':>8} {'exact':>10} {1.0:>10.3f} {exact * 1e3:>11.2f} ms {'1x':>8}")
+            for nprobe in args.nprobe:
+                start = time.perf_counter()
+                rows = np.vstack([ivf.search(matrix, query, TOP_K, nprobe)[0] for query in queries])
+                latency = (time.perf_counter() - start) / QUERIES
+                recall = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(rows, exact_rows)])
+                print(
+                    f"{size:>8} {header['nlist']:>6} {header['build_seconds']:>6.1f} s {f'nprobe={nprobe}':>10} "
+                    f"{recall:>10.3f} {latency * 1e3:>11.2f} ms {exact / latency:>7.1f}x"
+                )
+        del matrix
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Microbenchmark for node transitions.
+
+Compares the per-transition work of the old create_agent path (rebuild the node
+dict, node.dict(), deepcopy of the whole AgentConfig per route) with a lookup in
+the precompiled FlowGraph.
+
+    python -m benchmarks.flow_transition_benchmark
+"""
+import copy
+import random
+import time
+import warnings
+from app.core.flow_graph import build_flow_graph
+from app.core.models import AgentConfig, GlobalSettings, NodeConfig
+
+ROUTES_PER_NODE = 3
+TRANSITIONS = 200
+
+
+def make_flow(num_nodes: int) -> AgentConfig:
+    rng = random.Random(num_nodes)
+    nodes = []
+    for i in range(num_nodes):
+        routes = [
+            {
+                "tool_name": f"route_{i}_{r}",
+                "next_node": f"node_{rng.randrange(num_nodes)}",
+                "condition": f"when the caller asks about topic {r} of step {i}",
+            }
+            for r in range(ROUTES_PER_NODE)
+        ]
+        nodes.append(NodeConfig(
+            node_id=f"node_{i}",
+            type="conversation",
+            prompt=f"Step {i}: " + "Ask the caller a clarifying question about their request. " * 5,
+            routes=routes,
+        ))
+
+    return AgentConfig(
+        entry_node="node_0",
+        flow_type="multi-prompt",
+        nodes=nodes,
+        global_settings=GlobalSettings(
+            global_prompt="You are a helpful voice assistant.",
+            llm={"provider": "openai", "model": "gpt-4o-mini", "api_key": "sk-test"},
+            stt={"provider": "deepgram", "model": "nova-3", "language": "en", "api_key": "dg-test"},
+            tts={"provider": "google", "model": "en-IN-Chirp3-HD-Charon", "language": "en-IN", "api_key": "{}"},
+        ),
+    )
+
+
+def legacy_transition(agent_config: AgentConfig, node_id: str) -> str:
+    agent_flow = {node.node_id: node for node in agent_config.nodes}
+    node_config = agent_flow[node_id]
+    config = node_config.dict()
+    next_nodes = []
+    for route in config.get("routes", []):
+        copy.deepcopy(agent_config)
+        next_nodes.append(route["next_node"])
+    return next_nodes[0]
+
+
+def graph_transition(graph, node_id: str) -> str:
+    node = graph.node(node_id)
+    return node.routes[0].next_node
+
+
+def walk(transition, target, transitions: int) -> float:
+    node_id = "node_0"
+    start = time.perf_counter()
+    for _ in range(transitions):
+        node_id = transition(target, node_id)
+    return (time.perf_counter() - start) / transitions
+
+
+def main():
+    # The legacy path uses the deprecated pydantic .dict() on purpose
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    print(f"{'nodes':>6} {'legacy/transition':>18} {'graph build':>12} {'graph/transition':>17} {'speedup':>8}")
+    for num_nodes in (10, 100, 1000):
+        agent_config = make_flow(num_nodes)
+        transitions = TRANSITIONS if num_nodes < 1000 else 20
+
+        legacy = walk(legacy_transition, agent_config, transitions)
+
+        start = time.perf_counter()
+        graph = build_flow_graph(agent_config)
+        build = time.perf_counter() - start
+        compiled = walk(graph_transition, graph, TRANSITIONS * 50)
+
+        print(
+            f"{num_nodes:>6} {legacy * 1e3:>15.3f} ms {build * 1e3:>9.3f} ms "
+            f"{compiled * 1e6:>14.3f} us {legacy / compiled:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
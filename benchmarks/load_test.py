@@ -0,0 +1,356 @@
+"""
+Offline load test for the agent pipeline.
+
+Drives N simulated sessions through a real flow: the flow is served from an
+in-process MongoDB stand-in, compiled through the flow cache and run by a real
+AgentSession with the fake STT/LLM/TTS providers (app/utils/fake_providers.py).
+Audio input is silence paced in (scaled) real time and audio output is played
+back into a sink, so no LiveKit server, network or API keys are needed.
+
+    python -m benchmarks.load_test --sessions 50 --concurrency 25
+    python -m benchmarks.load_test --flow path/to/flow.json --time-scale 0.25 --json
+
+All sessions share this process, like the sessions of one worker host; the
+report gives throughput, node transition and response latency, CPU and memory.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+from pathlib import Path
+
+# Settings refuses to load without these; none of them is contacted offline
+for _name, _value in {
+    "LIVEKIT_URL": "ws://localhost:7880",
+    "LIVEKIT_API_KEY": "load-test",
+    "LIVEKIT_API_SECRET": "load-test",
+    "MONGODB_URI": "mongodb://localhost:27017",
+    "MONGODB_NAME": "load_test",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import psutil
+from livekit import rtc
+from livekit.agents import AgentSession
+from livekit.agents.voice import io
+from app.core.agent_prefetch import AgentPrefetcher
+from app.core.dynamic_agent import build_agent, create_agent
+from app.core.flow_cache import flow_cache
+from app.core.tool_registry import SessionToolRegistry
+from app.utils.agent_builder import build_llm_instance, build_stt_instance, build_tts_instance
+from app.utils.fake_providers import configure_fake_providers
+from benchmarks.local_mongo import install_local_mongo, load_flow_file
+
+logger = logging.getLogger("load-test")
+
+DEFAULT_FLOW = Path(__file__).parent / "flows" / "support_flow.json"
+INPUT_SAMPLE_RATE = 16000
+INPUT_FRAME_MS = 20
+
+
+class SilentAudioInput(io.AudioInput):
+    """Microphone stand-in producing silence at `time_scale` x real time."""
+
+    def __init__(self, time_scale: float):
+        self.time_scale = time_scale
+        self.samples_per_frame = INPUT_SAMPLE_RATE * INPUT_FRAME_MS // 1000
+        self._silence = bytes(self.samples_per_frame * 2)
+        self._closed = False
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        if self._closed:
+            raise StopAsyncIteration
+        await asyncio.sleep(INPUT_FRAME_MS / 1000 * self.time_scale)
+        return rtc.AudioFrame(
+            data=self._silence,
+            sample_rate=INPUT_SAMPLE_RATE,
+            num_channels=1,
+            samples_per_channel=self.samples_per_frame,
+        )
+
+    def close(self):
+        self._closed = True
+
+
+class SinkAudioOutput(io.AudioOutput):
+    """Speaker stand-in that 'plays' each segment for its duration x `time_scale`."""
+
+    def __init__(self, time_scale: float):
+        super().__init__(next_in_chain=None, sample_rate=None)
+        self.time_scale = time_scale
+        self.played = 0.0
+        self._pushed_duration = 0.0
+        self._flush_task = None
+        self._interrupted = asyncio.Event()
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        self._pushed_duration += frame.duration
+
+    def flush(self) -> None:
+        super().flush()
+        if not self._pushed_duration:
+            return
+        self._flush_task = asyncio.create_task(self._wait_for_playout())
+
+    def clear_buffer(self) -> None:
+        if self._pushed_duration:
+            self._interrupted.set()
+
+    async def _wait_for_playout(self):
+        started = time.perf_counter()
+        duration = self._pushed_duration * self.time_scale
+        try:
+            await asyncio.wait_for(self._interrupted.wait(), timeout=duration)
+            interrupted = True
+        except asyncio.TimeoutError:
+            interrupted = False
+
+        position = self._pushed_duration
+        if interrupted and self.time_scale > 0:
+            position = min((time.perf_counter() - started) / self.time_scale, self._pushed_duration)
+        self.played += position
+        self._pushed_duration = 0.0
+        self._interrupted.clear()
+        self.on_playback_finished(playback_position=position, interrupted=interrupted)
+
+
+class SimulatedSession:
+    """One caller talking to the agent through the scripted STT until the script runs out."""
+
+    def __init__(self, index: int, flow_id: str, turns: int, time_scale: float, timeout: float, prefetch: bool = False):
+        self.index = index
+        self.prefetch = prefetch
+        self.flow_id = flow_id
+        self.turns = turns
+        self.time_scale = time_scale
+        self.timeout = timeout
+        self.tool_registry = None
+        self.response_latencies = []
+        self.error = None
+        self.duration = 0.0
+        self.completed_turns = 0
+
+    async def run(self):
+        start = time.perf_counter()
+        session = None
+        audio_input = SilentAudioInput(self.time_scale)
+        try:
+            compiled_flow = flow_cache.get(self.flow_id)
+            agent_config = compiled_flow.agent_config
+            global_settings = agent_config.global_settings
+
+            session = AgentSession(
+                stt=build_stt_instance("fake", global_settings.stt.model, global_settings.stt.language, ""),
+                llm=build_llm_instance("fake", global_settings.llm.model, "", global_settings.temperature),
+                tts=build_tts_instance("fake", global_settings.tts.model, global_settings.tts.language),
+                turn_detection="stt",
+            )
+            session.input.audio = audio_input
+            session.output.audio = SinkAudioOutput(self.time_scale)
+
+            done = asyncio.Event()
+            transcribed_at = []
+
+            @session.on("user_input_transcribed")
+            def on_transcribed(ev):
+                if ev.is_final:
+                    transcribed_at.append(time.perf_counter())
+
+            @session.on("agent_state_changed")
+            def on_agent_state(ev):
+                if ev.new_state == "speaking" and transcribed_at:
+                    self.response_latencies.append(time.perf_counter() - transcribed_at.pop())
+                if ev.new_state == "listening" and self.completed_turns >= self.turns:
+                    done.set()
+
+            @session.on("conversation_item_added")
+            def on_item(ev):
+                if getattr(ev.item, "role", None) == "user":
+                    self.completed_turns += 1
+
+            self.tool_registry = SessionToolRegistry(self.flow_id, compiled_flow.graph, create_agent)
+            if self.prefetch:
+                registry = self.tool_registry
+                registry.prefetcher = AgentPrefetcher(lambda node_id: build_agent(node_id, registry), max_agents=8)
+            agent = await create_agent(agent_config.entry_node, agent_id=self.flow_id, tool_registry=self.tool_registry)
+            await session.start(agent=agent)
+            await asyncio.wait_for(done.wait(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.error = f"timed out after {self.completed_turns}/{self.turns} turns"
+        except Exception as e:
+            self.error = repr(e)
+            logger.exception(f"Session {self.index} failed")
+        finally:
+            audio_input.close()
+            if self.tool_registry and self.tool_registry.prefetcher:
+                self.tool_registry.prefetcher.close()
+            if session is not None:
+                await session.aclose()
+            self.duration = time.perf_counter() - start
+
+
+class ResourceSampler:
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.cpu = []
+        self.rss = []
+        self._task = None
+
+    async def _sample(self):
+        self.process.cpu_percent(interval=None)
+        while True:
+            await asyncio.sleep(self.interval)
+            self.cpu.append(self.process.cpu_percent(interval=None))
+            self.rss.append(self.process.memory_info().rss)
+
+    def start(self):
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(sessions, wall: float, sampler: ResourceSampler, baseline_rss: int, args) -> dict:
+    transitions = [t["seconds"] for s in sessions if s.tool_registry for t in s.tool_registry.transitions]
+    responses = [latency for s in sessions for latency in s.response_latencies]
+    completed = [s for s in sessions if s.error is None]
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        "sessions": len(sessions),
+        "concurrency": args.concurrency,
+        "turns_per_session": args.turns,
+        "time_scale": args.time_scale,
+        "completed": len(completed),
+        "failed": len(sessions) - len(completed),
+        "wall_seconds": round(wall, 2),
+        "sessions_per_second": round(len(completed) / wall, 3) if wall else 0.0,
+        "session_seconds_avg": round(statistics.mean(s.duration for s in sessions), 2) if sessions else 0.0,
+        "transitions": len(transitions),
+        "transition_ms": {
+            "p50": ms(percentile(transitions, 50)),
+            "p95": ms(percentile(transitions, 95)),
+            "max": ms(max(transitions, default=0.0)),
+        },
+        "response_ms": {
+            "p50": ms(percentile(responses, 50)),
+            "p95": ms(percentile(responses, 95)),
+            "max": ms(max(responses, default=0.0)),
+        },
+        "cpu_percent": {
+            "avg": round(statistics.mean(sampler.cpu), 1) if sampler.cpu else 0.0,
+            "peak": round(max(sampler.cpu, default=0.0), 1),
+        },
+        "rss_mb": {
+            "baseline": round(baseline_rss / 2**20, 1),
+            "peak": round(max(sampler.rss, default=baseline_rss) / 2**20, 1),
+            "per_session": round((max(sampler.rss, default=baseline_rss) - baseline_rss) / 2**20 / max(args.concurrency, 1), 2),
+        },
+        "errors": sorted({s.error for s in sessions if s.error}),
+    }
+
+
+async def run_load_test(args) -> dict:
+    flow = load_flow_file(args.flow)
+    install_local_mongo([flow])
+    configure_fake_providers(
+        llm_ttft=args.llm_ttft,
+        llm_route_every=args.route_every,
+        stt_utterance_interval=args.utterance_interval,
+        stt_script=[f"Scripted caller turn {turn + 1}." for turn in range(args.turns)],
+        tts_ttfb=args.tts_ttfb,
+    )
+
+    flow_id = str(flow["_id"])
+    if not flow_cache.get(flow_id):
+        raise SystemExit(f"Flow {flow_id} could not be loaded")
+
+    sampler = ResourceSampler()
+    baseline_rss = sampler.process.memory_info().rss
+    semaphore = asyncio.Semaphore(args.concurrency)
+    sessions = [
+        SimulatedSession(i, flow_id, args.turns, args.time_scale, args.session_timeout, prefetch=args.prefetch)
+        for i in range(args.sessions)
+    ]
+
+    async def run_one(simulated: SimulatedSession):
+        async with semaphore:
+            await simulated.run()
+
+    sampler.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(simulated) for simulated in sessions))
+    wall = time.perf_counter() - start
+    await sampler.stop()
+
+    return summarize(sessions, wall, sampler, baseline_rss, args)
+
+
+def print_report(report: dict):
+    print(f"sessions            {report['completed']}/{report['sessions']} completed "
+          f"(concurrency {report['concurrency']}, {report['turns_per_session']} turns each)")
+    print(f"wall time           {report['wall_seconds']} s")
+    print(f"throughput          {report['sessions_per_second']} sessions/s")
+    print(f"session duration    {report['session_seconds_avg']} s avg")
+    t = report["transition_ms"]
+    print(f"node transitions    {report['transitions']}  p50 {t['p50']} ms  p95 {t['p95']} ms  max {t['max']} ms")
+    r = report["response_ms"]
+    print(f"response latency    p50 {r['p50']} ms  p95 {r['p95']} ms  max {r['max']} ms")
+    c = report["cpu_percent"]
+    print(f"cpu                 avg {c['avg']}%  peak {c['peak']}%")
+    m = report["rss_mb"]
+    print(f"memory              baseline {m['baseline']} MB  peak {m['peak']} MB  ~{m['per_session']} MB/session")
+    for error in report["errors"]:
+        print(f"error               {error}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline load test with fake STT/LLM/TTS providers")
+    parser.add_argument("--flow", default=str(DEFAULT_FLOW), help="Flow document (JSON) to load into the local Mongo")
+    parser.add_argument("--sessions", type=int, default=20, help="Total simulated sessions")
+    parser.add_argument("--concurrency", type=int, default=10, help="Sessions running at the same time")
+    parser.add_argument("--turns", type=int, default=4, help="Scripted caller turns per session")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Audio pacing relative to real time (0.25 runs audio 4x faster)")
+    parser.add_argument("--utterance-interval", type=float, default=2.0,
+                        help="Seconds of input audio between scripted caller turns")
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="Fake LLM time to first token")
+    parser.add_argument("--tts-ttfb", type=float, default=0.1, help="Fake TTS time to first byte")
+    parser.add_argument("--route-every", type=int, default=2, help="Fake LLM takes a route every N caller turns")
+    parser.add_argument("--session-timeout", type=float, default=120.0, help="Give up on a session after this long")
+    parser.add_argument("--prefetch", action="store_true", help="Enable speculative prefetch of next-node agents")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # The app modules configure INFO logging on import; per-turn logs would swamp the report
+    logging.getLogger().setLevel(logging.WARNING)
+    report = asyncio.run(run_load_test(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
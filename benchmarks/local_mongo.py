@@ -0,0 +1,129 @@
+"""
+In-process stand-in for the MongoDB database used by MongoDBClient.
+
+Supports the small subset of the pymongo collection API the agent runtime uses
+(equality filters, projections, inserts, updates and deletes), so flows can be
+served without a MongoDB server.
+"""
+import copy
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+from bson import ObjectId
+from app.utils.mongodb_client import MongoDBClient
+
+
+def _matches(document: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for key, expected in (query or {}).items():
+        value = document.get(key)
+        if isinstance(expected, dict) and "$in" in expected:
+            if value not in expected["$in"]:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+def _project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    document = copy.deepcopy(document)
+    if not projection:
+        return document
+    included = {key for key, flag in projection.items() if flag}
+    if included:
+        keep = included | ({"_id"} if projection.get("_id", 1) else set())
+        return {key: value for key, value in document.items() if key in keep}
+    return {key: value for key, value in document.items() if key not in projection}
+
+
+class LocalCursor(list):
+    def sort(self, key: str, direction: int = 1):
+        super().sort(key=lambda doc: doc.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, count: int):
+        return LocalCursor(self[:count] if count else self)
+
+
+class LocalCollection:
+    def __init__(self):
+        self.documents: List[Dict[str, Any]] = []
+
+    def create_index(self, *args, **kwargs):
+        return None
+
+    def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        for document in self.documents:
+            if _matches(document, query):
+                return _project(document, projection)
+        return None
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> LocalCursor:
+        return LocalCursor(_project(doc, projection) for doc in self.documents if _matches(doc, query))
+
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        return sum(1 for document in self.documents if _matches(document, query))
+
+    def insert_one(self, document: Dict[str, Any]):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", ObjectId())
+        self.documents.append(document)
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        for document in self.documents:
+            if _matches(document, query):
+                document.update(copy.deepcopy(update.get("$set", {})))
+                return SimpleNamespace(matched_count=1, modified_count=1)
+        if upsert:
+            self.insert_one({**query, **update.get("$set", {})})
+        return SimpleNamespace(matched_count=0, modified_count=0)
+
+    def update_many(self, query: Dict[str, Any], update: Dict[str, Any]):
+        matched = [document for document in self.documents if _matches(document, query)]
+        for document in matched:
+            document.update(copy.deepcopy(update.get("$set", {})))
+        return SimpleNamespace(matched_count=len(matched), modified_count=len(matched))
+
+    def replace_one(self, query: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False):
+        self.delete_one(query)
+        if upsert or replacement.get("_id"):
+            self.insert_one(replacement)
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+    def delete_one(self, query: Dict[str, Any]):
+        for index, document in enumerate(self.documents):
+            if _matches(document, query):
+                del self.documents[index]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    def delete_many(self, query: Dict[str, Any]):
+        before = len(self.documents)
+        self.documents = [document for document in self.documents if not _matches(document, query)]
+        return SimpleNamespace(deleted_count=before - len(self.documents))
+
+
+class LocalDatabase(dict):
+    def __missing__(self, name: str) -> LocalCollection:
+        collection = self[name] = LocalCollection()
+        return collection
+
+
+def install_local_mongo(flows: Iterable[Dict[str, Any]] = ()) -> LocalDatabase:
+    """Point the MongoDBClient singleton at an in-process database holding `flows`."""
+    database = LocalDatabase()
+    for flow in flows:
+        database["flows"].insert_one(flow)
+
+    client = MongoDBClient()
+    client.client = SimpleNamespace(close=lambda: None)
+    client.db = database
+    return database
+
+
+def load_flow_file(path: str) -> Dict[str, Any]:
+    """Load a flow document exported from the `flows` collection (a JSON object)."""
+    flow = json.loads(Path(path).read_text())
+    flow.setdefault("_id", Path(path).stem)
+    return flow
@@ -0,0 +1,64 @@
+"""
+Memory and recall of quantised vector stores.
+
+Quantises synthetic clustered embeddings to float16 and int8 and reports, per
+vector dtype, the bytes that are searched (and so resident in every worker), the
+bytes on disk, recall@10 against float32 exact search and per-query latency, with
+and without rescoring the top candidates on the float32 vectors.
+
+    python -m benchmarks.quantization_benchmark [--dim 384] [--size 100000] [--rescore-factor 4]
+"""
+import argparse
+import time
+import numpy as np
+from app.utils.memmap_store import DequantizedMatrix, quantize
+from app.utils.vector_search import normalise, rescore, search
+from benchmarks.ann_benchmark import make_embeddings
+
+TOP_K = 10
+QUERIES = 100
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = make_embeddings(rng, args.size, args.dim)
+    noise = rng.standard_normal((QUERIES, args.dim), dtype=np.float32) / np.sqrt(args.dim)
+    queries = normalise(matrix[rng.integers(0, args.size, QUERIES)] + noise)
+    exact_rows = np.vstack([search(matrix, query, TOP_K)[0] for query in queries])
+
+    variants = [("float32", matrix, False)]
+    for dtype in ("float16", "int8"):
+        codes, scale = quantize(matrix, dtype)
+        variants.append((dtype, DequantizedMatrix(codes, scale), False))
+        variants.append((dtype, DequantizedMatrix(codes, scale), True))
+
+    print(f"{'vectors':>8} {'rescore':>8} {'searched':>10} {'on disk':>10} {'saved':>6} {'recall@10':>10} {'latency/query':>14}")
+    for dtype, searched, rescored in variants:
+        start = time.perf_counter()
+        rows = []
+        for query in queries:
+            if rescored:
+                candidates, scores = search(searched, query, TOP_K * args.rescore_factor)
+                rows.append(rescore(matrix, query, candidates, scores, TOP_K)[0])
+            else:
+                rows.append(search(searched, query, TOP_K)[0])
+        latency = (time.perf_counter() - start) / QUERIES
+        recall = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(np.vstack(rows), exact_rows)])
+
+        searched_bytes = searched.nbytes
+        # Rescored stores keep the float32 vectors on disk, but only candidate rows are paged in
+        disk_bytes = searched_bytes + (matrix.nbytes if rescored else 0)
+        print(
+            f"{dtype:>8} {'yes' if rescored else 'no':>8} {searched_bytes / 1e6:>7.1f} MB {disk_bytes / 1e6:>7.1f} MB "
+            f"{matrix.nbytes / searched_bytes:>5.1f}x {recall:>10.3f} {latency * 1e3:>11.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Microbenchmark for knowledge base top-k retrieval.
+
+Compares llama_index's get_top_k_embeddings (the SimpleVectorStore path: a Python
+loop over per-row similarity calls and a heap) with vector_search.search (one
+matrix product over a contiguous normalised float32 matrix and argpartition),
+for single queries and for a batch of queries.
+
+    python -m benchmarks.vector_search_benchmark [--dim 384] [--sizes 10000 100000 1000000]
+"""
+import argparse
+import time
+import numpy as np
+from llama_index.core.indices.query.embedding_utils import get_top_k_embeddings
+from app.utils.vector_search import normalise, search
+
+TOP_K = 5
+QUERIES = 20
+BATCH = 32
+# The list-of-lists baseline needs ~30x the memory of the matrix; it is skipped above this
+BASELINE_MAX_ROWS = 100000
+
+
+def timed(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'llama_index/query':>18} {'numpy/query':>12} {'speedup':>8} {'numpy batch/query':>18}")
+    for size in args.sizes:
+        matrix = normalise(rng.standard_normal((size, args.dim), dtype=np.float32))
+        queries = rng.standard_normal((max(QUERIES, BATCH), args.dim), dtype=np.float32)
+
+        numpy_query = timed(lambda: search(matrix, queries[0], TOP_K), QUERIES)
+        batched = timed(lambda: search(matrix, queries[:BATCH], TOP_K), 3) / BATCH
+
+        if size <= BASELINE_MAX_ROWS:
+            embeddings = matrix.tolist()
+            ids = list(range(size))
+            query = queries[0].tolist()
+            repeats = 3 if size > 10000 else QUERIES
+            baseline = timed(lambda: get_top_k_embeddings(query, embeddings, similarity_top_k=TOP_K,
+                                                          embedding_ids=ids), repeats)
+            baseline_column = f"{baseline * 1e3:>15.2f} ms"
+            speedup = f"{baseline / numpy_query:>7.0f}x"
+            del embeddings
+        else:
+            baseline_column = f"{'skipped':>18}"
+            speedup = f"{'-':>8}"
+
+        print(
+            f"{size:>8} {baseline_column} {numpy_query * 1e3:>9.2f} ms {speedup} "
+            f"{batched * 1e3:>15.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
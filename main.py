@@ -4,7 +4,12 @@ from app.api.routes import agents, vector_stores
 from app.api.routes.websockets import agent_ws
 from app.api.dependencies import validate_ws_token
 from app.utils.mongodb_client import MongoDBClient
-from app.api.routes import telephony
+from app.api.routes import telephony, workers, sessions
+from app.core.worker_pool import worker_pool
+from app.core.admission import admission_controller
+from app.core.session_registry import session_registry
+from app.core.ingestion import ingestion_pipeline
+from app.core.ingestion_jobs import ingestion_jobs
 
 app = FastAPI(
     title="Algo Vox API",
@@ -20,6 +25,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_worker_pool():
+    await admission_controller.start()
+    await session_registry.start()
+    await worker_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    await worker_pool.stop()
+    await session_registry.stop()
+    await admission_controller.stop()
+    await ingestion_jobs.stop()
+    await ingestion_pipeline.stop()
+
+
 async def protected_agent_ws(
     websocket: WebSocket, 
     agent_id: str = Depends(validate_ws_token)
@@ -34,6 +55,8 @@ app.include_router(vector_stores.router, prefix="/vector_stores", tags=["Vector
 app.include_router(agents.router, prefix="/v1", tags=["Agent"])
 app.add_api_websocket_route("/ws/agent/{agent_id}", protected_agent_ws)
 app.include_router(telephony.router, prefix="/telephony", tags=["Telephony"])
+app.include_router(workers.router, prefix="/workers", tags=["Workers"])
+app.include_router(sessions.router, prefix="/v1/sessions", tags=["Sessions"])
 
 if __name__ == "__main__":
     import uvicorn